@@ -0,0 +1,191 @@
+"""
+AI 回應快取模組
+依命盤快取 AI 解析結果，支援 TTL、筆數與容量上限，以及選用的 SQLite 磁碟持久化
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """AI 回應快取（執行緒安全）"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 1024,
+        max_bytes: int = 8 * 1024 * 1024,
+        db_path: str = None
+    ):
+        """
+        初始化快取
+
+        Args:
+            ttl_seconds: 每筆回應的有效秒數（0 表示不快取）
+            max_entries: 最多保留筆數
+            max_bytes: 回應文字總容量上限（UTF-8 位元組）
+            db_path: SQLite 檔案路徑（None 表示僅存於記憶體）
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, created_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            self._open_db()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """依環境變數建立快取"""
+        return cls(
+            ttl_seconds=float(os.environ.get("AI_CACHE_TTL", "86400")),
+            max_entries=int(os.environ.get("AI_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.environ.get("AI_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+            db_path=os.environ.get("AI_CACHE_PATH") or None
+        )
+
+    @staticmethod
+    def make_key(bazi_full: str, day_master: str, model: str, prompt_version: str, flow_day: str = "") -> str:
+        """
+        計算快取鍵
+
+        Args:
+            bazi_full: 完整八字字串
+            day_master: 日主天干
+            model: 模型名稱
+            prompt_version: Prompt 版本（修改 Prompt 時遞增即可使舊快取失效）
+            flow_day: 流日日期（ISO 格式；流日解析只在當天有效）
+
+        Returns:
+            str: SHA-256 十六進位字串
+        """
+        raw = "\x1f".join((bazi_full, day_master, model, prompt_version, flow_day))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _open_db(self):
+        """開啟 SQLite 並載入未過期的回應"""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM ai_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._db.commit()
+
+        rows = self._db.execute("SELECT key, value, created_at FROM ai_cache ORDER BY created_at").fetchall()
+        with self._lock:
+            for key, value, created_at in rows:
+                self._store_locked(key, value, created_at)
+
+    def _store_locked(self, key: str, value: str, created_at: float):
+        """寫入記憶體並依上限淘汰最舊項目（呼叫者需持有鎖）"""
+        if key in self._data:
+            self._bytes -= self._data.pop(key)[2]
+        size = len(value.encode("utf-8"))
+        self._data[key] = (value, created_at, size)
+        self._bytes += size
+
+        evicted = []
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            old_key, (_, _, old_size) = self._data.popitem(last=False)
+            self._bytes -= old_size
+            evicted.append(old_key)
+        if evicted and self._db is not None:
+            self._db.executemany("DELETE FROM ai_cache WHERE key = ?", [(k,) for k in evicted])
+            self._db.commit()
+
+    def get(self, key: str):
+        """
+        讀取快取
+
+        Args:
+            key: make_key() 產生的快取鍵
+
+        Returns:
+            str | None: 命中時回傳回應文字，否則 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None and self._db is not None:
+                # 其他行程（或重啟前）寫入的資料
+                row = self._db.execute(
+                    "SELECT value, created_at FROM ai_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._store_locked(key, row[0], row[1])
+                    entry = self._data.get(key)
+
+            if entry is not None and now - entry[1] > self.ttl_seconds:
+                self._bytes -= self._data.pop(key)[2]
+                if self._db is not None:
+                    self._db.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str):
+        """
+        寫入快取
+
+        Args:
+            key: make_key() 產生的快取鍵
+            value: 回應文字
+        """
+        if self.ttl_seconds <= 0:
+            return
+        created_at = time.time()
+        with self._lock:
+            self._store_locked(key, value, created_at)
+            if self._db is not None and key in self._data:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO ai_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at)
+                )
+                self._db.commit()
+
+    def clear(self):
+        """清空快取（含磁碟）與計數"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM ai_cache")
+                self._db.commit()
+
+    def get_stats(self) -> dict:
+        """
+        獲取快取統計資訊
+
+        Returns:
+            dict: 命中數、未命中數、命中率、筆數與容量
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "persistent": self._db is not None
+            }
@@ -5,10 +5,14 @@ eeasy.ai | Case 01: Metaphysics
 
 import streamlit as st
 from datetime import datetime, time, date
-from bazi_engine import get_fortune
 from logger import FortuneLogger
+from sqlite_logger import SQLiteFortuneLogger
+from segment_logger import SegmentedFortuneLogger
 from gsheets_logger import GoogleSheetsLogger
+from log_queue import WriteBehindLogger
+import metrics
 import os
+import tempfile
 
 
 # ============================================================
@@ -177,15 +181,35 @@ st.markdown("""
 # ============================================================
 @st.cache_resource
 def get_csv_logger():
-    """初始化 CSV Logger（本地備份）"""
+    """初始化本地 Logger（本地備份；CORPUS_BACKEND=sqlite 時改用 SQLite，segments 時改用分段 CSV）"""
+    backend = os.environ.get("CORPUS_BACKEND", "csv")
+    if backend == "sqlite":
+        return SQLiteFortuneLogger.from_env()
+    if backend == "segments":
+        return SegmentedFortuneLogger.from_env()
     return FortuneLogger("corpus_data.csv")
 
+@st.cache_data(max_entries=2, show_spinner=False)
+def read_corpus_segment(segment_id: int, file: str, size: int):
+    """讀取單一分段供下載（依檔名與大小快取；已壓縮的分段內容不再改變）"""
+    return get_csv_logger().read_segment(segment_id)
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def read_corpus_db(total_records: int, latest_timestamp: str):
+    """將 SQLite 語料庫匯出為 CSV 供下載（依筆數與最新記錄時間快取，有新記錄時才重新匯出）"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "corpus.csv")
+        if not get_csv_logger().export_to_csv(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
 @st.cache_resource
 def get_gsheets_logger():
-    """初始化 Google Sheets Logger（雲端數據資產）"""
+    """初始化 Google Sheets Logger（雲端數據資產；首次記錄或查詢統計時才連線）"""
     try:
         logger = GoogleSheetsLogger()
-        if logger.connect():
+        if logger.is_configured():
             return logger
         else:
             return None
@@ -193,8 +217,20 @@ def get_gsheets_logger():
         print(f"Google Sheets Logger 初始化失敗: {e}")
         return None
 
+@st.cache_resource
+def get_log_queues():
+    """初始化寫入佇列（背景批次寫入，請求路徑不做任何記錄 I/O）"""
+    csv_queue = WriteBehindLogger.from_env("csv", get_csv_logger().log_fortunes)
+    sheets = get_gsheets_logger()
+    sheets_queue = WriteBehindLogger.from_env("sheets", sheets.log_fortunes) if sheets else None
+    return csv_queue, sheets_queue
+
 csv_logger = get_csv_logger()
 gsheets_logger = get_gsheets_logger()
+csv_queue, sheets_queue = get_log_queues()
+
+# 指標端點 / 指標檔（依 METRICS_PORT、METRICS_FILE 啟動，只會啟動一次）
+metrics.start_from_env()
 
 # ============================================================
 # 標題區
@@ -242,24 +278,16 @@ with st.sidebar:
     # 語料庫統計
     st.subheader("📊 數據資產統計")
     
-    # 優先顯示 Google Sheets 統計
+    # 優先顯示 Google Sheets 統計（首次查詢需要連線，於頁面其餘部分渲染後才填入）
     if gsheets_logger:
-        stats = gsheets_logger.get_stats()
-        st.markdown(f"""
-        <div class="stats-box">
-            🌐 <strong>Google Sheets</strong><br/>
-            📝 累積筆數: <strong>{stats['total_records']}</strong><br/>
-            📅 最新記錄: {stats['latest_timestamp'] or '尚無記錄'}<br/>
-            ✅ 狀態: {stats['status']}
-        </div>
-        """, unsafe_allow_html=True)
+        sheets_stats_slot = st.empty()
     else:
         # 降級為 CSV 統計
         stats = csv_logger.get_stats()
         st.markdown(f"""
         <div class="stats-box">
-            💾 <strong>本地 CSV</strong><br/>
-            📝 累積筆數: <strong>{stats['total_records']}</strong><br/>
+            💾 <strong>{'本地 SQLite' if isinstance(csv_logger, SQLiteFortuneLogger) else '本地分段 CSV' if isinstance(csv_logger, SegmentedFortuneLogger) else '本地 CSV'}</strong><br/>
+            📝 累積筆數: <strong>{stats['total_records']}</strong>{f"（{stats['segments']} 個分段）" if 'segments' in stats else ''}<br/>
             📅 最新記錄: {stats['latest_timestamp'] or '尚無記錄'}<br/>
             💾 檔案大小: {stats['file_size_kb']} KB
         </div>
@@ -272,7 +300,42 @@ with st.sidebar:
     import os
     csv_path = "corpus_data.csv"
     
-    if os.path.exists(csv_path):
+    if isinstance(csv_logger, SegmentedFortuneLogger):
+        # 依 manifest 列出分段（最新的在前），只讀取選取的分段
+        segments = [entry for entry in reversed(csv_logger.list_segments()) if entry["rows"]]
+        if segments:
+            labels = {
+                f"#{entry['id']} {entry['first_timestamp'][:10]} ~ {entry['last_timestamp'][:10]}（{entry['rows']} 筆）": entry
+                for entry in segments
+            }
+            segment = labels[st.selectbox("選擇分段", list(labels))]
+            file_name, segment_data, mime = read_corpus_segment(segment["id"], segment["file"], segment["size"])
+            st.download_button(
+                label="📥 下載分段備份",
+                data=segment_data,
+                file_name=f"eeasy_corpus_{file_name}",
+                mime=mime,
+                help="下載選取分段的八字與 AI 解析語料（已關閉的分段為 gzip 壓縮的 CSV）"
+            )
+            st.caption("💡 已關閉的分段不會再變動，下載一次即可。")
+        else:
+            st.info("📄 尚無本地記錄。")
+    elif isinstance(csv_logger, SQLiteFortuneLogger):
+        # SQLite 語料庫匯出為與 CSV 備份相同格式的 CSV
+        db_stats = csv_logger.get_stats()
+        csv_data = read_corpus_db(db_stats["total_records"], db_stats["latest_timestamp"]) if db_stats["total_records"] else None
+        if csv_data:
+            st.download_button(
+                label="📥 下載 CSV 備份",
+                data=csv_data,
+                file_name=f"eeasy_corpus_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                help="下載 SQLite 語料庫中所有累積的八字與 AI 解析語料（CSV）"
+            )
+            st.caption("💡 建議每日備份一次。")
+        else:
+            st.info("📄 尚無本地記錄。")
+    elif os.path.exists(csv_path):
         with open(csv_path, "rb") as file:
             csv_data = file.read()
         
@@ -320,65 +383,80 @@ birth_datetime = datetime.combine(birth_date, birth_time)
 st.markdown("<br/>", unsafe_allow_html=True)
 
 if st.button("🧠 AI 顧問請分析", use_container_width=True):
-    with st.spinner("🔮 正在解構八字數據..."):
-        result = get_fortune(birth_datetime)
+    # 排盤引擎（含 numpy 與 OpenAI 客戶端）延遲到第一次分析才載入，頁面可先行顯示
+    from bazi_engine import generate_fortune_stream, get_chart
+    
+    # 排盤為毫秒級，先立即顯示四柱，AI 解析隨後串流
+    result = get_chart(birth_datetime)
+    
+    if result['success']:
+        # 顯示農曆與日主資訊
+        st.success(f"**農曆生日**：{result['lunar_date']}")
+        st.info(f"**日主**：{result['day_master']} ({result['day_master_element']}行)")
         
-        if result['success']:
-            # 顯示農曆與日主資訊
-            st.success(f"**農曆生日**：{result['lunar_date']}")
-            st.info(f"**日主**：{result['day_master']} ({result['day_master_element']}行)")
-            
-            # 顯示八字四柱
-            st.markdown("### 八字四柱")
-            bazi_parts = result['bazi_full'].split()
-            labels = ['年柱', '月柱', '日柱', '時柱']
-            
-            # 使用 Streamlit columns 確保可靠渲染
-            cols = st.columns(4)
-            for i, (label, pillar) in enumerate(zip(labels, bazi_parts)):
-                with cols[i]:
-                    st.markdown(f"""
-                    <div class="pillar-box">
-                        <div class="pillar-label">{label}</div>
-                        <div class="pillar-value">{pillar}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            
-            # 顯示 AI 運勢解析
-            st.markdown("### 💡 AI 運勢解析")
-            st.markdown(f'''
-            <div class="fortune-box">
-                {result['ai_fortune']}
-            </div>
-            ''', unsafe_allow_html=True)
-            
-            # 記錄到 CSV（本地備份）
-            csv_logger.log_fortune(result)
-            
-            # 記錄到 Google Sheets（雲端數據資產）
-            if gsheets_logger:
-                gsheets_logger.log_fortune(result)
-                st.success("✅ 已自動記錄到雲端數據庫")
-            else:
-                st.warning("⚠️ Google Sheets 未連接，僅記錄到本地 CSV")
+        # 顯示八字四柱
+        st.markdown("### 八字四柱")
+        bazi_parts = result['bazi_full'].split()
+        labels = ['年柱', '月柱', '日柱', '時柱']
         
-        else:
-            # 顯示錯誤訊息
-            st.markdown(f"""
-            <div class="error-box">
-                <div class="error-title">
-                    <span class="error-icon">⚠️</span>
-                    AI 解析失敗
+        # 使用 Streamlit columns 確保可靠渲染
+        cols = st.columns(4)
+        for i, (label, pillar) in enumerate(zip(labels, bazi_parts)):
+            with cols[i]:
+                st.markdown(f"""
+                <div class="pillar-box">
+                    <div class="pillar-label">{label}</div>
+                    <div class="pillar-value">{pillar}</div>
                 </div>
-                <div class="error-message">
-                    {result['error']}<br/>
-                    <small>請檢查 API Key 設定或網路連線。</small>
+                """, unsafe_allow_html=True)
+        
+        # 顯示 AI 運勢解析（逐段串流渲染）
+        st.markdown("### 💡 AI 運勢解析")
+        fortune_placeholder = st.empty()
+        fortune_text = ""
+        with st.spinner("🔮 正在解構八字數據..."):
+            for chunk in generate_fortune_stream(birth_datetime, result):
+                fortune_text += chunk
+                fortune_placeholder.markdown(f'''
+                <div class="fortune-box">
+                    {fortune_text}
                 </div>
+                ''', unsafe_allow_html=True)
+        if result.get('ai_cached'):
+            st.caption("⚡ 此命盤的解析由快取提供")
+        elif result.get('ai_source') == 'fallback':
+            st.caption("⚡ AI 顧問目前忙線中，以上為即時規則版解析")
+        
+        # 串流結束後 result['ai_fortune'] 已為完整文案
+        # 記錄到 CSV（本地備份）；排入寫入佇列，由背景執行緒批次寫入
+        csv_queue.submit(result)
+        
+        # 記錄到 Google Sheets（雲端數據資產）
+        if sheets_queue:
+            if sheets_queue.submit(result):
+                st.success("✅ 已排入雲端數據庫的寫入佇列（於背景寫入）")
+            else:
+                st.warning("⚠️ 記錄佇列已滿，本次未寫入雲端數據庫")
+        else:
+            st.warning("⚠️ Google Sheets 未連接，僅記錄到本地 CSV")
+    
+    else:
+        # 顯示錯誤訊息
+        st.markdown(f"""
+        <div class="error-box">
+            <div class="error-title">
+                <span class="error-icon">⚠️</span>
+                AI 解析失敗
+            </div>
+            <div class="error-message">
+                {result['error']}<br/>
+                <small>請檢查 API Key 設定或網路連線。</small>
             </div>
-            """, unsafe_allow_html=True)
-            
-            # 即使失敗也記錄（用於除錯）
-            csv_logger.log_fortune(result)
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # 即使失敗也記錄（用於除錯）
+        csv_queue.submit(result)
 
 # ============================================================
 # 頁尾說明
@@ -393,3 +471,15 @@ st.markdown("""
     <small>© 2025 eeasy.ai | AI-Powered Knowledge Simplification</small>
 </div>
 """, unsafe_allow_html=True)
+
+# 側邊欄的 Google Sheets 統計（放在最後，連線與讀取不會延遲頁面渲染）
+if gsheets_logger:
+    stats = gsheets_logger.get_stats()
+    sheets_stats_slot.markdown(f"""
+    <div class="stats-box">
+        🌐 <strong>Google Sheets</strong><br/>
+        📝 累積筆數: <strong>{stats['total_records']}</strong><br/>
+        📅 最新記錄: {stats['latest_timestamp'] or '尚無記錄'}<br/>
+        ✅ 狀態: {stats['status']}
+    </div>
+    """, unsafe_allow_html=True)
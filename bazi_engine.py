@@ -3,159 +3,679 @@
 負責農曆轉換、干支計算與 OpenAI 命理解析
 """
 
-from datetime import datetime
-from lunar_python import Lunar, Solar
-from openai import OpenAI
+import asyncio
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date, datetime
+import numpy as np
 import os
+import threading
+import time
+from zoneinfo import ZoneInfo
 
+from ai_cache import ResponseCache
+import bazi_tables
+from chart import (
+    DI_ZHI,
+    ELEMENTS,
+    LUNAR_DAY_TEXT,
+    PILLAR_TEXT,
+    STEM_ELEMENT,
+    TIAN_GAN,
+    WUXING_MAP,
+    Chart,
+    lunar_month_text,
+    pillar_index
+)
+from daily_store import DailyFortuneStore
+from llm_client import get_async_client, get_client, llm_limiter
+from fallback_fortune import generate_fallback_fortune
+from llm_deadline import (
+    CircuitOpen,
+    DeadlineExceeded,
+    call_with_deadline,
+    get_stats as get_deadline_stats,
+    is_retryable,
+    llm_circuit,
+    run_in_background,
+    run_sync,
+    stream_with_deadline
+)
+from metrics import observe_stage, registry, track_stage
 
-def get_fortune(birth_datetime: datetime) -> dict:
+
+# ============================================================
+# 曆法常數（干支、五行查表見 chart.py）
+# ============================================================
+# 日柱：儒略日數 = date.toordinal() + 1721425，甲子日為 (儒略日數 - 11) % 60 == 0
+_DAY_PILLAR_OFFSET = (1721425 - 11) % 60
+
+
+def _build_jie_ordinals() -> list:
+    """展開節氣表為遞增的公曆序數列表（每個「節」為月柱交接日）"""
+    ordinals = []
+    for i, days in enumerate(bazi_tables.JIE_DAYS):
+        year = bazi_tables.JIE_FIRST_YEAR + i
+        for month, day in enumerate(days, start=1):
+            ordinals.append(date(year, month, int(day)).toordinal())
+    return ordinals
+
+
+def _build_lunar_months() -> tuple:
+    """展開農曆年表為 (每月初一公曆序數列表, 對應 (農曆年, 月) 列表, 表尾序數)"""
+    starts = []
+    labels = []
+    ordinal = 0
+    for i, (ny_month, ny_day, leap, sizes) in enumerate(bazi_tables.LUNAR_YEARS):
+        year = bazi_tables.LUNAR_FIRST_YEAR + i
+        ordinal = date(year, ny_month, ny_day).toordinal()
+        months = []
+        for m in range(1, 13):
+            months.append(m)
+            if m == leap:
+                months.append(-m)
+        for j, m in enumerate(months):
+            starts.append(ordinal)
+            labels.append((year, m))
+            ordinal += 30 if sizes >> j & 1 else 29
+    return starts, labels, ordinal
+
+
+_JIE_ORDINALS = _build_jie_ordinals()
+_LUNAR_MONTH_STARTS, _LUNAR_MONTH_LABELS, _LUNAR_TABLE_END = _build_lunar_months()
+
+# 節氣表第 0 個「節」為首年小寒，即前一年立春起算的丑月
+_MONTH_PILLAR_BASE = 12 * (bazi_tables.JIE_FIRST_YEAR - 4) + 1
+
+# 查表排盤的有效範圍（超出則退回 lunar_python）
+_TABLE_MIN_ORDINAL = max(_JIE_ORDINALS[0], _LUNAR_MONTH_STARTS[0])
+_TABLE_MAX_ORDINAL = min(
+    _LUNAR_TABLE_END - 1,
+    date(bazi_tables.JIE_FIRST_YEAR + len(bazi_tables.JIE_DAYS) - 1, 12, 31).toordinal()
+)
+
+# 批次排盤用的 numpy 查表
+_UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_JIE_ORDINALS_NP = np.asarray(_JIE_ORDINALS, dtype=np.int64)
+_LUNAR_MONTH_STARTS_NP = np.asarray(_LUNAR_MONTH_STARTS, dtype=np.int64)
+_LUNAR_MONTH_YEARS_NP = np.asarray([y for y, _ in _LUNAR_MONTH_LABELS], dtype=np.int64)
+_LUNAR_MONTH_MONTHS_NP = np.asarray([m for _, m in _LUNAR_MONTH_LABELS], dtype=np.int64)
+_TIAN_GAN_NP = np.asarray(TIAN_GAN)
+_ELEMENT_NP = np.asarray([ELEMENTS[e] for e in STEM_ELEMENT])
+_LUNAR_DAY_NP = np.asarray(LUNAR_DAY_TEXT)
+_LUNAR_MONTH_TEXT_NP = np.asarray([lunar_month_text(y, m) for y, m in _LUNAR_MONTH_LABELS])
+
+
+def _compute_chart(birth_datetime: datetime) -> Chart:
     """
-    核心函數：計算八字並生成 AI 運勢解析
-    
+    查表排盤：以整數運算計算四柱，結果與 lunar_python 一致
+
+    - 年柱：以正月初一換年（同 Lunar.getYearGan/getYearZhi）
+    - 月柱：以「節」所在日換月，依節氣表二分查找
+    - 日柱：公曆序數加固定偏移
+    - 時柱：五鼠遁，23 時起算次日子時
+
+    Args:
+        birth_datetime: 完整出生日期時間
+
+    Returns:
+        Chart: 命盤（四柱為六十甲子序號，閏月以負數表示）
+    """
+    ordinal = birth_datetime.toordinal()
+    if not _TABLE_MIN_ORDINAL <= ordinal <= _TABLE_MAX_ORDINAL:
+        return _compute_chart_reference(birth_datetime)
+
+    # 農曆日期與年柱
+    m = bisect_right(_LUNAR_MONTH_STARTS, ordinal) - 1
+    lunar_year, lunar_month = _LUNAR_MONTH_LABELS[m]
+    lunar_day = ordinal - _LUNAR_MONTH_STARTS[m] + 1
+    year_index = (lunar_year - 4) % 60
+
+    # 月柱
+    month_index = (_MONTH_PILLAR_BASE + bisect_right(_JIE_ORDINALS, ordinal) - 1) % 60
+
+    # 日柱與時柱
+    day_index = (ordinal + _DAY_PILLAR_OFFSET) % 60
+    hour = birth_datetime.hour
+    time_zhi = (hour + 1) // 2 % 12
+    day_index_exact = day_index + 1 if hour == 23 else day_index
+    time_index = (day_index_exact * 12 + time_zhi) % 60
+
+    return Chart(year_index, month_index, day_index, time_index, lunar_year, lunar_month, lunar_day)
+
+
+def _compute_chart_reference(birth_datetime: datetime) -> Chart:
+    """
+    參考實作：以 lunar_python 計算四柱，回傳格式同 _compute_chart
+
+    Args:
+        birth_datetime: 完整出生日期時間
+
+    Returns:
+        Chart: 命盤
+    """
+    # lunar_python 僅用於查表範圍外的日期，延遲載入以縮短冷啟動時間
+    from lunar_python import Solar
+
+    solar = Solar.fromYmdHms(
+        birth_datetime.year,
+        birth_datetime.month,
+        birth_datetime.day,
+        birth_datetime.hour,
+        birth_datetime.minute,
+        birth_datetime.second
+    )
+
+    lunar = solar.getLunar()
+
+    def sexagenary(gan: str, zhi: str) -> int:
+        return pillar_index(TIAN_GAN.index(gan), DI_ZHI.index(zhi))
+
+    return Chart(
+        sexagenary(lunar.getYearGan(), lunar.getYearZhi()),
+        sexagenary(lunar.getMonthGan(), lunar.getMonthZhi()),
+        sexagenary(lunar.getDayGan(), lunar.getDayZhi()),
+        sexagenary(lunar.getTimeGan(), lunar.getTimeZhi()),
+        lunar.getYear(),
+        lunar.getMonth(),
+        lunar.getDay()
+    )
+
+
+class ChartCache:
+    """
+    排盤結果 LRU 快取
+
+    四柱只在時辰與節氣交接時改變，因此以 (日期, 時辰, 節氣區段) 為鍵，
+    同一時辰內任何分鐘的查詢皆共用同一筆結果。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        初始化快取
+
+        Args:
+            maxsize: 最多保留的排盤筆數
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(birth_datetime: datetime) -> tuple:
+        """
+        計算快取鍵 (日期序數, 時辰, 節氣區段)
+
+        時辰以 0-12 表示，12 為晚子時（23 時，時干依次日起算）
+        """
+        ordinal = birth_datetime.toordinal()
+        shichen = (birth_datetime.hour + 1) // 2
+        segment = bisect_right(_JIE_ORDINALS, ordinal)
+        return (ordinal, shichen, segment)
+
+    def get(self, birth_datetime: datetime) -> Chart:
+        """取得命盤，未命中時計算並寫入快取"""
+        key = self.make_key(birth_datetime)
+        with self._lock:
+            chart = self._data.get(key)
+            if chart is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return chart
+            self.misses += 1
+
+        with track_stage("chart"):
+            chart = _compute_chart(birth_datetime)
+
+        with self._lock:
+            self._data[key] = chart
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return chart
+
+    def clear(self):
+        """清空快取與計數"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> dict:
+        """
+        獲取快取統計資訊
+
+        Returns:
+            dict: 命中數、未命中數、命中率與目前筆數
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize
+            }
+
+
+# 行程內共用（跨 Streamlit rerun 與 session）
+chart_cache = ChartCache(maxsize=int(os.environ.get("BAZI_CHART_CACHE_SIZE", "4096")))
+
+
+class SingleFlight:
+    """
+    單次飛行（single-flight）請求合併
+
+    同一鍵同時只有一個進行中的呼叫（leader），其餘請求（follower）等待並共用其結果。
+    共用結果以 concurrent.futures.Future 傳遞，執行緒與任意事件迴圈上的協程皆可等待。
+    """
+
+    def __init__(self):
+        """初始化合併器"""
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> tuple:
+        """
+        加入某鍵的呼叫
+
+        Returns:
+            tuple: (future, is_leader)；leader 完成後須呼叫 finish()
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, result=None):
+        """
+        leader 完成呼叫並通知所有 follower
+
+        Args:
+            key: 呼叫鍵
+            future: join() 回傳的 future
+            result: 共用結果；None 表示呼叫中斷，follower 會自行重試
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if result is None:
+            future.set_exception(RuntimeError("single-flight 呼叫中斷"))
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn, share=None):
+        """
+        同步執行 fn()，同鍵的並行呼叫共用同一結果
+
+        Args:
+            key: 呼叫鍵
+            fn: 無參數函數
+            share: follower 取得共用結果時套用的函數（選用，如標記結果並非自己發出的呼叫）
+
+        Returns:
+            fn() 的結果
+        """
+        future, is_leader = self.join(key)
+        if not is_leader:
+            try:
+                result = future.result()
+            except Exception:
+                return fn()
+            return share(result) if share else result
+
+        result = None
+        try:
+            result = fn()
+            return result
+        finally:
+            self.finish(key, future, result)
+
+    async def do_async(self, key: str, coro_fn, share=None):
+        """
+        非同步執行 coro_fn()，同鍵的並行呼叫共用同一結果
+
+        leader 的呼叫以獨立 task 執行，leader 被取消時不影響其他等待者。
+
+        Args:
+            key: 呼叫鍵
+            coro_fn: 回傳 coroutine 的無參數函數
+            share: follower 取得共用結果時套用的函數（同 do）
+
+        Returns:
+            coroutine 的結果
+        """
+        future, is_leader = self.join(key)
+        if is_leader:
+            task = asyncio.ensure_future(coro_fn())
+
+            def _on_done(t):
+                ok = not t.cancelled() and t.exception() is None
+                self.finish(key, future, t.result() if ok else None)
+
+            task.add_done_callback(_on_done)
+
+        try:
+            result = await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if is_leader:
+                raise
+            return await coro_fn()
+        return share(result) if share and not is_leader else result
+
+    def get_stats(self) -> dict:
+        """
+        獲取合併統計
+
+        Returns:
+            dict: 實際發出的呼叫數、被合併的請求數與目前進行中的鍵數
+        """
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+
+# AI 呼叫的請求合併（以 AI 快取鍵為鍵）
+ai_flight = SingleFlight()
+
+# 每次 LLM 呼叫的遙測欄位（未實際呼叫，如命中快取時皆為 None）
+LLM_TELEMETRY_FIELDS = (
+    "llm_model",
+    "llm_latency_ms",
+    "llm_ttft_ms",
+    "llm_prompt_tokens",
+    "llm_completion_tokens",
+    "llm_finish_reason"
+)
+
+
+def _error_result(error: str) -> dict:
+    """失敗時的結果字典（欄位同 get_fortune）"""
+    return {
+        "success": False,
+        "error": error,
+        "birth_datetime": None,
+        "lunar_date": None,
+        "year_pillar": None,
+        "month_pillar": None,
+        "day_pillar": None,
+        "time_pillar": None,
+        "day_master": None,
+        "day_master_element": None,
+        "bazi_full": None,
+        "chart": None,
+        "ai_fortune": None,
+        "ai_cached": False,
+        "ai_source": None,
+        "ai_flow_date": None,
+        **dict.fromkeys(LLM_TELEMETRY_FIELDS)
+    }
+
+
+def get_chart(birth_datetime: datetime) -> dict:
+    """
+    排盤：只計算四柱與農曆日期（毫秒級，不呼叫 AI）
+
     Args:
         birth_datetime: 完整出生日期時間 (datetime 對象)
-        
+
     Returns:
         dict: 包含以下欄位
             - birth_datetime: 完整出生時間字串
             - lunar_date: 農曆日期
-            - year_pillar: 年柱
-            - month_pillar: 月柱
-            - day_pillar: 日柱
-            - time_pillar: 時柱
+            - year_pillar / month_pillar / day_pillar / time_pillar: 四柱
             - day_master: 日主天干
             - day_master_element: 日主五行
             - bazi_full: 完整八字字串
-            - ai_fortune: AI 生成的運勢解析
+            - chart: Chart 命盤（整數編碼，供引擎內部使用）
             - success: 是否成功
             - error: 錯誤訊息（若有）
     """
-    
     try:
-        # === 步驟 1: 農曆轉換與八字計算 ===
-        solar = Solar.fromYmdHms(
-            birth_datetime.year,
-            birth_datetime.month,
-            birth_datetime.day,
-            birth_datetime.hour,
-            birth_datetime.minute,
-            birth_datetime.second
-        )
-        
-        lunar = solar.getLunar()
-        
-        # 獲取四柱干支
-        year_gan = lunar.getYearGan()
-        year_zhi = lunar.getYearZhi()
-        month_gan = lunar.getMonthGan()
-        month_zhi = lunar.getMonthZhi()
-        day_gan = lunar.getDayGan()
-        day_zhi = lunar.getDayZhi()
-        time_gan = lunar.getTimeGan()
-        time_zhi = lunar.getTimeZhi()
-        
-        # 組合四柱
-        year_pillar = f"{year_gan}{year_zhi}"
-        month_pillar = f"{month_gan}{month_zhi}"
-        day_pillar = f"{day_gan}{day_zhi}"
-        time_pillar = f"{time_gan}{time_zhi}"
-        
-        # 日主五行
-        wuxing_map = {
-            "甲": "木", "乙": "木",
-            "丙": "火", "丁": "火",
-            "戊": "土", "己": "土",
-            "庚": "金", "辛": "金",
-            "壬": "水", "癸": "水"
-        }
-        day_master_element = wuxing_map.get(day_gan, "未知")
-        
-        # 農曆日期
-        lunar_date = f"{lunar.getYearInChinese()}年{lunar.getMonthInChinese()}月{lunar.getDayInChinese()}"
-        
-        # 完整八字
-        bazi_full = f"{year_pillar} {month_pillar} {day_pillar} {time_pillar}"
-        
-        # === 步驟 2: OpenAI 命理解析 ===
-        ai_fortune = _generate_ai_fortune(
-            birth_datetime=birth_datetime,
-            lunar_date=lunar_date,
-            year_pillar=year_pillar,
-            month_pillar=month_pillar,
-            day_pillar=day_pillar,
-            time_pillar=time_pillar,
-            day_master=day_gan,
-            day_master_element=day_master_element
-        )
-        
-        # 返回結果
-        return {
-            "success": True,
-            "birth_datetime": birth_datetime.strftime("%Y年%m月%d日 %H時%M分"),
-            "lunar_date": lunar_date,
-            "year_pillar": year_pillar,
-            "month_pillar": month_pillar,
-            "day_pillar": day_pillar,
-            "time_pillar": time_pillar,
-            "day_master": day_gan,
-            "day_master_element": day_master_element,
-            "bazi_full": bazi_full,
-            "ai_fortune": ai_fortune,
-            "error": None
-        }
-        
+        # 查表排盤（依時辰快取）
+        chart = chart_cache.get(birth_datetime)
     except Exception as e:
-        return {
-            "success": False,
-            "error": f"計算失敗：{str(e)}",
-            "birth_datetime": None,
-            "lunar_date": None,
-            "year_pillar": None,
-            "month_pillar": None,
-            "day_pillar": None,
-            "time_pillar": None,
-            "day_master": None,
-            "day_master_element": None,
-            "bazi_full": None,
-            "ai_fortune": None
-        }
+        return _error_result(f"計算失敗：{str(e)}")
 
+    # 文字欄位為 Chart 的字典檢視，供 app.py 與 Logger 使用
+    return {
+        "success": True,
+        "birth_datetime": birth_datetime.strftime("%Y年%m月%d日 %H時%M分"),
+        **chart.to_dict(),
+        "chart": chart,
+        "error": None
+    }
 
-def _generate_ai_fortune(
-    birth_datetime: datetime,
-    lunar_date: str,
-    year_pillar: str,
-    month_pillar: str,
-    day_pillar: str,
-    time_pillar: str,
-    day_master: str,
-    day_master_element: str
-) -> str:
+
+def _chart_of(birth_datetime: datetime, result: dict) -> Chart:
+    """由 get_chart() 結果取出 Chart（缺少時依出生時間重新排盤）"""
+    chart = result.get("chart")
+    return chart if chart is not None else chart_cache.get(birth_datetime)
+
+
+def generate_fortune(birth_datetime: datetime, chart: dict) -> dict:
     """
-    內部函數：使用 OpenAI 生成命理解析
+    依排盤結果生成 AI 運勢解析
+
+    Args:
+        birth_datetime: 完整出生日期時間
+        chart: get_chart() 的成功結果
+
+    Returns:
+        dict: 包含以下欄位
+            - ai_fortune: AI 生成的運勢解析（失敗時為錯誤訊息）
+            - ai_cached: 是否由快取或每日預生成提供
+            - ai_source: 來源（daily / cache / live / coalesced / fallback）
+            - ai_flow_date: 解析所用的流日（DAILY_TIMEZONE 的日期，YYYY-MM-DD）
+            - llm_*: LLM 呼叫遙測（見 LLM_TELEMETRY_FIELDS）
+    """
+    return _generate_ai_fortune(birth_datetime, _chart_of(birth_datetime, chart))
+
+
+async def generate_fortune_async(birth_datetime: datetime, chart: dict) -> dict:
+    """
+    generate_fortune 的非同步版本
+
+    Returns:
+        dict: 欄位同 generate_fortune
+    """
+    return await _generate_ai_fortune_async(birth_datetime, _chart_of(birth_datetime, chart))
+
+
+def generate_fortune_stream(birth_datetime: datetime, result: dict):
+    """
+    以串流方式生成 AI 運勢解析
+
+    逐段產出文案；結束後 result["ai_fortune"]、result["ai_cached"] 與遙測欄位會被填入完整結果。
+
+    Args:
+        birth_datetime: 完整出生日期時間
+        result: get_chart() 的成功結果（會被就地更新）
+
+    Returns:
+        產出文案片段 (str) 的產生器
+    """
+    result.setdefault("ai_fortune", None)
+    result.setdefault("ai_cached", False)
+    result.setdefault("ai_source", None)
+    result.setdefault("ai_flow_date", None)
+    for field in LLM_TELEMETRY_FIELDS:
+        result.setdefault(field, None)
+    return _stream_ai_fortune(birth_datetime, _chart_of(birth_datetime, result), result)
+
+
+def get_fortune(birth_datetime: datetime) -> dict:
+    """
+    核心函數：計算八字並生成 AI 運勢解析
     
     Args:
-        各項八字資訊
+        birth_datetime: 完整出生日期時間 (datetime 對象)
         
     Returns:
-        str: AI 生成的運勢文案
+        dict: get_chart() 的欄位，另加
+            - ai_fortune: AI 生成的運勢解析
+            - ai_cached: AI 解析是否由快取或每日預生成提供
+            - ai_source: AI 解析來源（daily / cache / live / coalesced / fallback）
+            - llm_model: 實際回應的模型名稱
+            - llm_latency_ms: LLM 呼叫耗時（毫秒，不含併發排隊）
+            - llm_ttft_ms: 首個 token 抵達時間（毫秒，僅串流）
+            - llm_prompt_tokens / llm_completion_tokens: token 用量
+            - llm_finish_reason: 結束原因（stop / length 等）
     """
     
-    # 構造 Prompt
-    bazi_info = f"""
-八字四柱：
-- 年柱：{year_pillar}
-- 月柱：{month_pillar}
-- 日柱：{day_pillar}
-- 時柱：{time_pillar}
-
-日主：{day_master}（{day_master_element}行）
-出生日期：{birth_datetime.strftime("%Y年%m月%d日 %H時")}（農曆 {lunar_date}）
-"""
+    # === 步驟 1: 查表排盤 ===
+    result = get_chart(birth_datetime)
     
-    # eeasy.ai 顧問人設 System Prompt
-    system_prompt = """你是 eeasy.ai 的 AI 玄學顧問。
+    # === 步驟 2: OpenAI 命理解析 ===
+    if result["success"]:
+        result.update(generate_fortune(birth_datetime, result))
+    
+    return result
+
+
+async def get_fortune_async(birth_datetime: datetime) -> dict:
+    """
+    get_fortune 的非同步版本：等待 LLM 時不佔用執行緒
+
+    多個請求可在同一事件迴圈上並行，例如批次腳本：
+        results = await asyncio.gather(*(get_fortune_async(dt) for dt in datetimes))
+    Streamlit 中可用 asyncio.run(get_fortune_async(dt)) 呼叫。
+    LLM 呼叫於 llm_deadline 的背景事件迴圈執行（共用同一個連線池），
+    同時進行中的 LLM 呼叫數受 llm_client.llm_limiter 限制。
+
+    Args:
+        birth_datetime: 完整出生日期時間 (datetime 對象)
+
+    Returns:
+        dict: 欄位同 get_fortune
+    """
+    result = get_chart(birth_datetime)
+    if result["success"]:
+        result.update(await generate_fortune_async(birth_datetime, result))
+    return result
+
+
+def get_fortune_stream(birth_datetime: datetime) -> tuple:
+    """
+    串流版 get_fortune：立即回傳排盤結果與 AI 文案片段的產生器
+
+    逐段讀取產生器即可即時顯示文案；產生器結束後，
+    result["ai_fortune"]、result["ai_cached"] 與遙測欄位會被填入完整結果，可直接交給 Logger。
+
+    Args:
+        birth_datetime: 完整出生日期時間 (datetime 對象)
+
+    Returns:
+        tuple: (result, chunks)
+            - result: 欄位同 get_fortune（ai_fortune 於串流結束後填入）
+            - chunks: 產出文案片段 (str) 的產生器
+    """
+    result = get_chart(birth_datetime)
+    if not result["success"]:
+        return result, iter(())
+    return result, generate_fortune_stream(birth_datetime, result)
+
+
+def get_fortunes(birth_datetimes) -> dict:
+    """
+    批次排盤：以陣列運算一次計算多筆出生時間的八字（不呼叫 AI）
+
+    結果與 get_fortune 的排盤完全一致，適用於回填與數據分析。
+
+    Args:
+        birth_datetimes: datetime 列表或 numpy datetime64 陣列
+
+    Returns:
+        dict: 欄位式陣列（長度皆與輸入相同）
+            - year_index / month_index / day_index / time_index: 四柱六十甲子序號（0-59）
+            - day_master: 日主天干
+            - day_master_element: 日主五行
+            - lunar_year / lunar_month / lunar_day: 農曆年月日（閏月以負數表示）
+            - lunar_date: 農曆日期
+    """
+    if isinstance(birth_datetimes, np.ndarray) and birth_datetimes.dtype.kind == "M":
+        times = birth_datetimes.astype("datetime64[m]").reshape(-1)
+        days = times.astype("datetime64[D]")
+        ordinals = days.astype(np.int64) + _UNIX_EPOCH_ORDINAL
+        hours = (times - days) // np.timedelta64(1, "h")
+    else:
+        # datetime 列表：只取序數與小時，避免 numpy 逐筆解析 datetime 物件
+        hour_numbers = np.fromiter((dt.toordinal() * 24 + dt.hour for dt in birth_datetimes), dtype=np.int64)
+        ordinals = hour_numbers // 24
+        hours = hour_numbers % 24
+
+    in_range = (ordinals >= _TABLE_MIN_ORDINAL) & (ordinals <= _TABLE_MAX_ORDINAL)
+    table_ordinals = np.clip(ordinals, _TABLE_MIN_ORDINAL, _TABLE_MAX_ORDINAL)
+
+    # 農曆日期與年柱
+    m = np.searchsorted(_LUNAR_MONTH_STARTS_NP, table_ordinals, side="right") - 1
+    lunar_year = _LUNAR_MONTH_YEARS_NP[m]
+    lunar_month = _LUNAR_MONTH_MONTHS_NP[m]
+    lunar_day = table_ordinals - _LUNAR_MONTH_STARTS_NP[m] + 1
+    year_index = (lunar_year - 4) % 60
+
+    # 月柱
+    month_index = (_MONTH_PILLAR_BASE + np.searchsorted(_JIE_ORDINALS_NP, table_ordinals, side="right") - 1) % 60
+
+    # 日柱與時柱（五鼠遁，23 時起算次日子時）
+    day_index = (table_ordinals + _DAY_PILLAR_OFFSET) % 60
+    time_zhi = (hours + 1) // 2 % 12
+    time_index = ((day_index + (hours == 23)) * 12 + time_zhi) % 60
+
+    # 農曆日期文字
+    lunar_date = np.char.add(_LUNAR_MONTH_TEXT_NP[m], _LUNAR_DAY_NP[lunar_day]).astype(object)
+
+    # 超出查表範圍者逐筆以參考實作計算
+    for i in np.flatnonzero(~in_range):
+        chart = _compute_chart_reference(datetime.fromordinal(int(ordinals[i])).replace(hour=int(hours[i])))
+        year_index[i], month_index[i], day_index[i], time_index[i] = chart.pillars
+        lunar_year[i], lunar_month[i], lunar_day[i] = chart.lunar_year, chart.lunar_month, chart.lunar_day
+        lunar_date[i] = chart.lunar_date
+    lunar_date = lunar_date.astype(str)
+
+    return {
+        "year_index": year_index.astype(np.int8),
+        "month_index": month_index.astype(np.int8),
+        "day_index": day_index.astype(np.int8),
+        "time_index": time_index.astype(np.int8),
+        "day_master": _TIAN_GAN_NP[day_index % 10],
+        "day_master_element": _ELEMENT_NP[day_index % 10],
+        "lunar_year": lunar_year,
+        "lunar_month": lunar_month.astype(np.int8),
+        "lunar_day": lunar_day.astype(np.int8),
+        "lunar_date": lunar_date
+    }
+
+
+# ============================================================
+# AI 解析設定
+# ============================================================
+MODEL_NAME = "gpt-4.1-mini"  # 使用預設配置的模型
+
+# 修改 SYSTEM_PROMPT 或 user prompt 格式時請遞增，使舊的快取回應失效
+PROMPT_VERSION = "v1.3"
+
+# 流日以此時區的「今天」為準
+DAILY_TIMEZONE = ZoneInfo(os.environ.get("DAILY_TIMEZONE", "Asia/Taipei"))
+
+# eeasy.ai 顧問人設 System Prompt
+SYSTEM_PROMPT = """你是 eeasy.ai 的 AI 玄學顧問。
 
 你的任務：把八字（複雜數據）翻譯成現代人聽得懂的建議（簡單行動）。
 
@@ -194,43 +714,545 @@ def _generate_ai_fortune(
    - 例：「今天就是要低調，別跟人正面衝突。」
 
 記住：你不是命理大師，你是 AI 顧問，要讓複雜變簡單。"""
+
+# AI 回應快取（以命盤與流日為鍵，跨 rerun、session 與重啟共用）
+ai_cache = ResponseCache.from_env()
+
+# 每日預生成的 10 日主流日解析（由 daily_pregen.py 排程寫入）
+daily_store = DailyFortuneStore.from_env()
+
+
+def _collect_metrics() -> list:
+    """
+    輸出指標時讀取各快取、請求合併、併發限制與時限控制的統計（見 metrics.py）
+
+    Returns:
+        list: (指標名稱, 類型, 說明, [(標籤字典, 值), ...])
+    """
+    caches = {
+        "chart": chart_cache.get_stats(),
+        "ai_response": ai_cache.get_stats(),
+        "daily": daily_store.get_stats()
+    }
+    flight = ai_flight.get_stats()
+    limiter = llm_limiter.get_stats()
+    deadline = get_deadline_stats()
+    return [
+        ("easyai_cache_hits_total", "counter", "Cache hits.",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("easyai_cache_misses_total", "counter", "Cache misses.",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("easyai_cache_hit_ratio", "gauge", "Cache hit ratio since start.",
+         [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()]),
+        ("easyai_llm_coalesced_total", "counter", "LLM requests served by an in-flight identical call.",
+         [({}, flight["coalesced"])]),
+        ("easyai_llm_in_flight", "gauge", "LLM calls holding a concurrency slot.",
+         [({}, limiter["in_flight"])]),
+        ("easyai_llm_waiting", "gauge", "LLM calls waiting for a concurrency slot.",
+         [({}, limiter["waiting"])]),
+        ("easyai_llm_events_total", "counter", "LLM deadline events (calls, retries, hedges, timeouts, circuit rejections).",
+         [({"event": name}, deadline[name]) for name in
+          ("calls", "retries", "hedges", "hedge_wins", "deadline_exceeded", "circuit_rejected")]),
+        ("easyai_llm_circuit_open", "gauge", "1 when the LLM circuit breaker is open.",
+         [({}, 1 if deadline["circuit"] == "open" else 0)])
+    ]
+
+
+registry.register_collector("bazi_engine", _collect_metrics)
+
+
+def _today() -> date:
+    """流日日期（DAILY_TIMEZONE 的今天）"""
+    return datetime.now(DAILY_TIMEZONE).date()
+
+
+def get_day_pillar(day: date) -> str:
+    """
+    計算某日的日柱
+
+    Args:
+        day: 公曆日期
+
+    Returns:
+        str: 日柱干支
+    """
+    return PILLAR_TEXT[(day.toordinal() + _DAY_PILLAR_OFFSET) % 60]
+
+
+def _format_user_prompt(
+    pillars: list,
+    day_master: str,
+    day_master_element: str,
+    birth_text: str,
+    lunar_date: str,
+    today: date,
+    today_pillar: str
+) -> str:
+    """依文字欄位構造 user prompt（pillars 為年、月、日、時柱）"""
+    bazi_info = f"""
+八字四柱：
+- 年柱：{pillars[0]}
+- 月柱：{pillars[1]}
+- 日柱：{pillars[2]}
+- 時柱：{pillars[3]}
+
+日主：{day_master}（{day_master_element}行）
+出生日期：{birth_text}（農曆 {lunar_date}）
+"""
+    return f"{bazi_info}\n今日：{today.strftime('%Y年%m月%d日')}（日柱 {today_pillar}）\n\n請為此命盤進行流日運勢分析。"
+
+
+def _build_user_prompt(birth_datetime: datetime, chart: Chart, today: date, today_pillar: str) -> str:
+    """構造 user prompt"""
+    return _format_user_prompt(
+        (chart.year_pillar, chart.month_pillar, chart.day_pillar, chart.time_pillar),
+        chart.day_master,
+        chart.day_master_element,
+        birth_datetime.strftime("%Y年%m月%d日 %H時"),
+        chart.lunar_date,
+        today,
+        today_pillar
+    )
+
+
+def rebuild_user_prompt(
+    bazi_full: str,
+    day_master: str,
+    day_master_element: str,
+    birth_text: str,
+    lunar_date: str,
+    logged_at: str,
+    flow_date: str = ""
+) -> str:
+    """
+    由語料庫的一列重建當時送出的 user prompt（匯出訓練資料用）
+
+    Args:
+        bazi_full: Bazi_Chart 欄位（四柱以空白分隔）
+        day_master: Day_Master 欄位
+        day_master_element: Day_Master_Element 欄位
+        birth_text: Birth_DateTime 欄位（如 1990年01月01日 12時00分）
+        lunar_date: Lunar_Date 欄位
+        logged_at: Timestamp 欄位（伺服器本地時間；沒有 flow_date 時換算為 DAILY_TIMEZONE 的日期作為流日）
+        flow_date: Flow_Date 欄位（生成時的流日；舊版語料庫沒有此欄位）
+
+    Returns:
+        str: user prompt
+
+    Raises:
+        ValueError: 欄位格式不符
+    """
+    pillars = bazi_full.split()
+    if len(pillars) != 4:
+        raise ValueError(f"八字格式不符：{bazi_full}")
+    if flow_date:
+        today = date.fromisoformat(flow_date)
+    else:
+        # 記錄時間為伺服器本地時間，流日以 DAILY_TIMEZONE 為準
+        today = datetime.strptime(logged_at[:19], "%Y-%m-%d %H:%M:%S").astimezone(DAILY_TIMEZONE).date()
+    # prompt 中的出生時間只到時
+    if "時" in birth_text:
+        birth_text = birth_text[:birth_text.index("時") + 1]
+    return _format_user_prompt(
+        pillars, day_master, day_master_element, birth_text, lunar_date, today, get_day_pillar(today)
+    )
+
+
+def daily_meta() -> dict:
+    """預生成解析需相符的生成條件（遞增 PROMPT_VERSION 或更換模型後舊的解析失效）"""
+    return {"model": MODEL_NAME, "prompt_version": PROMPT_VERSION}
+
+
+def _build_daily_prompt(day_master: str, today: date, today_pillar: str) -> str:
+    """構造預生成用的 user prompt（僅依日主與當日日柱）"""
+    return (
+        f"\n日主：{day_master}（{WUXING_MAP[day_master]}行）\n"
+        f"今日：{today.strftime('%Y年%m月%d日')}（日柱 {today_pillar}）\n\n"
+        "請為此日主進行流日運勢分析。"
+    )
+
+
+def _lookup_ai_fortune(cache_key: str, day_master: str, today: date, today_pillar: str):
+    """
+    依序查詢每日預生成存放區與 AI 回應快取
+
+    Returns:
+        dict | None: 命中時為 _generate_ai_fortune 格式的結果
+    """
+    daily_text = daily_store.get(today, day_master, today_pillar, daily_meta())
+    if daily_text is not None:
+        return {"ai_fortune": daily_text, "ai_cached": True, "ai_source": "daily", **_llm_telemetry()}
+
+    cached_text = ai_cache.get(cache_key)
+    if cached_text is not None:
+        return {"ai_fortune": cached_text, "ai_cached": True, "ai_source": "cache", **_llm_telemetry()}
+
+    return None
+
+
+def _llm_telemetry(
+    started: float = None,
+    model: str = None,
+    usage=None,
+    finish_reason: str = None,
+    first_token_at: float = None
+) -> dict:
+    """
+    整理單次 LLM 呼叫的遙測欄位
+
+    Args:
+        started: 送出請求時的 time.perf_counter()（None 表示未呼叫）
+        model: 回應中的模型名稱
+        usage: 回應的 usage 物件
+        finish_reason: 結束原因
+        first_token_at: 首個 token 抵達時的 time.perf_counter()（串流）
+
+    Returns:
+        dict: LLM_TELEMETRY_FIELDS 欄位
+    """
+    if started is None:
+        return dict.fromkeys(LLM_TELEMETRY_FIELDS)
+    return {
+        "llm_model": model,
+        "llm_latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "llm_ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at is not None else None,
+        "llm_prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "llm_completion_tokens": getattr(usage, "completion_tokens", None),
+        "llm_finish_reason": finish_reason
+    }
+
+
+def _generate_ai_fortune(
+    birth_datetime: datetime,
+    chart: Chart
+) -> dict:
+    """
+    內部函數：使用 OpenAI 生成命理解析
     
-    user_prompt = f"{bazi_info}\n\n請為此命盤進行流日運勢分析。"
+    依序使用每日預生成解析與快取，皆未命中時才呼叫 API；
+    同一命盤已有進行中的呼叫時，等待並共用其結果。
     
+    Args:
+        birth_datetime: 完整出生日期時間
+        chart: 命盤
+        
+    Returns:
+        dict: 包含以下欄位
+            - ai_fortune: AI 生成的運勢文案（失敗時為錯誤訊息）
+            - ai_cached: 是否由快取或每日預生成提供
+            - ai_source: 來源（daily / cache / live / coalesced / fallback）
+            - ai_flow_date: 解析所用的流日（YYYY-MM-DD）
+    """
+    
+    today = _today()
+    today_pillar = get_day_pillar(today)
+    cache_key = ResponseCache.make_key(chart.bazi_full, chart.day_master, MODEL_NAME, PROMPT_VERSION, today.isoformat())
+    cached = _lookup_ai_fortune(cache_key, chart.day_master, today, today_pillar)
+    if cached is not None:
+        return {**cached, "ai_flow_date": today.isoformat()}
+    
+    # 構造 Prompt
+    with track_stage("prompt_build"):
+        user_prompt = _build_user_prompt(birth_datetime, chart, today, today_pillar)
+    
+    fallback = _fallback_fn(chart, today_pillar)
+    
+    shared = ai_flight.do(cache_key, lambda: _request_ai_fortune(cache_key, user_prompt, fallback), _coalesced)
+    return {**shared, "ai_flow_date": today.isoformat()}
+
+
+def _coalesced(shared: dict) -> dict:
+    """
+    follower 共用 leader 的結果：來源標記為 coalesced、LLM 遙測清空，
+    避免同一次呼叫在語料庫與指標中被重複計算為多次實際呼叫（規則版解析仍標記為 fallback）
+
+    Returns:
+        dict: 欄位同 _generate_ai_fortune
+    """
+    source = "coalesced" if shared["ai_source"] == "live" else shared["ai_source"]
+    return {**shared, "ai_source": source, **_llm_telemetry()}
+
+
+def _fallback_fn(chart: Chart, today_pillar: str):
+    """建立產生規則版解析的函數（僅在降級時才實際生成）"""
+    return lambda: generate_fallback_fortune(chart, today_pillar)
+
+
+def _should_fall_back(error: BaseException) -> bool:
+    """逾時、斷路或暫時性的上游錯誤改用規則版解析；設定錯誤（如 API Key）仍回報"""
+    return isinstance(error, (CircuitOpen, DeadlineExceeded)) or is_retryable(error)
+
+
+def _failure_result(error: BaseException, fallback) -> dict:
+    """
+    LLM 呼叫失敗時的結果
+
+    Returns:
+        dict: 欄位同 _generate_ai_fortune；降級時 ai_source 為 fallback
+    """
+    telemetry = getattr(error, "llm_telemetry", None) or _llm_telemetry()
+    if _should_fall_back(error):
+        return {"ai_fortune": fallback(), "ai_cached": False, "ai_source": "fallback", **telemetry}
+    return {"ai_fortune": _error_text(error), "ai_cached": False, "ai_source": "live", **telemetry}
+
+
+def _error_text(error: BaseException) -> str:
+    """LLM 呼叫失敗時顯示的錯誤訊息"""
+    return f"⚠️ AI 解析失敗：{str(error)}\n\n請檢查 API Key 設定或網路連線。"
+
+
+def _request_ai_fortune(cache_key: str, user_prompt: str, fallback) -> dict:
+    """
+    內部函數：實際呼叫 OpenAI 並寫入快取（規則版解析不寫入快取）
+
+    Returns:
+        dict: 欄位同 _generate_ai_fortune
+    """
     try:
-        # 初始化 OpenAI 客戶端（明確指定 base_url 與 api_key）
-        client = OpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY"),
-            base_url=os.environ.get("OPENAI_BASE_URL")
-        )
+        result = _call_llm(user_prompt)
+        ai_cache.set(cache_key, result["ai_fortune"])
+        return {**result, "ai_cached": False, "ai_source": "live"}
         
-        # 呼叫 GPT
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",  # 使用預設配置的模型
+    except Exception as e:
+        return _failure_result(e, fallback)
+
+
+def _call_llm(user_prompt: str) -> dict:
+    """
+    內部函數：_call_llm_async 的同步版本（於背景事件迴圈執行，以支援對沖與取消）
+    """
+    return run_sync(_call_llm_async(user_prompt))
+
+
+async def _call_llm_async(user_prompt: str) -> dict:
+    """
+    內部函數：在 LLM_DEADLINE 時限內呼叫 OpenAI（重試、對沖見 llm_deadline）
+    失敗時拋出例外，例外的 llm_telemetry 屬性記錄耗時；須於背景事件迴圈執行（run_sync / run_in_background）
+
+    Returns:
+        dict: ai_fortune（去除首尾空白的文案）與 LLM_TELEMETRY_FIELDS 欄位
+    """
+    # 取得背景事件迴圈共用的客戶端；重試由 call_with_deadline 負責
+    # 先取得 chat.completions（首次存取含 openai 延遲匯入），延遲只計算請求本身
+    completions = get_async_client().with_options(max_retries=0).chat.completions
+    
+    def request(timeout: float):
+        return completions.create(
+            model=MODEL_NAME,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.8,
-            max_tokens=600
+            max_tokens=600,
+            timeout=timeout
         )
-        
-        fortune_text = response.choices[0].message.content.strip()
-        return fortune_text
-        
+    
+    # 每個請求（含對沖）各自受全域併發上限控制
+    call_started = time.perf_counter()
+    try:
+        response, started = await call_with_deadline(request, limiter=llm_limiter, breaker=llm_circuit)
+    except Exception as e:
+        if not isinstance(e, CircuitOpen):
+            observe_stage("llm_call", time.perf_counter() - call_started, "error")
+            e.llm_telemetry = _llm_telemetry(call_started, model=MODEL_NAME)
+        raise
+    observe_stage("llm_call", time.perf_counter() - call_started)
+    
+    choice = response.choices[0]
+    return {
+        "ai_fortune": choice.message.content.strip(),
+        **_llm_telemetry(started, response.model, response.usage, choice.finish_reason)
+    }
+
+
+def generate_daily_fortune(day_master: str, day: date) -> str:
+    """
+    生成某日主在某日的流日解析（供 daily_pregen.py 預生成使用，不寫入快取）
+
+    Args:
+        day_master: 日主天干
+        day: 流日日期
+
+    Returns:
+        str: 解析文案（失敗時拋出例外）
+    """
+    return _call_llm(_build_daily_prompt(day_master, day, get_day_pillar(day)))["ai_fortune"]
+
+
+async def _generate_ai_fortune_async(
+    birth_datetime: datetime,
+    chart: Chart
+) -> dict:
+    """
+    內部函數：_generate_ai_fortune 的非同步版本（AsyncOpenAI）
+
+    Returns:
+        dict: 欄位同 _generate_ai_fortune
+    """
+    today = _today()
+    today_pillar = get_day_pillar(today)
+    cache_key = ResponseCache.make_key(chart.bazi_full, chart.day_master, MODEL_NAME, PROMPT_VERSION, today.isoformat())
+    cached = _lookup_ai_fortune(cache_key, chart.day_master, today, today_pillar)
+    if cached is not None:
+        return {**cached, "ai_flow_date": today.isoformat()}
+
+    with track_stage("prompt_build"):
+        user_prompt = _build_user_prompt(birth_datetime, chart, today, today_pillar)
+
+    fallback = _fallback_fn(chart, today_pillar)
+
+    shared = await ai_flight.do_async(
+        cache_key, lambda: _request_ai_fortune_async(cache_key, user_prompt, fallback), _coalesced
+    )
+    return {**shared, "ai_flow_date": today.isoformat()}
+
+
+async def _request_ai_fortune_async(cache_key: str, user_prompt: str, fallback) -> dict:
+    """
+    內部函數：_request_ai_fortune 的非同步版本
+
+    Returns:
+        dict: 欄位同 _generate_ai_fortune
+    """
+    try:
+        # 於背景事件迴圈呼叫，與同步路徑共用同一個 AsyncOpenAI 客戶端
+        result = await run_in_background(_call_llm_async(user_prompt))
+        ai_cache.set(cache_key, result["ai_fortune"])
+        return {**result, "ai_cached": False, "ai_source": "live"}
+
+    except Exception as e:
+        return _failure_result(e, fallback)
+
+
+def _stream_ai_fortune(
+    birth_datetime: datetime,
+    chart: Chart,
+    result: dict
+):
+    """
+    內部函數：以串流方式生成命理解析（stream=True）
+
+    逐段產出文字；結束時將完整文案寫入 result["ai_fortune"]，
+    並設定 result["ai_cached"]、result["ai_source"] 與 LLM 遙測欄位。命中每日預生成或快取，
+    或同一命盤已有進行中的呼叫時，一次產出完整文案。
+
+    Args:
+        birth_datetime: 完整出生日期時間
+        chart: 命盤
+        result: 接收完整文案的結果字典
+
+    Yields:
+        str: 文案片段
+    """
+    today = _today()
+    today_pillar = get_day_pillar(today)
+    result["ai_flow_date"] = today.isoformat()
+    cache_key = ResponseCache.make_key(chart.bazi_full, chart.day_master, MODEL_NAME, PROMPT_VERSION, today.isoformat())
+    cached = _lookup_ai_fortune(cache_key, chart.day_master, today, today_pillar)
+    if cached is not None:
+        result.update(cached)
+        yield cached["ai_fortune"]
+        return
+
+    future, is_leader = ai_flight.join(cache_key)
+    if not is_leader:
+        try:
+            shared = future.result()
+        except Exception:
+            # 共用的呼叫中途中斷，改為自行呼叫
+            shared = None
+        if shared is not None:
+            result.update(_coalesced(shared))
+            yield shared["ai_fortune"]
+            return
+
+    with track_stage("prompt_build"):
+        user_prompt = _build_user_prompt(birth_datetime, chart, today, today_pillar)
+
+    parts = []
+    shared = None
+    started = first_token_at = None
+    model = MODEL_NAME
+    usage = finish_reason = None
+    result["ai_cached"] = False
+    result["ai_source"] = "live"
+
+    def open_stream(timeout: float):
+        nonlocal started
+        # 先建立客戶端與 chat.completions（首次呼叫含 openai 延遲匯入），TTFT / 延遲只計算請求本身
+        completions = get_client().with_options(timeout=timeout, max_retries=0).chat.completions
+        started = time.perf_counter()
+        return completions.create(
+            model=MODEL_NAME,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.8,
+            max_tokens=600,
+            stream=True,
+            # 最後一個 chunk 附帶 token 用量
+            stream_options={"include_usage": True}
+        )
+
+    call_started = time.perf_counter()
+    try:
+        # 在 LLM_DEADLINE 時限內串流，首個 chunk 前的錯誤會重試；串流期間持有併發名額
+        for chunk in stream_with_deadline(open_stream, limiter=llm_limiter, breaker=llm_circuit):
+            model = chunk.model or model
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            if not parts:
+                # 與非串流版本的 strip() 一致
+                text = text.lstrip()
+                if not text:
+                    continue
+            parts.append(text)
+            yield text
+
+        fortune_text = "".join(parts).rstrip()
+        observe_stage("llm_call", time.perf_counter() - call_started)
+        ai_cache.set(cache_key, fortune_text)
+        telemetry = _llm_telemetry(started, model, usage, finish_reason, first_token_at)
+        result["ai_fortune"] = fortune_text
+        result.update(telemetry)
+        shared = {"ai_fortune": fortune_text, "ai_cached": False, "ai_source": "live", **telemetry}
+
     except Exception as e:
-        return f"⚠️ AI 解析失敗：{str(e)}\n\n請檢查 API Key 設定或網路連線。"
+        if not isinstance(e, CircuitOpen):
+            observe_stage("llm_call", time.perf_counter() - call_started, "error")
+        e.llm_telemetry = _llm_telemetry(started, model if started is not None else None, usage, finish_reason, first_token_at)
+        if parts:
+            # 已顯示部分文案時不再改用規則版，改為附上錯誤訊息
+            shared = {"ai_fortune": _error_text(e), "ai_cached": False, "ai_source": "live", **e.llm_telemetry}
+            error_text = "\n\n" + shared["ai_fortune"]
+        else:
+            shared = _failure_result(e, _fallback_fn(chart, today_pillar))
+            error_text = shared["ai_fortune"]
+        parts.append(error_text)
+        result.update(shared)
+        result["ai_fortune"] = "".join(parts)
+        yield error_text
+
+    finally:
+        # 串流被放棄（如使用者重新整理）時 shared 為 None，等待者會改為自行呼叫
+        if is_leader:
+            ai_flight.finish(cache_key, future, shared)
 
 
 # === 測試代碼 ===
 if __name__ == "__main__":
     # 測試範例
-    from datetime import date, time
-    
-    test_date = date(1990, 1, 1)
-    test_time = time(12, 0)
-    
-    result = get_fortune(test_date, test_time)
+    result = get_fortune(datetime(1990, 1, 1, 12, 0))
     
     if result["success"]:
         print("✅ 八字計算成功")
@@ -0,0 +1,105 @@
+"""
+曆法查表（由 gen_bazi_tables.py 自動生成，請勿手動修改）
+資料來源為 lunar_python，供 bazi_engine 的查表排盤使用
+
+JIE_DAYS:
+    自 JIE_FIRST_YEAR 起每個公曆年一個字串，共 12 位數字，
+    依序為 小寒、立春、驚蟄、清明、立夏、芒種、小暑、立秋、白露、寒露、立冬、大雪
+    所在的公曆日（分別落在 1 月至 12 月）
+LUNAR_YEARS:
+    自 LUNAR_FIRST_YEAR 起每個農曆年一筆 (正月初一公曆月, 正月初一公曆日, 閏月, 大小月位元)
+    閏月為 0 表示無閏月；大小月位元依月份先後（含閏月）由最低位起算，1 為大月（30 天）
+"""
+
+JIE_FIRST_YEAR = 1899
+JIE_DAYS = (
+    "546566788877", "646566788987", "646566888988", "656667888988", "657677899988", "756566788987",
+    "646566888988", "656666888988", "657677899988", "756566788987", "646566888988", "656666888988",
+    "657677899988", "756566788987", "646566888988", "646566888988", "656667889988", "656566788887",
+    "646566888988", "646566888988", "656667889988", "656566788887", "646566888987", "646566888988",
+    "656667889988", "656566788887", "646566888987", "646566888988", "656667889988", "656566788877",
+    "646566788987", "646566888988", "656667888988", "656566788877", "646566788987", "646566888988",
+    "656666888988", "656566788877", "646566788987", "646566888988", "656666888988", "656566788877",
+    "646566788987", "646566888988", "656666888988", "656556788877", "646566788887", "646566888988",
+    "646566888988", "655556778877", "546566788887", "646566888988", "646566888988", "655556778877",
+    "546566788887", "646566888987", "646566888988", "655556778877", "546566788887", "646566788987",
+    "646566888988", "655556777877", "546566788877", "646566788987", "646566888988", "655556777877",
+    "546566788877", "646566788987", "646566888988", "655555777877", "546566788877", "646566788987",
+    "646566888988", "655555777877", "546556788877", "646566788987", "646566888988", "655455777877",
+    "546556778877", "646566788887", "646566888988", "655455777877", "546556778877", "646566788887",
+    "646566888988", "645455777877", "545556778877", "546566788887", "646566788987", "645455777877",
+    "545556777877", "546566788887", "646566788987", "645455777877", "545556777877", "546566788877",
+    "646566788987", "645455777877", "545555777877", "546566788877", "646566788987", "645455777877",
+    "545555777877", "546566788877", "646566788987", "645455777877", "545555777877", "546556778877",
+    "646566788987", "645455777877", "545455777877", "546556778877", "646566788887", "645455777877",
+    "545455777877", "546556778877", "646566788887", "645455777877", "535455777877", "545556778877",
+    "546566788887", "645455677877", "535455777877", "545556777877", "546566788887", "645455677876",
+    "535455777877", "545555777877", "546566788877", "645455677876", "535455777877", "545555777877",
+    "546566788877", "645455677876", "535455777877", "545555777877", "546556778877", "645455677876",
+    "535455777877", "545555777877", "546556778877", "645455677876", "535455777877", "545455777877",
+    "546556778877", "645455677776", "535455777877", "545455777877", "546556778877", "645455677776",
+    "535455677877", "535455777877", "545556777877", "545455677776", "535455677877", "535455777877",
+    "545555777877", "545455677776", "535455677876", "535455777877", "545555777877", "545455677766",
+    "535455677876", "535455777877", "545555777877", "545455677766", "535455677876", "535455777877",
+    "545555777877", "545445667766", "535455677876", "535455777877", "545555777877", "545445667766",
+    "535455677776", "535455777877", "545455777877", "545445667766", "535455677776", "535455677877",
+    "545455777877", "545445667766", "535455677776", "535455677877", "535455777877", "544445666766",
+    "435455677776", "535455677877", "535455777877", "544444666766", "435455677776", "535455677876",
+    "535455777877", "544444666766", "435455677766", "535455677876", "535455777877", "544444666766",
+    "435455667766", "535455677876", "535455777877", "545555777877", "546556778877",
+)
+
+LUNAR_FIRST_YEAR = 1899
+LUNAR_YEARS = (
+    (2, 10, 0, 0x0ad5), (1, 31, 8, 0x16d2), (2, 19, 0, 0x0752), (2, 8, 0, 0x0ea5),
+    (1, 29, 5, 0x164a), (2, 16, 0, 0x064b), (2, 4, 0, 0x0a9b), (1, 25, 4, 0x1556),
+    (2, 13, 0, 0x056a), (2, 2, 0, 0x0b59), (1, 22, 2, 0x1752), (2, 10, 0, 0x0752),
+    (1, 30, 6, 0x1b25), (2, 18, 0, 0x0b25), (2, 6, 0, 0x0a4b), (1, 26, 5, 0x14ab),
+    (2, 14, 0, 0x02ad), (2, 3, 0, 0x056b), (1, 23, 2, 0x0b69), (2, 11, 0, 0x0da9),
+    (2, 1, 7, 0x1d92), (2, 20, 0, 0x0e92), (2, 8, 0, 0x0d25), (1, 28, 5, 0x1a4d),
+    (2, 16, 0, 0x0a56), (2, 5, 0, 0x02b6), (1, 24, 4, 0x15b5), (2, 13, 0, 0x06d4),
+    (2, 2, 0, 0x0ea9), (1, 23, 2, 0x1e92), (2, 10, 0, 0x0e92), (1, 30, 6, 0x0d26),
+    (2, 17, 0, 0x052b), (2, 6, 0, 0x0a57), (1, 26, 5, 0x12b6), (2, 14, 0, 0x0b5a),
+    (2, 4, 0, 0x06d4), (1, 24, 3, 0x0ec9), (2, 11, 0, 0x0749), (1, 31, 7, 0x1693),
+    (2, 19, 0, 0x0a93), (2, 8, 0, 0x052b), (1, 27, 6, 0x0a5b), (2, 15, 0, 0x0aad),
+    (2, 5, 0, 0x056a), (1, 25, 4, 0x1b55), (2, 13, 0, 0x0ba4), (2, 2, 0, 0x0b49),
+    (1, 22, 2, 0x1a93), (2, 10, 0, 0x0a95), (1, 29, 7, 0x152d), (2, 17, 0, 0x0536),
+    (2, 6, 0, 0x0aad), (1, 27, 5, 0x15aa), (2, 14, 0, 0x05b2), (2, 3, 0, 0x0da5),
+    (1, 24, 3, 0x1d4a), (2, 12, 0, 0x0d4a), (1, 31, 8, 0x0a95), (2, 18, 0, 0x0a97),
+    (2, 8, 0, 0x0556), (1, 28, 6, 0x0ab5), (2, 15, 0, 0x0ad5), (2, 5, 0, 0x06d2),
+    (1, 25, 4, 0x0ea5), (2, 13, 0, 0x0ea5), (2, 2, 0, 0x064a), (1, 21, 3, 0x0c97),
+    (2, 9, 0, 0x0a9b), (1, 30, 7, 0x155a), (2, 17, 0, 0x056a), (2, 6, 0, 0x0b69),
+    (1, 27, 5, 0x1752), (2, 15, 0, 0x0b52), (2, 3, 0, 0x0b25), (1, 23, 4, 0x164b),
+    (2, 11, 0, 0x0a4b), (1, 31, 8, 0x14ab), (2, 18, 0, 0x02ad), (2, 7, 0, 0x056d),
+    (1, 28, 6, 0x0b69), (2, 16, 0, 0x0da9), (2, 5, 0, 0x0d92), (1, 25, 4, 0x1d25),
+    (2, 13, 0, 0x0d25), (2, 2, 10, 0x1a4d), (2, 20, 0, 0x0a56), (2, 9, 0, 0x02b6),
+    (1, 29, 6, 0x05b5), (2, 17, 0, 0x06d5), (2, 6, 0, 0x0ea9), (1, 27, 5, 0x1e92),
+    (2, 15, 0, 0x0e92), (2, 4, 0, 0x0d26), (1, 23, 3, 0x0a56), (2, 10, 0, 0x0a57),
+    (1, 31, 8, 0x14d6), (2, 19, 0, 0x035a), (2, 7, 0, 0x06d5), (1, 28, 5, 0x16c9),
+    (2, 16, 0, 0x0749), (2, 5, 0, 0x0693), (1, 24, 4, 0x152b), (2, 12, 0, 0x052b),
+    (2, 1, 0, 0x0a5b), (1, 22, 2, 0x155a), (2, 9, 0, 0x056a), (1, 29, 7, 0x1b55),
+    (2, 18, 0, 0x0ba4), (2, 7, 0, 0x0b49), (1, 26, 5, 0x1a93), (2, 14, 0, 0x0a95),
+    (2, 3, 0, 0x052d), (1, 23, 4, 0x0aad), (2, 10, 0, 0x0ab5), (1, 31, 9, 0x15aa),
+    (2, 19, 0, 0x05d2), (2, 8, 0, 0x0da5), (1, 28, 6, 0x1d4a), (2, 16, 0, 0x0d4a),
+    (2, 5, 0, 0x0c95), (1, 25, 4, 0x152e), (2, 12, 0, 0x0556), (2, 1, 0, 0x0ab5),
+    (1, 22, 2, 0x15b2), (2, 10, 0, 0x06d2), (1, 29, 6, 0x0ea5), (2, 17, 0, 0x0725),
+    (2, 6, 0, 0x064b), (1, 26, 5, 0x0c97), (2, 13, 0, 0x0cab), (2, 3, 0, 0x055a),
+    (1, 23, 3, 0x0ad6), (2, 11, 0, 0x0b69), (1, 31, 11, 0x1752), (2, 19, 0, 0x0b52),
+    (2, 8, 0, 0x0b25), (1, 28, 6, 0x1a4b), (2, 15, 0, 0x0a4b), (2, 4, 0, 0x04ab),
+    (1, 24, 5, 0x055b), (2, 12, 0, 0x05ad), (2, 1, 0, 0x0b6a), (1, 22, 2, 0x1b52),
+    (2, 10, 0, 0x0d92), (1, 30, 7, 0x1d25), (2, 17, 0, 0x0d25), (2, 6, 0, 0x0a55),
+    (1, 26, 5, 0x14ad), (2, 14, 0, 0x04b6), (2, 2, 0, 0x05b5), (1, 23, 3, 0x0daa),
+    (2, 11, 0, 0x0ec9), (2, 1, 8, 0x1e92), (2, 19, 0, 0x0e92), (2, 8, 0, 0x0d26),
+    (1, 28, 6, 0x0a56), (2, 15, 0, 0x0a57), (2, 4, 0, 0x04d6), (1, 24, 4, 0x06d5),
+    (2, 12, 0, 0x0755), (2, 2, 0, 0x0749), (1, 21, 3, 0x0e93), (2, 9, 0, 0x0693),
+    (1, 29, 7, 0x152b), (2, 17, 0, 0x052b), (2, 5, 0, 0x0a5b), (1, 26, 5, 0x155a),
+    (2, 14, 0, 0x056a), (2, 3, 0, 0x0b65), (1, 23, 4, 0x174a), (2, 11, 0, 0x0b4a),
+    (1, 31, 8, 0x1a95), (2, 19, 0, 0x0a95), (2, 7, 0, 0x052d), (1, 27, 6, 0x0aad),
+    (2, 15, 0, 0x0ab5), (2, 5, 0, 0x05aa), (1, 24, 4, 0x0ba5), (2, 12, 0, 0x0da5),
+    (2, 2, 0, 0x0d4a), (1, 22, 3, 0x1c95), (2, 9, 0, 0x0c96), (1, 29, 7, 0x194e),
+    (2, 17, 0, 0x0556), (2, 6, 0, 0x0ab5), (1, 26, 5, 0x15b2), (2, 14, 0, 0x06d2),
+    (2, 3, 0, 0x0ea5), (1, 24, 4, 0x0e4a), (2, 10, 0, 0x068b), (1, 30, 8, 0x0c97),
+    (2, 18, 0, 0x04ab), (2, 7, 0, 0x055b), (1, 27, 6, 0x0ad6), (2, 15, 0, 0x0b6a),
+    (2, 5, 0, 0x0752), (1, 25, 4, 0x1725), (2, 12, 0, 0x0b45), (2, 1, 0, 0x0a8b),
+    (1, 21, 2, 0x149b), (2, 9, 0, 0x04ab), (1, 29, 7, 0x095b),
+)
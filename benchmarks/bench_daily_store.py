@@ -0,0 +1,102 @@
+"""
+每日預生成存放區基準測試
+以替身 LLM 預生成 10 個日主的流日解析，量測 DailyFortuneStore.get 的查詢延遲，
+並確認遞增 PROMPT_VERSION 後舊的解析不再命中、重新執行預生成會重新生成
+
+用法：
+    python benchmarks/bench_daily_store.py [查詢次數]
+"""
+
+from contextlib import redirect_stdout
+from datetime import date
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_standin import StandInServer
+
+
+def _requests(server: StandInServer) -> int:
+    return server.get_stats()["requests"]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workdir = tempfile.mkdtemp(prefix="bench_daily_")
+    server = StandInServer({"latency": "fixed:0.01"}).start()
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=server.base_url,
+        DAILY_FORTUNE_DIR=os.path.join(workdir, "daily_fortunes")
+    )
+    try:
+        import bazi_engine
+        from bazi_engine import TIAN_GAN, daily_meta, daily_store, get_day_pillar
+        from daily_pregen import pregenerate_day
+
+        day = date(2026, 1, 1)
+        pillar = get_day_pillar(day)
+
+        with redirect_stdout(io.StringIO()):
+            pregenerate_day(day)
+        generated = _requests(server)
+        with redirect_stdout(io.StringIO()):
+            pregenerate_day(day)
+        rerun = _requests(server) - generated
+
+        samples = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            daily_store.get(day, TIAN_GAN[i % 10], pillar, daily_meta())
+            samples.append(time.perf_counter() - t0)
+        hits = sum(daily_store.get(day, stem, pillar, daily_meta()) is not None for stem in TIAN_GAN)
+
+        # 遞增 Prompt 版本：舊解析視為未命中，重新執行預生成時全部重新生成
+        bazi_engine.PROMPT_VERSION += "-bench"
+        stale_hits = sum(daily_store.get(day, stem, pillar, daily_meta()) is not None for stem in TIAN_GAN)
+        before = _requests(server)
+        with redirect_stdout(io.StringIO()):
+            pregenerate_day(day)
+        regenerated = _requests(server) - before
+        fresh_hits = sum(daily_store.get(day, stem, pillar, daily_meta()) is not None for stem in TIAN_GAN)
+
+        # 只在檔案層級記錄 meta 的舊檔：各日主沿用檔案層級的模型與 Prompt 版本
+        legacy_day = date(2026, 1, 2)
+        legacy_pillar = get_day_pillar(legacy_day)
+        with open(os.path.join(workdir, "daily_fortunes", f"{legacy_day.isoformat()}.json"), "w", encoding="utf-8") as f:
+            json.dump({"date": legacy_day.isoformat(), **daily_meta(),
+                       "fortunes": {"甲": {"day_pillar": legacy_pillar, "text": "舊檔"}}}, f, ensure_ascii=False)
+        legacy_hit = daily_store.get(legacy_day, "甲", legacy_pillar, daily_meta()) == "舊檔"
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    samples.sort()
+    print(f"DailyFortuneStore.get（{n:,} 次）：p50 {statistics.median(samples) * 1e6:.2f} µs | "
+          f"p99 {samples[int(n * 0.99) - 1] * 1e6:.2f} µs")
+    print(f"預生成 {generated} 次 LLM 呼叫 | 重新執行 {rerun} 次 | 遞增版本後重新生成 {regenerated} 次")
+
+    checks = [
+        ("預生成 10 個日主並全部命中", generated == len(TIAN_GAN) and hits == len(TIAN_GAN)),
+        ("版本未變時重新執行預生成不呼叫 LLM", rerun == 0),
+        ("遞增 PROMPT_VERSION 後舊的解析視為未命中", stale_hits == 0),
+        ("遞增 PROMPT_VERSION 後預生成重新生成全部日主", regenerated == len(TIAN_GAN) and fresh_hits == len(TIAN_GAN)),
+        ("只有檔案層級 meta 的舊檔仍可命中", legacy_hit)
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
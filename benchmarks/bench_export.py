@@ -0,0 +1,164 @@
+"""
+語料匯出基準測試
+在 1M 筆 CSV 語料庫上量測 FortuneLogger.export_to_text / export_to_jsonl 的吞吐量（筆/秒）與峰值記憶體，
+並與舊版「pandas 載入整個 CSV 後 iterrows()」比較；各項在獨立的子行程執行，峰值記憶體互不影響
+
+用法：
+    python benchmarks/bench_export.py [--rows 1000000] [--legacy-rows 100000] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import csv
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart import ELEMENTS, STEM_ELEMENT, TIAN_GAN
+from logger import CSV_COLUMNS, FortuneLogger
+
+AI_OUTPUT = (
+    "**本質分析**\n你的日主像一盞燒得正旺的燈，底子本來就厚。" * 6
+    + "\n\n**行動建議**\n- 穿什麼：紅色。\n- 往哪走：南方。\n- 吃什麼：熱湯。"
+    + "\n\n**一句話總結**\n今天適合輸出。"
+)
+
+
+def _seed(csv_path: str, rows: int):
+    """寫入 rows 筆資料（日主輪流）"""
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        for i in range(rows):
+            stem = i % 10
+            writer.writerow([
+                f"2026-01-{i % 28 + 1:02d} 08:00:00", "1990年01月01日 12時00分", "一九八九年腊月初五",
+                f"己巳 丙子 {TIAN_GAN[stem]}寅 甲午", TIAN_GAN[stem], ELEMENTS[STEM_ELEMENT[stem]], AI_OUTPUT,
+                "gpt-4.1-mini", 1234.5, "", 420, 610, "stop", f"2026-01-{i % 28 + 1:02d}"
+            ])
+
+
+def _fallback_excluded(workdir: str) -> bool:
+    """預設匯出時略過規則版解析等非 LLM 輸出（LLM_Model 為空）的記錄"""
+    csv_path = os.path.join(workdir, "mixed.csv")
+    output_path = os.path.join(workdir, "mixed.jsonl")
+    _seed(csv_path, 1)
+    with open(csv_path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerow([
+            "2026-01-02 08:00:00", "1990年01月01日 12時00分", "一九八九年腊月初五", "己巳 丙子 甲寅 甲午",
+            "甲", "木", "規則版解析", "", "", "", "", "", "", "2026-01-02"
+        ])
+    with redirect_stdout(io.StringIO()):
+        ok = FortuneLogger(csv_path).export_to_jsonl(output_path)
+    with open(output_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    return ok and len(lines) == 1 and "規則版解析" not in lines[0]
+
+
+def _legacy_export(csv_path: str, output_path: str):
+    """舊版匯出：pandas 載入整個 CSV 後以 iterrows() 逐列寫入"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    with open(output_path, "w", encoding="utf-8") as f:
+        for _, row in df.iterrows():
+            f.write(f"=== 八字: {row['Bazi_Chart']} ===\n")
+            f.write(f"日主: {row['Day_Master']} ({row['Day_Master_Element']}行)\n")
+            f.write(f"出生: {row['Birth_DateTime']}\n")
+            f.write(f"農曆: {row['Lunar_Date']}\n")
+            f.write(f"\n【運勢解析】\n{row['AI_Output']}\n")
+            f.write("\n" + "=" * 50 + "\n\n")
+
+
+def _run(args):
+    """子行程：執行一種匯出，回傳耗時與峰值記憶體增量"""
+    kind, csv_path, output_path = args
+    if kind == "jsonl":
+        # 匯入成本不計入匯出時間
+        importlib.import_module("bazi_engine")
+    with redirect_stdout(io.StringIO()):
+        logger = FortuneLogger(csv_path)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        if kind == "text":
+            ok = logger.export_to_text(output_path)
+        elif kind == "jsonl":
+            ok = logger.export_to_jsonl(output_path)
+        else:
+            _legacy_export(csv_path, output_path)
+            ok = True
+        seconds = time.perf_counter() - t0
+    if not ok:
+        raise RuntimeError(f"{kind} 匯出失敗")
+    return {
+        "seconds": round(seconds, 2),
+        "peak_rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+        "output_mb": round(os.path.getsize(output_path) / 1024 / 1024, 1)
+    }
+
+
+def _measure(kind: str, csv_path: str, output_path: str, rows: int) -> dict:
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        result = pool.apply(_run, ((kind, csv_path, output_path),))
+    os.remove(output_path)
+    return {"rows": rows, **result, "rows_per_sec": round(rows / result["seconds"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="export_to_text / export_to_jsonl 基準測試")
+    parser.add_argument("--rows", type=int, default=1000000, help="語料庫筆數")
+    parser.add_argument("--legacy-rows", type=int, default=100000, help="舊版匯出的語料庫筆數（0 表示略過）")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+
+    report = {}
+    workdir = tempfile.mkdtemp(prefix="bench_export_")
+    try:
+        small = os.path.join(workdir, "small.csv")
+        large = os.path.join(workdir, "large.csv")
+        fallback_excluded = _fallback_excluded(workdir)
+        small_rows = args.legacy_rows or min(args.rows, 100000)
+        _seed(small, small_rows)
+        _seed(large, args.rows)
+        print(f"語料庫：{args.rows:,} 筆（{os.path.getsize(large) / 1024 / 1024:.0f} MB）")
+
+        runs = [("text", small, small_rows), ("text", large, args.rows), ("jsonl", small, small_rows), ("jsonl", large, args.rows)]
+        if args.legacy_rows:
+            runs.insert(0, ("legacy", small, small_rows))
+        for kind, csv_path, rows in runs:
+            result = _measure(kind, csv_path, os.path.join(workdir, f"out_{kind}"), rows)
+            report.setdefault(kind, []).append(result)
+            print(f"  {kind:6s} {rows:>9,} 筆 | {result['rows_per_sec']:>8,} 筆/秒 | {result['seconds']:6.2f} 秒 | "
+                  f"峰值記憶體增加 {result['peak_rss_growth_mb']:7.1f} MB | 輸出 {result['output_mb']:7.1f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    checks = [
+        (f"{kind} 記憶體用量不隨語料庫成長（大 / 小語料庫峰值增量 < 2 倍 + 10 MB）",
+         report[kind][1]["peak_rss_growth_mb"] < report[kind][0]["peak_rss_growth_mb"] * 2 + 10)
+        for kind in ("text", "jsonl")
+    ]
+    checks.append(("export_to_jsonl 預設略過非 LLM 輸出（規則版解析）的記錄", fallback_excluded))
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
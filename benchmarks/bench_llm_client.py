@@ -0,0 +1,67 @@
+"""
+OpenAI 客戶端效能基準測試
+以本地替身伺服器比較「每次建立客戶端」與「共用連線池客戶端」的請求延遲
+
+用法：
+    python benchmarks/bench_llm_client.py [請求數]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import create_client, load_config
+from llm_standin import StandInServer
+
+
+def _request(client):
+    client.chat.completions.create(
+        model="gpt-4.1-mini",
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1
+    )
+
+
+def _measure(n: int, make_client) -> list:
+    """回傳每次請求的延遲（毫秒）"""
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        _request(make_client())
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def _report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label}: 平均 {statistics.mean(latencies):6.2f} ms | p50 {statistics.median(latencies):6.2f} ms | p95 {p95:6.2f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # 替身伺服器不加延遲，只量測客戶端本身的成本
+    server = StandInServer({"latency": "fixed:0", "response": "測試回應"}).start()
+
+    config = load_config()
+    config.update(api_key="bench", base_url=server.base_url)
+
+    per_call = _measure(n, lambda: create_client(config))
+
+    pooled_client = create_client(config)
+    pooled = _measure(n, lambda: pooled_client)
+
+    server.shutdown()
+    server.server_close()
+
+    print(f"請求數: {n}（本地替身伺服器，不含 TLS 握手）")
+    _report("每次建立客戶端", per_call)
+    _report("共用連線池客戶端", pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+LLM 時限控制驗證與基準測試
+以注入延遲與錯誤的本地替身伺服器驗證 llm_deadline：
+每次呼叫不超過時限、可恢復的錯誤會重試、對沖能壓低長尾延遲、落後的請求會被取消
+
+用法：
+    python benchmarks/bench_llm_deadline.py [每組呼叫數]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_standin import StandInServer
+
+DEADLINE = 1.0
+FAST_LATENCY = 0.05
+SLOW_LATENCY = 3.0
+SLOW_RATE = 0.05
+ERROR_RATE = 0.05
+
+
+def _run_scenario(server: StandInServer, label: str, n: int, hedge: bool) -> dict:
+    import bazi_engine
+    import llm_deadline
+
+    os.environ["LLM_HEDGE"] = "1" if hedge else "0"
+    llm_deadline.llm_latency = llm_deadline.LatencyTracker()
+    server.reset_stats()
+    before = llm_deadline.get_stats()
+
+    # 暖機：累積延遲樣本，供對沖計算 p95
+    for _ in range(30):
+        try:
+            bazi_engine._call_llm("ping")
+        except Exception:
+            pass
+
+    latencies = []
+    failures = 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            bazi_engine._call_llm("ping")
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - t0)
+
+    time.sleep(0.1)
+    after = llm_deadline.get_stats()
+    server_stats = server.get_stats()
+    latencies.sort()
+    return {
+        "label": label,
+        "success_rate": 1 - failures / n,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "retries": after["retries"] - before["retries"],
+        "hedges": after["hedges"] - before["hedges"],
+        "hedge_wins": after["hedge_wins"] - before["hedge_wins"],
+        "deadline_exceeded": after["deadline_exceeded"] - before["deadline_exceeded"],
+        "server_abandoned": server_stats["abandoned"],
+        "server_errors": server_stats["errors"] + server_stats["rate_limited"]
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    random.seed(7)
+
+    # 注入延遲（5% 落在長尾）與錯誤（各 2.5% 回傳 500 / 429）
+    server = StandInServer({
+        "latency": f"uniform:{FAST_LATENCY * 0.8},{FAST_LATENCY * 1.2}",
+        "tail_rate": SLOW_RATE,
+        "tail_latency": SLOW_LATENCY,
+        "error_rate": ERROR_RATE / 2,
+        "rate_limit_rate": ERROR_RATE / 2,
+        "response": "測試回應"
+    }).start()
+
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=server.base_url,
+        LLM_DEADLINE=str(DEADLINE),
+        LLM_MAX_ATTEMPTS="3",
+        LLM_RETRY_BASE_DELAY="0.02",
+        LLM_RETRY_MAX_DELAY="0.2"
+    )
+
+    results = [
+        _run_scenario(server, "僅重試", n, hedge=False),
+        _run_scenario(server, "重試 + 對沖", n, hedge=True)
+    ]
+    server.shutdown()
+    server.server_close()
+
+    print(f"每組 {n} 次呼叫 | 時限 {DEADLINE:g}s | 長尾 {SLOW_RATE:.0%} × {SLOW_LATENCY:g}s | 錯誤 {ERROR_RATE:.0%}")
+    for r in results:
+        print(
+            f"{r['label']:8s} 成功率 {r['success_rate']:6.1%} | p50 {r['p50_ms']:7.1f} ms | "
+            f"p99 {r['p99_ms']:7.1f} ms | max {r['max_ms']:7.1f} ms | 重試 {r['retries']} | "
+            f"對沖 {r['hedges']}（勝出 {r['hedge_wins']}）| 逾時 {r['deadline_exceeded']} | "
+            f"伺服器端取消 {r['server_abandoned']}"
+        )
+
+    retry_only, hedged = results
+    checks = [
+        ("每次呼叫不超過時限", all(r["max_ms"] <= DEADLINE * 1000 + 100 for r in results)),
+        ("注入的錯誤經重試後成功", retry_only["retries"] > 0 and retry_only["success_rate"] >= 1 - SLOW_RATE * 2),
+        ("對沖壓低 p99", hedged["p99_ms"] < retry_only["p99_ms"]),
+        ("落後的請求被取消", hedged["server_abandoned"] >= hedged["hedge_wins"] > 0)
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+寫入佇列基準測試
+比較同步寫入與經 WriteBehindLogger 排入的單筆延遲（模擬慢速 sink 與實際 FortuneLogger），
+並確認批次成形、各滿載策略的捨棄行為，以及 close() 會寫完佇列中的記錄
+
+用法：
+    python benchmarks/bench_log_queue.py [--records 500] [--sink-latency 0.02] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gsheets_logger import HEADERS, GoogleSheetsLogger
+from log_queue import WriteBehindLogger
+from logger import FortuneLogger
+
+RECORD = {
+    "success": True,
+    "birth_datetime": "1990年01月01日 12時00分",
+    "lunar_date": "一九八九年腊月初五",
+    "bazi_full": "己巳 丙子 丙寅 甲午",
+    "day_master": "丙",
+    "day_master_element": "火",
+    "ai_fortune": "**本質分析**\n你的日主是丙火，像一盞燒得正旺的燈。" * 8,
+    "llm_model": "gpt-4.1-mini",
+    "llm_latency_ms": 1234.5
+}
+
+
+class SlowSink:
+    """模擬遠端寫入：每次呼叫固定延遲（與筆數無關，類似一次 API 往返）"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.records = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, batch: list) -> bool:
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.records += len(batch)
+        return True
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def _time_calls(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn(RECORD)
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def bench_slow_sink(records: int, latency: float) -> dict:
+    """慢速 sink：同步寫入 vs 排入佇列"""
+    sink = SlowSink(latency)
+    sync_n = min(records, 50)
+    sync = _time_calls(lambda r: sink([r]), sync_n)
+
+    sink = SlowSink(latency)
+    queue = WriteBehindLogger("bench_slow", sink, maxsize=records * 2, batch_size=50, flush_interval=0.2)
+    submit = _time_calls(queue.submit, records)
+    t0 = time.perf_counter()
+    flushed = queue.close(timeout=60)
+    drain_s = time.perf_counter() - t0
+    stats = queue.get_stats()
+    return {
+        "sink_latency_ms": latency * 1000,
+        "sync": sync,
+        "submit": submit,
+        "drain_ms": round(drain_s * 1000, 1),
+        "flushed": flushed,
+        "sink_calls": sink.calls,
+        "written": stats["written"],
+        "records": records
+    }
+
+
+def bench_csv(records: int, workdir: str) -> dict:
+    """實際 FortuneLogger：同步 log_fortune vs 排入佇列"""
+    csv_path = os.path.join(workdir, "corpus_queue.csv")
+    with redirect_stdout(io.StringIO()):
+        logger = FortuneLogger(csv_path, fsync_policy="always")
+        sync = _time_calls(logger.log_fortune, records)
+        queue = WriteBehindLogger("bench_csv", logger.log_fortunes, maxsize=records * 2, batch_size=50, flush_interval=0.2)
+        submit = _time_calls(queue.submit, records)
+        flushed = queue.close(timeout=60)
+        total = logger.get_stats()["total_records"]
+    return {
+        "sync": sync,
+        "submit": submit,
+        "flushed": flushed,
+        "batches": queue.get_stats()["batches"],
+        "expected_rows": records * 2,
+        "actual_rows": total
+    }
+
+
+class FlakySheet:
+    """模擬 Google Sheets 工作表：第一次 append_rows 寫入部分資料列後逾時（請求已在伺服器端完成一部分）"""
+
+    def __init__(self):
+        self.rows = []
+        self.failures = 1
+
+    def append_rows(self, rows):
+        if self.failures:
+            self.failures -= 1
+            self.rows.extend(rows[:len(rows) // 2])
+            raise TimeoutError("模擬回應逾時")
+        self.rows.extend(rows)
+
+    def col_values(self, col):
+        return [HEADERS[col - 1]] + [row[col - 1] for row in self.rows]
+
+
+def check_sheets_retry(records: int = 20) -> dict:
+    """Google Sheets 寫入逾時但已寫入部分資料列時，佇列重試不會重複寫入"""
+    sheets = GoogleSheetsLogger(credentials_json="{}", sheet_url="bench")
+    sheets.worksheet = FlakySheet()
+    with redirect_stdout(io.StringIO()):
+        queue = WriteBehindLogger("bench_sheets", sheets.log_fortunes, batch_size=records, flush_interval=0.01, retry_delay=0)
+        for i in range(records):
+            queue.submit({**RECORD, "n": i})
+        queue.close(timeout=10)
+    stats = queue.get_stats()
+    return {
+        "records": records,
+        "rows": len(sheets.worksheet.rows),
+        "unique_rows": len({row[-1] for row in sheets.worksheet.rows}),
+        "retries": stats["retries"]
+    }
+
+
+def check_policies() -> dict:
+    """佇列上限 10、sink 卡住時送入 30 筆：各策略的排入 / 捨棄筆數與留下的記錄"""
+    results = {}
+    for policy in ("block", "drop_new", "drop_oldest"):
+        gate = threading.Event()
+        written = []
+
+        def sink(batch, gate=gate, written=written):
+            gate.wait()
+            written.extend(record["n"] for record in batch)
+            return True
+
+        queue = WriteBehindLogger(
+            f"bench_{policy}", sink, maxsize=10, batch_size=10, flush_interval=0.01,
+            policy=policy, block_timeout=0.01
+        )
+        time.sleep(0.05)
+        queue.submit({"n": -1})  # 由 worker 取走後卡在 sink
+        time.sleep(0.05)
+        accepted = sum(queue.submit({"n": i}) for i in range(30))
+        gate.set()
+        queue.close(timeout=10)
+        stats = queue.get_stats()
+        results[policy] = {
+            "accepted": accepted,
+            "dropped": stats["dropped"],
+            "written": stats["written"],
+            "first_kept": min(n for n in written if n >= 0),
+            "last_kept": max(written)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WriteBehindLogger 基準測試")
+    parser.add_argument("--records", type=int, default=500, help="每項量測的記錄數")
+    parser.add_argument("--sink-latency", type=float, default=0.02, help="模擬 sink 每次呼叫的延遲（秒）")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+
+    report = {}
+    workdir = tempfile.mkdtemp(prefix="bench_log_queue_")
+    try:
+        print(f"慢速 sink（每次 {args.sink_latency * 1000:g} ms）")
+        report["slow_sink"] = r = bench_slow_sink(args.records, args.sink_latency)
+        print(f"  同步 p50 {r['sync']['p50_ms']:8.3f} ms | 排入 p50 {r['submit']['p50_ms']:8.3f} ms / "
+              f"p99 {r['submit']['p99_ms']:8.3f} ms | {r['records']} 筆分 {r['sink_calls']} 批寫入 | "
+              f"close 耗時 {r['drain_ms']:.1f} ms")
+
+        print("FortuneLogger（fsync=always）")
+        report["csv"] = r = bench_csv(args.records, workdir)
+        print(f"  同步 p50 {r['sync']['p50_ms']:8.3f} ms | 排入 p50 {r['submit']['p50_ms']:8.3f} ms / "
+              f"p99 {r['submit']['p99_ms']:8.3f} ms | {r['batches']} 批 | 實際 {r['actual_rows']} 筆")
+
+        print("Google Sheets 寫入逾時後重試（第一次寫入部分資料列後逾時）")
+        report["sheets_retry"] = r = check_sheets_retry()
+        print(f"  送入 {r['records']} 筆 | 重試 {r['retries']} 次 | 工作表 {r['rows']} 列（不重複 {r['unique_rows']} 列）")
+
+        print("滿載策略（上限 10，sink 卡住時送入 30 筆）")
+        report["policies"] = check_policies()
+        for policy, r in report["policies"].items():
+            print(f"  {policy:12s} 排入 {r['accepted']:2d} | 捨棄 {r['dropped']:2d} | 寫入 {r['written']:2d} | "
+                  f"保留 #{r['first_kept']}–#{r['last_kept']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    slow, corpus, policies, retry = report["slow_sink"], report["csv"], report["policies"], report["sheets_retry"]
+    checks = [
+        ("排入延遲遠低於同步寫入（p99 < sink 延遲的 1/10）", slow["submit"]["p99_ms"] < slow["sink_latency_ms"] / 10),
+        ("記錄批次寫入（sink 呼叫次數 < 記錄數的 1/10）", slow["sink_calls"] < slow["records"] / 10),
+        ("close() 寫完佇列中的記錄", slow["flushed"] and slow["written"] == slow["records"]),
+        ("FortuneLogger 經佇列寫入沒有遺失資料", corpus["actual_rows"] == corpus["expected_rows"]),
+        ("Google Sheets 部分寫入後重試不重複也不遺失", retry["retries"] >= 1 and retry["rows"] == retry["unique_rows"] == retry["records"]),
+        ("drop_new 保留最早的記錄", policies["drop_new"]["last_kept"] < 29),
+        ("drop_oldest 保留最新的記錄", policies["drop_oldest"]["last_kept"] == 29 and policies["drop_oldest"]["first_kept"] > 0),
+        ("佇列滿時不超過上限（各策略寫入 = 上限 10 + 卡住的 1 筆）", all(r["written"] == 11 for r in policies.values()))
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+語料庫寫入基準測試
+量測 FortuneLogger.log_fortune 在 1k / 100k / 1M 筆語料庫上的單筆寫入延遲（各 fsync 策略）
+與 get_stats 延遲（首次建立統計紀錄，以及之後每次呼叫），並與舊版「讀取全部 → concat → 整檔重寫」比較；另以多個行程同時寫入，確認沒有遺失資料
+
+用法：
+    python benchmarks/bench_logger_append.py [--sizes 1000,100000,1000000] [--writes 200] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import csv
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import CSV_COLUMNS, FortuneLogger
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+LEGACY_SIZES = (1000, 10000)
+
+RECORD = {
+    "success": True,
+    "birth_datetime": "1990年01月01日 12時00分",
+    "lunar_date": "一九八九年腊月初五",
+    "bazi_full": "己巳 丙子 丙寅 甲午",
+    "day_master": "丙",
+    "day_master_element": "火",
+    "ai_fortune": "**本質分析**\n你的日主是丙火，像一盞燒得正旺的燈。" * 8 + "\n\n**一句話總結**\n今天適合輸出。",
+    "llm_model": "gpt-4.1-mini",
+    "llm_latency_ms": 1234.5,
+    "llm_ttft_ms": None,
+    "llm_prompt_tokens": 420,
+    "llm_completion_tokens": 610,
+    "llm_finish_reason": "stop"
+}
+
+
+def _seed(csv_path: str, rows: int):
+    """以重複區塊快速寫入 rows 筆資料"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow([
+        "2026-01-01 00:00:00", RECORD["birth_datetime"], RECORD["lunar_date"], RECORD["bazi_full"],
+        RECORD["day_master"], RECORD["day_master_element"], RECORD["ai_fortune"], RECORD["llm_model"],
+        RECORD["llm_latency_ms"], "", RECORD["llm_prompt_tokens"], RECORD["llm_completion_tokens"],
+        RECORD["llm_finish_reason"]
+    ])
+    row = buffer.getvalue().encode("utf-8")
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        csv.writer(f, lineterminator="\n").writerow(CSV_COLUMNS)
+    with open(csv_path, "ab") as f:
+        block = row * 1000
+        for _ in range(rows // 1000):
+            f.write(block)
+        f.write(row * (rows % 1000))
+
+
+def _legacy_log(csv_path: str, record: dict):
+    """舊版寫入方式：讀取整個語料庫、concat 後整檔重寫"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, encoding="utf-8-sig")
+    df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def _time_appends(csv_path: str, writes: int, policy: str) -> dict:
+    logger = FortuneLogger(csv_path, fsync_policy=policy)
+    samples = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(writes):
+            t0 = time.perf_counter()
+            if not logger.log_fortune(RECORD):
+                raise RuntimeError("log_fortune 失敗")
+            samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def _time_stats(csv_path: str) -> dict:
+    """首次呼叫（無統計紀錄，需掃描一次）與之後呼叫的 get_stats 延遲"""
+    with redirect_stdout(io.StringIO()):
+        logger = FortuneLogger(csv_path)
+        t0 = time.perf_counter()
+        logger.get_stats()
+        first = time.perf_counter() - t0
+        samples = []
+        for _ in range(200):
+            t0 = time.perf_counter()
+            logger.get_stats()
+            samples.append(time.perf_counter() - t0)
+        # 新的行程 / 實例：讀取統計紀錄
+        t0 = time.perf_counter()
+        FortuneLogger(csv_path).get_stats()
+        fresh = time.perf_counter() - t0
+    return {"first_ms": round(first * 1000, 3), "fresh_instance_ms": round(fresh * 1000, 3), **_summary(samples)}
+
+
+def _concurrent_worker(args):
+    csv_path, writes, legacy = args
+    logger = FortuneLogger(csv_path, fsync_policy="never")
+    record = {column: "" for column in CSV_COLUMNS}
+    with redirect_stdout(io.StringIO()):
+        for _ in range(writes):
+            if legacy:
+                try:
+                    _legacy_log(csv_path, record)
+                except Exception:
+                    pass  # 讀到寫到一半的檔案
+            else:
+                logger.log_fortune(RECORD)
+
+
+def _count_rows(csv_path: str) -> int:
+    import pandas as pd
+
+    try:
+        return len(pd.read_csv(csv_path, encoding="utf-8-sig"))
+    except Exception:
+        return -1
+
+
+def _concurrency_check(workdir: str, processes: int, writes: int, legacy: bool) -> dict:
+    csv_path = os.path.join(workdir, f"concurrent_{'legacy' if legacy else 'append'}.csv")
+    with redirect_stdout(io.StringIO()):
+        FortuneLogger(csv_path)
+    with multiprocessing.Pool(processes) as pool:
+        pool.map(_concurrent_worker, [(csv_path, writes, legacy)] * processes)
+    return {"expected": processes * writes, "actual": _count_rows(csv_path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FortuneLogger 附加寫入基準測試")
+    parser.add_argument("--sizes", help="語料庫筆數（逗號分隔），預設 1000,100000,1000000")
+    parser.add_argument("--writes", type=int, default=200, help="每個大小量測的寫入次數")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else list(DEFAULT_SIZES)
+
+    report = {"append": [], "legacy": []}
+    workdir = tempfile.mkdtemp(prefix="bench_logger_")
+    try:
+        print(f"附加寫入（每個大小 {args.writes} 次）")
+        for size in sizes:
+            entry = {"rows": size}
+            csv_path = os.path.join(workdir, f"corpus_{size}.csv")
+            _seed(csv_path, size)
+            entry["get_stats"] = _time_stats(csv_path)
+            for policy in ("never", "interval", "always"):
+                entry[policy] = _time_appends(csv_path, args.writes, policy)
+            entry["file_size_mb"] = round(os.path.getsize(csv_path) / 1024 / 1024, 1)
+            os.remove(csv_path)
+            os.remove(f"{csv_path}.meta.json")
+            report["append"].append(entry)
+            print(f"  {size:>8} 筆（{entry['file_size_mb']:7.1f} MB）| "
+                  + " | ".join(f"{p} p50 {entry[p]['p50_ms']:6.3f} ms / p99 {entry[p]['p99_ms']:6.3f} ms"
+                               for p in ("never", "interval", "always")))
+            stats = entry["get_stats"]
+            print(f"  {'':>8}   get_stats 首次 {stats['first_ms']:9.1f} ms | 之後 p50 {stats['p50_ms']:6.3f} ms | "
+                  f"新實例 {stats['fresh_instance_ms']:6.3f} ms")
+
+        print("舊版整檔重寫（對照）")
+        for size in LEGACY_SIZES:
+            csv_path = os.path.join(workdir, f"legacy_{size}.csv")
+            _seed(csv_path, size)
+            samples = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                _legacy_log(csv_path, {column: "" for column in CSV_COLUMNS})
+                samples.append(time.perf_counter() - t0)
+            os.remove(csv_path)
+            report["legacy"].append({"rows": size, **_summary(samples)})
+            print(f"  {size:>8} 筆 | p50 {report['legacy'][-1]['p50_ms']:9.1f} ms")
+
+        print("多行程同時寫入（4 個行程 × 100 筆）")
+        report["concurrency"] = {
+            "legacy": _concurrency_check(workdir, 4, 100, legacy=True),
+            "append": _concurrency_check(workdir, 4, 100, legacy=False)
+        }
+        for name, result in report["concurrency"].items():
+            print(f"  {name:8s} 預期 {result['expected']} 筆，實際 {result['actual']} 筆")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    p50s = [entry["never"]["p50_ms"] for entry in report["append"]]
+    stats_p50s = [entry["get_stats"]["p50_ms"] for entry in report["append"]]
+    checks = [
+        ("單筆寫入延遲不隨語料庫成長（最大 p50 < 最小 p50 的 3 倍）", max(p50s) < min(p50s) * 3),
+        ("get_stats 延遲不隨語料庫成長（最大 p50 < 最小 p50 的 3 倍）", max(stats_p50s) < min(stats_p50s) * 3),
+        ("多行程同時寫入沒有遺失資料", report["concurrency"]["append"]["actual"] == report["concurrency"]["append"]["expected"])
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
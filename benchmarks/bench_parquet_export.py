@@ -0,0 +1,185 @@
+"""
+Parquet 匯出基準測試
+量測 CSV 語料庫完整匯出為分區 Parquet 的速度與記憶體、增量附加的成本，
+以及分析端只讀取單一欄位 / 分區時與 pandas 讀取整個 CSV 的差距
+
+用法：
+    python benchmarks/bench_parquet_export.py [--rows 200000] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow.dataset as ds
+
+from chart import ELEMENTS, STEM_ELEMENT, TIAN_GAN
+from logger import CSV_COLUMNS, FortuneLogger
+from parquet_export import export_to_parquet, read_corpus
+
+AI_OUTPUT = "**本質分析**\n你的日主像一盞燒得正旺的燈，底子本來就厚。" * 8
+
+
+def _seed(csv_path: str, rows: int, start: datetime, days: int):
+    """寫入 rows 筆資料（日主輪流、時間平均分散在 days 天內）"""
+    step = days * 86400 / max(rows, 1)
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        for i in range(rows):
+            stem = i % 10
+            timestamp = (start + timedelta(seconds=int(i * step))).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow([
+                timestamp, "1990年01月01日 12時00分", "一九八九年腊月初五", f"{TIAN_GAN[stem]}巳 丙子 {TIAN_GAN[stem]}寅 甲午",
+                TIAN_GAN[stem], ELEMENTS[STEM_ELEMENT[stem]], AI_OUTPUT, "gpt-4.1-mini", 1234.5, "", 420, 610, "stop",
+                timestamp[:10]
+            ])
+
+
+def _unrelated_files_survive(workdir: str) -> dict:
+    """
+    匯出到已有其他檔案的目錄：沒有狀態檔時應拒絕而不刪除；
+    完整重新匯出先前的結果時只刪除分區目錄與狀態檔
+    """
+    csv_path = os.path.join(workdir, "small.csv")
+    _seed(csv_path, 100, datetime(2026, 1, 1), 2)
+    with redirect_stdout(io.StringIO()):
+        logger = FortuneLogger(csv_path)
+
+    existing = os.path.join(workdir, "existing")
+    notes = os.path.join(existing, "important", "notes.txt")
+    os.makedirs(os.path.dirname(notes))
+    with open(notes, "w", encoding="utf-8") as f:
+        f.write("不可刪除")
+    try:
+        export_to_parquet(logger, existing)
+        refused = False
+    except ValueError:
+        refused = True
+
+    out_dir = os.path.join(workdir, "small_parquet")
+    export_to_parquet(logger, out_dir)
+    extra = os.path.join(out_dir, "README.txt")
+    with open(extra, "w", encoding="utf-8") as f:
+        f.write("使用者自行放置的檔案")
+    rebuilt = export_to_parquet(logger, out_dir, full=True)
+    extra_kept = os.path.exists(extra)
+    os.remove(extra)  # 不是 Parquet 檔案，讀取資料集前移除
+    return {
+        "refused_unrelated_dir": refused,
+        "unrelated_file_kept": os.path.exists(notes),
+        "full_rebuild_kept_extra_file": extra_kept and rebuilt["rows"] == 100 and read_corpus(out_dir).num_rows == 100
+    }
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分區 Parquet 匯出基準測試")
+    parser.add_argument("--rows", type=int, default=200000, help="語料庫筆數")
+    parser.add_argument("--days", type=int, default=30, help="資料分散的天數（日期分區數）")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+
+    report = {"rows": args.rows, "days": args.days}
+    workdir = tempfile.mkdtemp(prefix="bench_parquet_")
+    try:
+        csv_path = os.path.join(workdir, "corpus.csv")
+        out_dir = os.path.join(workdir, "corpus_parquet")
+        _seed(csv_path, args.rows, datetime(2026, 1, 1), args.days)
+        with redirect_stdout(io.StringIO()):
+            logger = FortuneLogger(csv_path)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        full = export_to_parquet(logger, out_dir)
+        full_s = time.perf_counter() - t0
+        report["full_export"] = {
+            **full,
+            "seconds": round(full_s, 2),
+            "rows_per_sec": round(full["rows"] / full_s),
+            "peak_rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+            "csv_mb": round(os.path.getsize(csv_path) / 1024 / 1024, 1),
+            "parquet_mb": round(_dir_size(out_dir) / 1024 / 1024, 1)
+        }
+        r = report["full_export"]
+        print(f"完整匯出 {r['rows']:,} 筆：{r['seconds']} 秒（{r['rows_per_sec']:,} 筆/秒），{r['files']} 個檔案，"
+              f"CSV {r['csv_mb']} MB → Parquet {r['parquet_mb']} MB，峰值記憶體增加 {r['peak_rss_growth_mb']} MB")
+
+        # 新的一天附加 1000 筆
+        with redirect_stdout(io.StringIO()):
+            day = datetime(2026, 1, 1) + timedelta(days=args.days)
+            for i in range(1000):
+                logger.log_fortune({
+                    "success": True, "bazi_full": "丙巳 丙子 丙寅 甲午", "day_master": "丙", "day_master_element": "火",
+                    "ai_fortune": AI_OUTPUT, "logged_at": (day + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+                })
+        t0 = time.perf_counter()
+        incremental = export_to_parquet(logger, out_dir)
+        report["incremental_export"] = {**incremental, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        r = report["incremental_export"]
+        print(f"增量匯出 {r['rows']:,} 筆：{r['ms']} ms，新增 {r['files']} 個檔案")
+
+        import pandas as pd
+
+        t0 = time.perf_counter()
+        df = pd.read_csv(csv_path, encoding="utf-8-sig")
+        csv_count = int((df["Day_Master_Element"] == "火").sum())
+        csv_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        table = read_corpus(out_dir, columns=["Day_Master"], filter=ds.field("Day_Master_Element") == "火")
+        scan_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        one_day = read_corpus(out_dir, columns=["Timestamp", "Day_Master"], filter=ds.field("date") == "2026-01-15")
+        day_s = time.perf_counter() - t0
+        report["scan"] = {
+            "pandas_read_csv_ms": round(csv_s * 1000, 1),
+            "parquet_element_column_ms": round(scan_s * 1000, 1),
+            "parquet_one_day_ms": round(day_s * 1000, 1),
+            "element_rows_csv": csv_count,
+            "element_rows_parquet": table.num_rows,
+            "one_day_rows": one_day.num_rows
+        }
+        r = report["scan"]
+        print(f"計算火日主筆數：pandas 讀取整個 CSV {r['pandas_read_csv_ms']} ms | "
+              f"Parquet 單一欄位 + 分區 {r['parquet_element_column_ms']} ms | 單日分區 {r['parquet_one_day_ms']} ms")
+        total = read_corpus(out_dir, columns=["Timestamp"]).num_rows
+        report["safety"] = _unrelated_files_survive(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    checks = [
+        ("增量匯出只讀取新記錄", report["incremental_export"]["rows"] == 1000),
+        ("匯出總筆數與語料庫相同", total == args.rows + 1000),
+        ("分區掃描結果與 CSV 相同", report["scan"]["element_rows_parquet"] == report["scan"]["element_rows_csv"]),
+        ("首次匯出到非空目錄時拒絕且不刪除其他檔案",
+         report["safety"]["refused_unrelated_dir"] and report["safety"]["unrelated_file_kept"]),
+        ("完整重新匯出只刪除先前的分區", report["safety"]["full_rebuild_kept_extra_file"])
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+排盤效能基準測試
+比較查表排盤 (_compute_chart)、批次排盤 (get_fortunes) 與 lunar_python 參考實作的單盤延遲
+
+用法：
+    python benchmarks/bench_pillars.py [樣本數]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bazi_engine import _compute_chart, _compute_chart_reference, get_fortunes
+
+
+def _sample_datetimes(n: int, seed: int = 42) -> list:
+    """產生 1900-2100 年間的隨機出生時間"""
+    rng = random.Random(seed)
+    start = datetime(1900, 1, 1)
+    span = (datetime(2100, 12, 31) - start).total_seconds()
+    return [start + timedelta(seconds=int(rng.random() * span)) for _ in range(n)]
+
+
+def _per_chart_us(func, samples: list) -> float:
+    """計算單盤平均延遲（微秒）"""
+    t0 = time.perf_counter()
+    for dt in samples:
+        func(dt)
+    return (time.perf_counter() - t0) / len(samples) * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    samples = _sample_datetimes(n)
+
+    mismatches = sum(1 for dt in samples if _compute_chart(dt) != _compute_chart_reference(dt))
+
+    reference_us = _per_chart_us(_compute_chart_reference, samples)
+    table_us = _per_chart_us(_compute_chart, samples)
+
+    batch = np.asarray(samples * max(1, 200000 // n), dtype="datetime64[m]")
+    t0 = time.perf_counter()
+    get_fortunes(batch)
+    batch_us = (time.perf_counter() - t0) / len(batch) * 1e6
+
+    print(f"樣本數: {n}（不一致: {mismatches}）")
+    print(f"lunar_python 參考實作: {reference_us:8.2f} µs/盤")
+    print(f"查表排盤:             {table_us:8.2f} µs/盤")
+    print(f"批次排盤:             {batch_us:8.2f} µs/盤（{len(batch)} 筆 datetime64）")
+    print(f"加速倍數:             {reference_us / table_us:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
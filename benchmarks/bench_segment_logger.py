@@ -0,0 +1,211 @@
+"""
+分段語料庫基準測試
+在 1M 筆語料庫上比較單一 CSV（FortuneLogger）與分段語料庫（SegmentedFortuneLogger）：
+寫入延遲、get_stats、側邊欄下載需要讀取的資料量、磁碟用量與匯出速度，
+並以多個行程同時寫入（頻繁輪替）確認 manifest 與分段內容一致、沒有遺失資料
+
+用法：
+    python benchmarks/bench_segment_logger.py [--rows 1000000] [--days 30] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart import ELEMENTS, STEM_ELEMENT, TIAN_GAN
+from logger import FortuneLogger
+from segment_logger import SegmentedFortuneLogger
+
+# 每筆從這些句子隨機組合（避免完全相同的內容讓壓縮率失真）
+SENTENCES = [
+    "你的日主像一盞燒得正旺的燈，底子本來就厚。", "今天的流日帶來一股往外推的力量。", "適合把拖了很久的事情收尾。",
+    "人際上容易遇到意見不合，先聽完再說。", "財務上宜守不宜攻，大額支出再想一天。", "下午精神最好，重要的事放在這時候。",
+    "穿紅色或紫色的衣服，替自己補一點火氣。", "往南方走，或坐在靠窗有陽光的位置。", "吃點溫熱的食物，避免冰飲。",
+    "晚上早點休息，明天會更順。", "遇到猶豫的決定，先寫下來再判斷。", "今天的貴人可能是平常不太聯絡的朋友。"
+]
+
+
+def _record(i: int, timestamp: str) -> dict:
+    stem = i % 10
+    rng = random.Random(i)
+    return {
+        "success": True, "birth_datetime": "1990年01月01日 12時00分", "lunar_date": "一九八九年腊月初五",
+        "bazi_full": f"己巳 丙子 {TIAN_GAN[stem]}寅 甲午", "day_master": TIAN_GAN[stem],
+        "day_master_element": ELEMENTS[STEM_ELEMENT[stem]],
+        "ai_fortune": "**本質分析**\n" + "".join(rng.choice(SENTENCES) for _ in range(16)) + f"\n（{rng.randrange(10 ** 8)}）",
+        "llm_model": "gpt-4.1-mini", "llm_latency_ms": 1234.5, "logged_at": timestamp
+    }
+
+
+def _seed(loggers: list, rows: int, days: int, batch: int = 2000):
+    """以批次寫入 rows 筆資料（時間平均分散在 days 天內），各記錄器寫入相同內容"""
+    start = datetime(2026, 1, 1)
+    step = days * 86400 / max(rows, 1)
+    with redirect_stdout(io.StringIO()):
+        for offset in range(0, rows, batch):
+            records = [
+                _record(i, (start + timedelta(seconds=int(i * step))).strftime("%Y-%m-%d %H:%M:%S"))
+                for i in range(offset, min(rows, offset + batch))
+            ]
+            for logger in loggers:
+                logger.log_fortunes(records)
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 3)
+    }
+
+
+def _time(fn, n: int) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def _process_worker(args):
+    segment_dir, worker, writes = args
+    logger = SegmentedFortuneLogger(segment_dir, max_bytes=64 * 1024, fsync_policy="never")
+    ok = 0
+    with redirect_stdout(io.StringIO()):
+        for i in range(writes):
+            ok += logger.log_fortune(_record(i, f"2026-02-{i * 28 // writes + 1:02d} 08:00:{worker:02d}"))
+    logger.wait_for_compression()
+    return ok
+
+
+def _concurrency_check(workdir: str, processes: int, writes: int) -> dict:
+    segment_dir = os.path.join(workdir, "concurrent")
+    with redirect_stdout(io.StringIO()):
+        SegmentedFortuneLogger(segment_dir)
+    with multiprocessing.Pool(processes) as pool:
+        ok = sum(pool.map(_process_worker, [(segment_dir, worker, writes) for worker in range(processes)]))
+    with redirect_stdout(io.StringIO()):
+        logger = SegmentedFortuneLogger(segment_dir)
+    segments = logger.list_segments()
+    return {
+        "expected": processes * writes,
+        "reported_ok": ok,
+        "stats_total": logger.get_stats()["total_records"],
+        "rows_read": sum(1 for _ in logger._iter_rows()),
+        "segments": len(segments),
+        "pending_compression": sum(entry["status"] == "closed" for entry in segments)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SegmentedFortuneLogger 基準測試")
+    parser.add_argument("--rows", type=int, default=1000000, help="語料庫筆數")
+    parser.add_argument("--days", type=int, default=30, help="資料分散的天數")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+
+    report = {"rows": args.rows, "days": args.days}
+    workdir = tempfile.mkdtemp(prefix="bench_segments_")
+    try:
+        csv_path = os.path.join(workdir, "corpus.csv")
+        segment_dir = os.path.join(workdir, "segments")
+        with redirect_stdout(io.StringIO()):
+            single = FortuneLogger(csv_path, fsync_policy="never")
+            segmented = SegmentedFortuneLogger(segment_dir, fsync_policy="never")
+        t0 = time.perf_counter()
+        _seed([single, segmented], args.rows, args.days)
+        segmented.wait_for_compression()
+        report["seed_s"] = round(time.perf_counter() - t0, 1)
+
+        segments = segmented.list_segments()
+        report["disk"] = {
+            "csv_mb": round(os.path.getsize(csv_path) / 1024 / 1024, 1),
+            "segments_mb": round(sum(entry["stored_size"] for entry in segments) / 1024 / 1024, 1),
+            "segments": len(segments)
+        }
+        print(f"已建立 {args.rows:,} 筆語料庫（{report['seed_s']} 秒）：單一 CSV {report['disk']['csv_mb']} MB | "
+              f"{len(segments)} 個分段共 {report['disk']['segments_mb']} MB")
+
+        with redirect_stdout(io.StringIO()):
+            day = (datetime(2026, 1, 1) + timedelta(days=args.days)).strftime("%Y-%m-%d")
+            report["log_fortune"] = {
+                "csv": _time(lambda: single.log_fortune(_record(0, f"{day} 08:00:00")), 300),
+                "segments": _time(lambda: segmented.log_fortune(_record(0, f"{day} 08:00:00")), 300)
+            }
+        report["get_stats"] = {"csv": _time(single.get_stats, 300), "segments": _time(segmented.get_stats, 300)}
+
+        # 側邊欄下載：單一 CSV 每次重新整理都讀取整個檔案；分段只讀取選取的分段
+        latest_closed = [entry for entry in segmented.list_segments() if entry["status"] == "compressed"][-1]
+
+        def read_csv():
+            with open(csv_path, "rb") as f:
+                return len(f.read())
+
+        report["download"] = {
+            "csv": {**_time(read_csv, 5), "bytes": read_csv()},
+            "segment": {**_time(lambda: segmented.read_segment(latest_closed["id"]), 5),
+                        "bytes": len(segmented.read_segment(latest_closed["id"])[1])},
+            "list_segments": _time(segmented.list_segments, 100)
+        }
+
+        report["export_to_text"] = {}
+        with redirect_stdout(io.StringIO()):
+            for name, logger in (("csv", single), ("segments", segmented)):
+                t0 = time.perf_counter()
+                logger.export_to_text(os.path.join(workdir, f"{name}.txt"))
+                report["export_to_text"][name] = round(args.rows / (time.perf_counter() - t0))
+        same_export = os.path.getsize(os.path.join(workdir, "csv.txt")) == os.path.getsize(os.path.join(workdir, "segments.txt"))
+
+        for name in ("log_fortune", "get_stats"):
+            for kind, r in report[name].items():
+                print(f"  {name:12s}（{kind:8s}）p50 {r['p50_ms']:8.3f} ms / p99 {r['p99_ms']:8.3f} ms")
+        d = report["download"]
+        print(f"  下載：整個 CSV {d['csv']['bytes'] / 1024 / 1024:.1f} MB / {d['csv']['p50_ms']} ms | "
+              f"單一分段 {d['segment']['bytes'] / 1024 / 1024:.2f} MB / {d['segment']['p50_ms']} ms | "
+              f"列出分段 {d['list_segments']['p50_ms']} ms")
+        print(f"  export_to_text：單一 CSV {report['export_to_text']['csv']:,} 筆/秒 | "
+              f"分段 {report['export_to_text']['segments']:,} 筆/秒")
+
+        print("多行程同時寫入（4 個行程 × 500 筆，分段上限 64 KB）")
+        report["concurrency"] = c = _concurrency_check(workdir, 4, 500)
+        print(f"  預期 {c['expected']} 筆，回報成功 {c['reported_ok']} 筆，統計 {c['stats_total']} 筆，"
+              f"讀回 {c['rows_read']} 筆，{c['segments']} 個分段")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    c = report["concurrency"]
+    checks = [
+        ("get_stats p99 < 1 ms", report["get_stats"]["segments"]["p99_ms"] < 1),
+        ("下載只讀取單一分段（< 整個 CSV 的 1/10）", report["download"]["segment"]["bytes"] * 10 < report["download"]["csv"]["bytes"]),
+        ("壓縮後磁碟用量小於單一 CSV", report["disk"]["segments_mb"] < report["disk"]["csv_mb"]),
+        ("分段匯出與單一 CSV 相同", same_export),
+        ("同時寫入並輪替時沒有遺失資料",
+         c["expected"] == c["reported_ok"] == c["stats_total"] == c["rows_read"] and c["pending_compression"] == 0)
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+請求合併基準測試
+同一命盤的 N 個並行請求（同步、非同步與串流三條路徑）經 ai_flight 合併後只呼叫一次替身 LLM，
+並確認寫入語料庫時只有 leader 記為實際的 LLM 呼叫（follower 為 coalesced、不帶 token 與延遲）
+
+用法：
+    python benchmarks/bench_single_flight.py [並行數] [替身 LLM 延遲秒數]
+"""
+
+import asyncio
+from contextlib import redirect_stdout
+from datetime import datetime
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_standin import StandInServer
+
+
+def _in_threads(n: int, fn) -> list:
+    """以 n 條執行緒同時呼叫 fn()，回傳各自的結果"""
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    workdir = tempfile.mkdtemp(prefix="bench_flight_")
+    server = StandInServer({"latency": f"fixed:{latency}", "tokens_per_sec": 0}).start()
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=server.base_url,
+        DAILY_FORTUNE_DIR=os.path.join(workdir, "daily_fortunes")
+    )
+    os.environ.pop("AI_CACHE_PATH", None)
+
+    report = {}
+    try:
+        import bazi_engine
+        from logger import FortuneLogger
+
+        def stream(birth):
+            result = bazi_engine.get_chart(birth)
+            for _ in bazi_engine.generate_fortune_stream(birth, result):
+                pass
+            return result
+
+        async def gather(birth):
+            return await asyncio.gather(*(bazi_engine.get_fortune_async(birth) for _ in range(n)))
+
+        paths = {
+            "sync": (datetime(1990, 1, 1, 12, 0), lambda birth: _in_threads(n, lambda: bazi_engine.get_fortune(birth))),
+            "async": (datetime(1991, 2, 2, 12, 0), lambda birth: asyncio.run(gather(birth))),
+            "stream": (datetime(1992, 3, 3, 12, 0), lambda birth: _in_threads(n, lambda: stream(birth)))
+        }
+        for name, (birth, run) in paths.items():
+            server.reset_stats()
+            t0 = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                results = run(birth)
+            seconds = time.perf_counter() - t0
+
+            output_path = os.path.join(workdir, f"{name}.jsonl")
+            with redirect_stdout(io.StringIO()):
+                logger = FortuneLogger(os.path.join(workdir, f"{name}.csv"), fsync_policy="never")
+                logger.log_fortunes(results)
+                logger.export_to_jsonl(output_path)
+            with open(output_path, encoding="utf-8") as f:
+                exported = sum(1 for _ in f)
+            sources = {}
+            for result in results:
+                sources[result["ai_source"]] = sources.get(result["ai_source"], 0) + 1
+            report[name] = {
+                "seconds": round(seconds, 3),
+                "llm_requests": server.get_stats()["requests"],
+                "sources": sources,
+                "rows_with_tokens": sum(result["llm_completion_tokens"] is not None for result in results),
+                "exported": exported
+            }
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    checks = []
+    for name, r in report.items():
+        print(f"  {name:6s} {n} 個並行請求 | {r['seconds']:.3f} 秒 | LLM 呼叫 {r['llm_requests']} 次 | 來源 {r['sources']} | "
+              f"帶 token 的記錄 {r['rows_with_tokens']} 筆 | JSONL 匯出 {r['exported']} 筆")
+        checks += [
+            (f"{name}：只呼叫一次 LLM", r["llm_requests"] == 1),
+            (f"{name}：只有一筆記錄為 live 且帶有 token 用量", r["sources"].get("live") == 1 and r["rows_with_tokens"] == 1),
+            (f"{name}：JSONL 匯出只有一筆", r["exported"] == 1)
+        ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+SQLite 語料庫基準測試
+在 1M 筆的語料庫上量測 SQLiteFortuneLogger 的寫入、get_stats、依日主 / 五行 / 日期區間查詢的延遲，
+並以多個執行緒與行程同時寫入，確認沒有遺失資料
+
+用法：
+    python benchmarks/bench_sqlite_logger.py [--rows 1000000] [--output 路徑]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart import ELEMENTS, STEM_ELEMENT, TIAN_GAN
+from logger import CSV_COLUMNS
+from sqlite_logger import SQLiteFortuneLogger
+
+RECORD = {
+    "success": True,
+    "birth_datetime": "1990年01月01日 12時00分",
+    "lunar_date": "一九八九年腊月初五",
+    "bazi_full": "己巳 丙子 丙寅 甲午",
+    "day_master": "丙",
+    "day_master_element": "火",
+    "ai_fortune": "**本質分析**\n你的日主是丙火，像一盞燒得正旺的燈。" * 8,
+    "llm_model": "gpt-4.1-mini",
+    "llm_latency_ms": 1234.5
+}
+
+
+def _seed(db_path: str, rows: int):
+    """直接以 executemany 寫入 rows 筆資料（日主與時間分散在一年內）"""
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    conn = sqlite3.connect(db_path)
+    insert = f"INSERT INTO corpus ({', '.join(CSV_COLUMNS)}) VALUES ({', '.join('?' for _ in CSV_COLUMNS)})"
+    batch = []
+    for i in range(rows):
+        stem = rng.randrange(10)
+        timestamp = (start + timedelta(seconds=i * 31536000 // rows)).strftime("%Y-%m-%d %H:%M:%S")
+        batch.append((
+            timestamp, RECORD["birth_datetime"], RECORD["lunar_date"], f"{TIAN_GAN[stem]}巳 丙子 {TIAN_GAN[stem]}寅 甲午",
+            TIAN_GAN[stem], ELEMENTS[STEM_ELEMENT[stem]], RECORD["ai_fortune"], RECORD["llm_model"],
+            RECORD["llm_latency_ms"], None, 420, 610, "stop", timestamp[:10]
+        ))
+        if len(batch) == 50000:
+            with conn:
+                conn.executemany(insert, batch)
+            batch = []
+    if batch:
+        with conn:
+            conn.executemany(insert, batch)
+    conn.close()
+
+
+def _summary(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[max(0, int(len(ordered) * 0.99) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def _time(fn, n: int = 50) -> dict:
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def _process_worker(args):
+    db_path, writes = args
+    logger = SQLiteFortuneLogger(db_path, fsync_policy="never")
+    with redirect_stdout(io.StringIO()):
+        return sum(logger.log_fortune(RECORD) for _ in range(writes))
+
+
+def _concurrency_check(workdir: str, threads: int, processes: int, writes: int) -> dict:
+    db_path = os.path.join(workdir, "concurrent.db")
+    with redirect_stdout(io.StringIO()):
+        logger = SQLiteFortuneLogger(db_path, fsync_policy="never")
+        ok = []
+
+        def worker():
+            ok.append(sum(logger.log_fortune(RECORD) for _ in range(writes)))
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        with multiprocessing.Pool(processes) as pool:
+            pending = pool.map_async(_process_worker, [(db_path, writes)] * processes)
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            ok.extend(pending.get())
+        total = logger.get_stats()["total_records"]
+        actual = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM corpus").fetchone()[0]
+    return {"expected": (threads + processes) * writes, "reported_ok": sum(ok), "stats_total": total, "actual": actual}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLiteFortuneLogger 基準測試")
+    parser.add_argument("--rows", type=int, default=1000000, help="語料庫筆數")
+    parser.add_argument("--output", help="結果 JSON 路徑（選用）")
+    args = parser.parse_args()
+
+    report = {"rows": args.rows}
+    workdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    try:
+        db_path = os.path.join(workdir, "corpus.db")
+        with redirect_stdout(io.StringIO()):
+            SQLiteFortuneLogger(db_path)
+        t0 = time.perf_counter()
+        _seed(db_path, args.rows)
+        report["seed_s"] = round(time.perf_counter() - t0, 1)
+        print(f"已建立 {args.rows:,} 筆語料庫（{report['seed_s']} 秒，"
+              f"{os.path.getsize(db_path) / 1024 / 1024:.0f} MB）")
+
+        with redirect_stdout(io.StringIO()):
+            logger = SQLiteFortuneLogger(db_path)
+            report["log_fortune"] = {}
+            for policy in ("never", "interval", "always"):
+                writer = SQLiteFortuneLogger(db_path, fsync_policy=policy)
+                report["log_fortune"][policy] = _time(lambda: writer.log_fortune(RECORD), 200)
+        report["get_stats"] = _time(logger.get_stats, 200)
+        report["queries"] = {
+            "day_master": _time(lambda: logger.query_by_day_master("丙", limit=100)),
+            "element": _time(lambda: logger.query_by_element("水", limit=100)),
+            "date_range_day": _time(lambda: logger.query_by_date_range("2025-06-01", "2025-06-01", limit=100)),
+            "day_master_in_month": _time(lambda: logger.query(day_master="丙", start="2025-06-01", end="2025-06-30")),
+            "count_day_master": _time(lambda: logger.count(day_master="丙"), 10),
+            "count_date_range_month": _time(lambda: logger.count(start="2025-06-01", end="2025-06-30"), 10)
+        }
+        for policy, r in report["log_fortune"].items():
+            print(f"  log_fortune（{policy:8s}）p50 {r['p50_ms']:7.3f} ms / p99 {r['p99_ms']:7.3f} ms")
+        print(f"  get_stats p50 {report['get_stats']['p50_ms']:7.3f} ms / p99 {report['get_stats']['p99_ms']:7.3f} ms")
+        for name, r in report["queries"].items():
+            print(f"  {name:24s} p50 {r['p50_ms']:7.3f} ms / p99 {r['p99_ms']:7.3f} ms")
+
+        with redirect_stdout(io.StringIO()):
+            export_path = os.path.join(workdir, "corpus.txt")
+            t0 = time.perf_counter()
+            logger.export_to_text(export_path)
+            export_s = time.perf_counter() - t0
+        report["export_rows_per_sec"] = round(logger.get_stats()["total_records"] / export_s)
+        print(f"  export_to_text {report['export_rows_per_sec']:,} 筆/秒")
+
+        # 側邊欄的 CSV 備份：匯出後可再匯入為相同筆數的語料庫
+        with redirect_stdout(io.StringIO()):
+            csv_path = os.path.join(workdir, "corpus.csv")
+            t0 = time.perf_counter()
+            logger.export_to_csv(csv_path)
+            export_s = time.perf_counter() - t0
+            report["csv_round_trip"] = (
+                SQLiteFortuneLogger(os.path.join(workdir, "restored.db")).import_csv(csv_path)
+                == logger.get_stats()["total_records"]
+            )
+        print(f"  export_to_csv {round(logger.get_stats()['total_records'] / export_s):,} 筆/秒")
+
+        print("多執行緒 + 多行程同時寫入（4 個執行緒 + 4 個行程 × 100 筆）")
+        report["concurrency"] = c = _concurrency_check(workdir, 4, 4, 100)
+        print(f"  預期 {c['expected']} 筆，回報成功 {c['reported_ok']} 筆，統計 {c['stats_total']} 筆，實際 {c['actual']} 筆")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+    c = report["concurrency"]
+    checks = [
+        ("依日主 / 五行 / 日期查詢 p99 < 10 ms",
+         all(report["queries"][name]["p99_ms"] < 10 for name in ("day_master", "element", "date_range_day", "day_master_in_month"))),
+        ("get_stats p99 < 1 ms", report["get_stats"]["p99_ms"] < 1),
+        ("同時寫入沒有遺失資料", c["expected"] == c["reported_ok"] == c["stats_total"] == c["actual"]),
+        ("export_to_csv 的備份可完整匯入", report["csv_round_trip"])
+    ]
+    failed = False
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+冷啟動效能基準測試
+於全新的 Python 行程中量測各模組的匯入時間，以及 app.py 的首次渲染時間
+（Streamlit AppTest 執行一次完整腳本，含 streamlit 本身的匯入）
+
+用法：
+    python benchmarks/bench_startup.py [重複次數]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 專案模組與其主要的重量級依賴
+MODULES = [
+    "bazi_engine",
+    "llm_client",
+    "logger",
+    "gsheets_logger",
+    "lunar_python",
+    "numpy",
+    "openai",
+    "pandas",
+    "gspread",
+    "google.oauth2.service_account",
+    "streamlit"
+]
+
+FIRST_RENDER_SCRIPT = """
+import time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+t2 = time.perf_counter()
+assert not at.exception, at.exception
+print(f"{{(t1 - t0) * 1000:.3f}} {{(t2 - t1) * 1000:.3f}}")
+"""
+
+
+def _import_ms(module: str) -> float:
+    """在全新行程中匯入模組，回傳 -X importtime 的累計時間（毫秒）；失敗時為 None"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return None
+    last = proc.stderr.strip().splitlines()[-1]
+    return int(last.split("|")[1]) / 1000
+
+
+def _first_render_ms():
+    """回傳 (streamlit 匯入毫秒, app.py 首次執行毫秒)；未安裝 streamlit 時為 None"""
+    with tempfile.TemporaryDirectory() as workdir:
+        # 於暫存目錄執行，避免在專案目錄建立 corpus_data.csv
+        proc = subprocess.run(
+            [sys.executable, "-c", FIRST_RENDER_SCRIPT.format(app=os.path.join(ROOT, "app.py"))],
+            cwd=workdir, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": ROOT}
+        )
+    if proc.returncode != 0:
+        return None
+    streamlit_ms, render_ms = proc.stdout.strip().splitlines()[-1].split()
+    return float(streamlit_ms), float(render_ms)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"各模組冷匯入時間（{repeats} 次取中位數）")
+    for module in MODULES:
+        samples = [_import_ms(module) for _ in range(repeats)]
+        if None in samples:
+            print(f"  {module:32s}      未安裝")
+            continue
+        print(f"  {module:32s} {statistics.median(samples):8.1f} ms")
+
+    renders = [_first_render_ms() for _ in range(repeats)]
+    if None in renders:
+        print("首次渲染: 略過（未安裝 streamlit 或 app.py 執行失敗）")
+        return
+    streamlit_ms = statistics.median(r[0] for r in renders)
+    render_ms = statistics.median(r[1] for r in renders)
+    print(f"首次渲染: streamlit 匯入 {streamlit_ms:.1f} ms + app.py 執行 {render_ms:.1f} ms"
+          f" = {streamlit_ms + render_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+效能基準測試套件
+量測排盤吞吐量、FortuneLogger 寫入延遲隨語料庫成長的變化、
+get_stats / export_to_text 在不同語料庫大小下的成本，
+以及對本地 LLM 替身伺服器的 get_fortune 端到端延遲。
+結果寫入 JSON 檔，方便比較不同版本的數據。
+
+用法：
+    python benchmarks/bench_suite.py [--sizes 0,1000,10000,100000] [--output 路徑] [--quick]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm_standin import StandInServer
+
+DEFAULT_SIZES = (0, 1000, 10000, 100000)
+QUICK_SIZES = (0, 1000, 10000)
+
+# 模擬 AI 輸出（約 600 字，與實際解析長度相近）
+_AI_OUTPUT = (
+    "**本質分析**\n你的日主是丙火，像一盞燒得正旺的燈，底子本來就厚。" * 6
+    + "\n\n**行動建議**\n- 穿什麼：紅色或紫色。\n- 往哪走：南方。\n- 吃什麼：熱湯。" * 4
+    + "\n\n**一句話總結**\n今天適合輸出，把腦中的好點子變成看得見的成果。"
+)
+
+
+def _summary(samples: list) -> dict:
+    """延遲樣本（秒）統計，單位毫秒"""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def _sample_datetimes(n: int, seed: int = 42) -> list:
+    """產生 1900-2100 年間的隨機出生時間"""
+    rng = random.Random(seed)
+    start = datetime(1900, 1, 1)
+    span = int((datetime(2100, 12, 31) - start).total_seconds())
+    return [start + timedelta(seconds=rng.randrange(span)) for _ in range(n)]
+
+
+def _fortune_record(dt: datetime) -> dict:
+    """組出與 get_fortune() 相同格式的結果字典"""
+    from bazi_engine import get_chart
+
+    result = get_chart(dt)
+    result.update({
+        "ai_fortune": _AI_OUTPUT,
+        "llm_model": "gpt-4.1-mini",
+        "llm_latency_ms": 1234.5,
+        "llm_ttft_ms": None,
+        "llm_prompt_tokens": 420,
+        "llm_completion_tokens": 610,
+        "llm_finish_reason": "stop"
+    })
+    return result
+
+
+def _seed_corpus(csv_path: str, rows: int, record: dict):
+    """直接以 csv 模組寫入 rows 筆資料，快速建立指定大小的語料庫"""
+    from logger import CSV_COLUMNS
+
+    row = [
+        "2026-01-01 00:00:00", record["birth_datetime"], record["lunar_date"], record["bazi_full"],
+        record["day_master"], record["day_master_element"], record["ai_fortune"], record["llm_model"],
+        record["llm_latency_ms"], "", record["llm_prompt_tokens"], record["llm_completion_tokens"],
+        record["llm_finish_reason"], "2026-01-01"
+    ]
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        for _ in range(rows):
+            writer.writerow(row)
+
+
+# ============================================================
+# 各項量測
+# ============================================================
+def bench_chart(n: int) -> dict:
+    """排盤吞吐量：單筆查表（冷/熱快取）與批次排盤"""
+    import numpy as np
+    from bazi_engine import _compute_chart, chart_cache, get_chart, get_fortunes
+
+    samples = _sample_datetimes(n)
+
+    t0 = time.perf_counter()
+    for dt in samples:
+        _compute_chart(dt)
+    compute_s = time.perf_counter() - t0
+
+    chart_cache.clear()
+    t0 = time.perf_counter()
+    for dt in samples:
+        get_chart(dt)
+    cold_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for dt in samples:
+        get_chart(dt)
+    warm_s = time.perf_counter() - t0
+
+    batch = np.asarray(samples * max(1, 200000 // n), dtype="datetime64[m]")
+    t0 = time.perf_counter()
+    get_fortunes(batch)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "samples": n,
+        "compute_charts_per_sec": round(n / compute_s),
+        "get_chart_cold_per_sec": round(n / cold_s),
+        "get_chart_warm_per_sec": round(n / warm_s),
+        "batch_size": len(batch),
+        "batch_charts_per_sec": round(len(batch) / batch_s)
+    }
+
+
+def bench_logger(sizes: list, workdir: str, appends: int) -> dict:
+    """FortuneLogger 在各語料庫大小下的 log_fortune / get_stats / export_to_text 成本"""
+    from logger import FortuneLogger
+
+    record = _fortune_record(datetime(1990, 1, 1, 12, 0))
+    results = []
+    for size in sizes:
+        csv_path = os.path.join(workdir, f"corpus_{size}.csv")
+        _seed_corpus(csv_path, size, record)
+        logger = FortuneLogger(csv_path)
+
+        with redirect_stdout(io.StringIO()):
+            log_samples = []
+            for _ in range(appends):
+                t0 = time.perf_counter()
+                ok = logger.log_fortune(record)
+                log_samples.append(time.perf_counter() - t0)
+                if not ok:
+                    raise RuntimeError(f"log_fortune 失敗（{size} 筆）")
+
+            stats_samples = []
+            for _ in range(3):
+                t0 = time.perf_counter()
+                stats = logger.get_stats()
+                stats_samples.append(time.perf_counter() - t0)
+
+            export_path = os.path.join(workdir, f"corpus_{size}.txt")
+            t0 = time.perf_counter()
+            ok = logger.export_to_text(export_path)
+            export_s = time.perf_counter() - t0
+            if not ok:
+                raise RuntimeError(f"export_to_text 失敗（{size} 筆）")
+
+        results.append({
+            "rows": size,
+            "file_size_kb": stats["file_size_kb"],
+            "log_fortune": _summary(log_samples),
+            "get_stats": _summary(stats_samples),
+            "export_to_text_ms": round(export_s * 1000, 3),
+            "export_rows_per_sec": round(stats["total_records"] / export_s) if export_s else None
+        })
+        os.remove(csv_path)
+        os.remove(export_path)
+        print(f"  {size:>8} 筆 | log_fortune p50 {results[-1]['log_fortune']['p50_ms']:9.1f} ms | "
+              f"get_stats p50 {results[-1]['get_stats']['p50_ms']:9.1f} ms | "
+              f"export_to_text {results[-1]['export_to_text_ms']:9.1f} ms")
+    return {"appends_per_size": appends, "sizes": results}
+
+
+def bench_end_to_end(n: int, llm_latency: float, workdir: str) -> dict:
+    """get_fortune 端到端延遲：未命中（實際呼叫替身 LLM）與命中快取"""
+    server = StandInServer({"latency": f"fixed:{llm_latency}", "response": _AI_OUTPUT}).start()
+
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        OPENAI_BASE_URL=server.base_url,
+        DAILY_FORTUNE_DIR=os.path.join(workdir, "daily_fortunes")
+    )
+    os.environ.pop("AI_CACHE_PATH", None)
+
+    try:
+        import bazi_engine
+
+        bazi_engine.chart_cache.clear()
+        bazi_engine.get_fortune(datetime(2000, 1, 1, 0, 0))  # 暖機：建立連線
+
+        samples = _sample_datetimes(n, seed=7)
+        miss, hit = [], []
+        sources = {}
+        for dt in samples:
+            t0 = time.perf_counter()
+            result = bazi_engine.get_fortune(dt)
+            miss.append(time.perf_counter() - t0)
+            sources[result.get("ai_source")] = sources.get(result.get("ai_source"), 0) + 1
+        for dt in samples:
+            t0 = time.perf_counter()
+            result = bazi_engine.get_fortune(dt)
+            hit.append(time.perf_counter() - t0)
+            sources[result.get("ai_source")] = sources.get(result.get("ai_source"), 0) + 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "stub_llm_latency_ms": llm_latency * 1000,
+        "miss": _summary(miss),
+        "hit": _summary(hit),
+        "ai_sources": sources
+    }
+
+
+def _environment() -> dict:
+    """執行環境資訊（用於比較不同次的結果）"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排盤、記錄器與完整請求路徑的效能基準測試")
+    parser.add_argument("--sizes", help="語料庫筆數（逗號分隔），預設 0,1000,10000,100000")
+    parser.add_argument("--appends", type=int, default=20, help="每個大小量測的 log_fortune 次數")
+    parser.add_argument("--charts", type=int, default=20000, help="排盤吞吐量的樣本數")
+    parser.add_argument("--requests", type=int, default=200, help="端到端量測的請求數")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="替身 LLM 回應延遲（秒）")
+    parser.add_argument("--output", help="結果 JSON 路徑，預設 benchmarks/results/bench_suite_<時間>.json")
+    parser.add_argument("--quick", action="store_true", help="縮小規模（語料庫最多 10000 筆）")
+    args = parser.parse_args()
+
+    if args.sizes:
+        sizes = [int(s) for s in args.sizes.split(",")]
+    else:
+        sizes = list(QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    if args.quick:
+        args.appends = min(args.appends, 5)
+        args.charts = min(args.charts, 5000)
+        args.requests = min(args.requests, 50)
+
+    report = {"environment": _environment()}
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        print(f"排盤吞吐量（{args.charts} 筆）")
+        report["chart"] = bench_chart(args.charts)
+        print(f"  查表 {report['chart']['compute_charts_per_sec']:,} 盤/秒 | "
+              f"get_chart 熱快取 {report['chart']['get_chart_warm_per_sec']:,} 盤/秒 | "
+              f"批次 {report['chart']['batch_charts_per_sec']:,} 盤/秒")
+
+        print("FortuneLogger")
+        report["logger"] = bench_logger(sizes, workdir, args.appends)
+
+        print(f"get_fortune 端到端（{args.requests} 筆，替身 LLM 延遲 {args.llm_latency * 1000:g} ms）")
+        with redirect_stdout(io.StringIO()):
+            report["end_to_end"] = bench_end_to_end(args.requests, args.llm_latency, workdir)
+        e2e = report["end_to_end"]
+        print(f"  未命中 p50 {e2e['miss']['p50_ms']:.1f} ms / p95 {e2e['miss']['p95_ms']:.1f} ms | "
+              f"命中快取 p50 {e2e['hit']['p50_ms']:.3f} ms | 來源 {e2e['ai_sources']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"bench_suite_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+命盤資料模組
+以小整數編碼天干（0-9）、地支（0-11）與六十甲子（0-59），
+提供五行、陰陽、藏干查表，以及排盤引擎核心的 Chart 值型別
+"""
+
+# ============================================================
+# 干支與五行查表
+# ============================================================
+TIAN_GAN = ("甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸")
+DI_ZHI = ("子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥")
+
+# 五行（依相生順序：木 → 火 → 土 → 金 → 水 → 木）
+ELEMENTS = ("木", "火", "土", "金", "水")
+
+# 天干、地支的五行序號
+STEM_ELEMENT = (0, 0, 1, 1, 2, 2, 3, 3, 4, 4)
+BRANCH_ELEMENT = (4, 2, 0, 0, 2, 1, 1, 2, 3, 3, 2, 4)
+
+# 陰陽：0 為陽、1 為陰（干支序號奇偶）
+STEM_YIN = tuple(i % 2 for i in range(10))
+BRANCH_YIN = tuple(i % 2 for i in range(12))
+YIN_YANG = ("陽", "陰")
+
+# 地支藏干（本氣、中氣、餘氣）
+HIDDEN_STEMS = (
+    (9,),         # 子：癸
+    (5, 9, 7),    # 丑：己癸辛
+    (0, 2, 4),    # 寅：甲丙戊
+    (1,),         # 卯：乙
+    (4, 1, 9),    # 辰：戊乙癸
+    (2, 4, 6),    # 巳：丙戊庚
+    (3, 5),       # 午：丁己
+    (5, 3, 1),    # 未：己丁乙
+    (6, 8, 4),    # 申：庚壬戊
+    (7,),         # 酉：辛
+    (4, 7, 3),    # 戌：戊辛丁
+    (8, 0)        # 亥：壬甲
+)
+
+# 六十甲子文字
+PILLAR_TEXT = tuple(TIAN_GAN[i % 10] + DI_ZHI[i % 12] for i in range(60))
+
+# 日主五行
+WUXING_MAP = {TIAN_GAN[i]: ELEMENTS[STEM_ELEMENT[i]] for i in range(10)}
+
+# 農曆日期文字（與 lunar_python 輸出一致）
+_LUNAR_NUMBER = ("〇", "一", "二", "三", "四", "五", "六", "七", "八", "九")
+_LUNAR_MONTH = ("", "正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "冬", "腊")
+LUNAR_DAY_TEXT = (
+    "", "初一", "初二", "初三", "初四", "初五", "初六", "初七", "初八", "初九", "初十",
+    "十一", "十二", "十三", "十四", "十五", "十六", "十七", "十八", "十九", "二十",
+    "廿一", "廿二", "廿三", "廿四", "廿五", "廿六", "廿七", "廿八", "廿九", "三十"
+)
+
+
+def pillar_index(stem: int, branch: int) -> int:
+    """天干、地支序號轉六十甲子序號（干支需同為陽或同為陰）"""
+    return (6 * stem - 5 * branch) % 60
+
+
+def lunar_month_text(lunar_year: int, lunar_month: int) -> str:
+    """農曆年月轉中文（閏月以負數表示），如「一九八九年腊月」"""
+    year_text = "".join(_LUNAR_NUMBER[ord(c) - 48] for c in str(lunar_year))
+    month_text = ("闰" if lunar_month < 0 else "") + _LUNAR_MONTH[abs(lunar_month)]
+    return f"{year_text}年{month_text}月"
+
+
+def lunar_date_text(lunar_year: int, lunar_month: int, lunar_day: int) -> str:
+    """農曆年月日轉中文日期（閏月以負數表示）"""
+    return lunar_month_text(lunar_year, lunar_month) + LUNAR_DAY_TEXT[lunar_day]
+
+
+# ============================================================
+# 命盤值型別
+# ============================================================
+class Chart:
+    """
+    命盤（不可變值型別）
+
+    四柱以六十甲子序號（0-59）保存，干支、五行等皆由查表取得；
+    文字只在存取時才組合（農曆日期組合後快取）。
+    以四柱編碼為雜湊值，可直接作為快取鍵。
+    """
+
+    __slots__ = ("year", "month", "day", "time", "lunar_year", "lunar_month", "lunar_day", "code", "_lunar_date")
+
+    def __init__(
+        self,
+        year: int,
+        month: int,
+        day: int,
+        time: int,
+        lunar_year: int,
+        lunar_month: int,
+        lunar_day: int
+    ):
+        """
+        建立命盤
+
+        Args:
+            year / month / day / time: 四柱六十甲子序號（0-59）
+            lunar_year / lunar_month / lunar_day: 農曆年月日（閏月以負數表示）
+        """
+        self.year = year
+        self.month = month
+        self.day = day
+        self.time = time
+        self.lunar_year = lunar_year
+        self.lunar_month = lunar_month
+        self.lunar_day = lunar_day
+        # 四柱編碼（0 - 60^4-1），作為雜湊值
+        self.code = ((year * 60 + month) * 60 + day) * 60 + time
+        self._lunar_date = None
+
+    # --- 整數存取 ---
+    @property
+    def pillars(self) -> tuple:
+        """四柱六十甲子序號 (年, 月, 日, 時)"""
+        return (self.year, self.month, self.day, self.time)
+
+    @property
+    def stems(self) -> tuple:
+        """四柱天干序號"""
+        return (self.year % 10, self.month % 10, self.day % 10, self.time % 10)
+
+    @property
+    def branches(self) -> tuple:
+        """四柱地支序號"""
+        return (self.year % 12, self.month % 12, self.day % 12, self.time % 12)
+
+    @property
+    def day_stem(self) -> int:
+        """日主天干序號"""
+        return self.day % 10
+
+    @property
+    def day_master_element_index(self) -> int:
+        """日主五行序號"""
+        return STEM_ELEMENT[self.day % 10]
+
+    @property
+    def day_master_yin(self) -> int:
+        """日主陰陽（0 為陽、1 為陰）"""
+        return STEM_YIN[self.day % 10]
+
+    def element_counts(self, include_hidden: bool = False) -> tuple:
+        """
+        八字五行分布
+
+        Args:
+            include_hidden: 是否計入地支藏干（否則以地支本身五行計）
+
+        Returns:
+            tuple: 依 ELEMENTS 順序的五行個數
+        """
+        counts = [0, 0, 0, 0, 0]
+        for stem in self.stems:
+            counts[STEM_ELEMENT[stem]] += 1
+        for branch in self.branches:
+            if include_hidden:
+                for stem in HIDDEN_STEMS[branch]:
+                    counts[STEM_ELEMENT[stem]] += 1
+            else:
+                counts[BRANCH_ELEMENT[branch]] += 1
+        return tuple(counts)
+
+    # --- 文字（存取時才組合） ---
+    @property
+    def year_pillar(self) -> str:
+        return PILLAR_TEXT[self.year]
+
+    @property
+    def month_pillar(self) -> str:
+        return PILLAR_TEXT[self.month]
+
+    @property
+    def day_pillar(self) -> str:
+        return PILLAR_TEXT[self.day]
+
+    @property
+    def time_pillar(self) -> str:
+        return PILLAR_TEXT[self.time]
+
+    @property
+    def day_master(self) -> str:
+        return TIAN_GAN[self.day % 10]
+
+    @property
+    def day_master_element(self) -> str:
+        return ELEMENTS[STEM_ELEMENT[self.day % 10]]
+
+    @property
+    def bazi_full(self) -> str:
+        return f"{PILLAR_TEXT[self.year]} {PILLAR_TEXT[self.month]} {PILLAR_TEXT[self.day]} {PILLAR_TEXT[self.time]}"
+
+    @property
+    def lunar_date(self) -> str:
+        if self._lunar_date is None:
+            self._lunar_date = lunar_date_text(self.lunar_year, self.lunar_month, self.lunar_day)
+        return self._lunar_date
+
+    def to_dict(self) -> dict:
+        """
+        轉為文字欄位字典（get_chart()、app.py 與 Logger 使用的格式）
+
+        Returns:
+            dict: lunar_date、四柱、day_master、day_master_element 與 bazi_full
+        """
+        year_pillar = PILLAR_TEXT[self.year]
+        month_pillar = PILLAR_TEXT[self.month]
+        day_pillar = PILLAR_TEXT[self.day]
+        time_pillar = PILLAR_TEXT[self.time]
+        return {
+            "lunar_date": self.lunar_date,
+            "year_pillar": year_pillar,
+            "month_pillar": month_pillar,
+            "day_pillar": day_pillar,
+            "time_pillar": time_pillar,
+            "day_master": TIAN_GAN[self.day % 10],
+            "day_master_element": ELEMENTS[STEM_ELEMENT[self.day % 10]],
+            "bazi_full": f"{year_pillar} {month_pillar} {day_pillar} {time_pillar}"
+        }
+
+    # --- 值語意 ---
+    def _key(self) -> tuple:
+        return (self.code, self.lunar_year, self.lunar_month, self.lunar_day)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Chart):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return self.code
+
+    def __reduce__(self):
+        return (Chart, (self.year, self.month, self.day, self.time, self.lunar_year, self.lunar_month, self.lunar_day))
+
+    def __repr__(self) -> str:
+        return f"Chart({self.bazi_full}, {self.lunar_date})"
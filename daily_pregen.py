@@ -0,0 +1,71 @@
+"""
+每日運勢預生成腳本
+為每個日主（10 天干）× 當日日柱預先生成流日解析並寫入 DailyFortuneStore，
+供 get_fortune 直接取用。建議以 cron 於每日凌晨執行，例如：
+
+    5 0 * * * cd /path/to/easyai-mvp && python daily_pregen.py
+
+用法：
+    python daily_pregen.py [--date YYYY-MM-DD] [--days N]
+"""
+
+import argparse
+from datetime import date, timedelta
+import sys
+
+from bazi_engine import (
+    TIAN_GAN,
+    _today,
+    daily_meta,
+    daily_store,
+    generate_daily_fortune,
+    get_day_pillar
+)
+from daily_store import is_current
+
+
+def pregenerate_day(day: date) -> int:
+    """
+    生成某日全部日主的解析並寫入存放區
+
+    Args:
+        day: 流日日期
+
+    Returns:
+        int: 生成失敗的日主數
+    """
+    day_pillar = get_day_pillar(day)
+    meta = daily_meta()
+    fortunes = dict(daily_store.get_day(day))
+    failures = 0
+
+    for day_master in TIAN_GAN:
+        # 已有相同日柱、模型與 Prompt 版本的解析時略過
+        if is_current(fortunes.get(day_master), day_pillar, meta):
+            continue
+        try:
+            text = generate_daily_fortune(day_master, day)
+        except Exception as e:
+            print(f"❌ {day.isoformat()} 日主 {day_master} 生成失敗：{str(e)}")
+            failures += 1
+            continue
+        fortunes[day_master] = {"day_pillar": day_pillar, "text": text, **meta}
+
+    daily_store.put_day(day, fortunes, meta)
+    print(f"✅ {day.isoformat()}（日柱 {day_pillar}）已生成 {len(fortunes)}/{len(TIAN_GAN)} 個日主")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="預生成每日流日運勢")
+    parser.add_argument("--date", help="起始日期 YYYY-MM-DD（預設為今天）")
+    parser.add_argument("--days", type=int, default=2, help="連續生成天數（預設 2：今天與明天）")
+    args = parser.parse_args()
+
+    start = date.fromisoformat(args.date) if args.date else _today()
+    failures = sum(pregenerate_day(start + timedelta(days=i)) for i in range(args.days))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
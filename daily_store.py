@@ -0,0 +1,140 @@
+"""
+每日運勢預生成存放模組
+以日期為單位保存 10 個日主的流日解析（JSON），供 bazi_engine 以字典查找直接取用
+"""
+
+from datetime import date
+import json
+import os
+import threading
+
+
+def is_current(entry: dict, day_pillar: str, meta: dict = None) -> bool:
+    """
+    預生成的解析是否仍可使用
+
+    Args:
+        entry: {"day_pillar": 日柱, "text": 解析, "model": ..., "prompt_version": ...}
+        day_pillar: 該日日柱
+        meta: 目前的模型、Prompt 版本等（任一欄位與生成時不符即失效）
+
+    Returns:
+        bool: 日柱與 meta 皆相符時為 True
+    """
+    if entry is None or entry.get("day_pillar") != day_pillar:
+        return False
+    return all(entry.get(key) == value for key, value in (meta or {}).items())
+
+
+class DailyFortuneStore:
+    """每日運勢存放區（每日一個 JSON 檔）"""
+
+    def __init__(self, directory: str = "daily_fortunes"):
+        """
+        初始化存放區
+
+        Args:
+            directory: JSON 檔所在目錄
+        """
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._days = {}  # 日期字串 -> (檔案 mtime, {日主: 解析})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DailyFortuneStore":
+        """依環境變數建立存放區"""
+        return cls(os.environ.get("DAILY_FORTUNE_DIR", "daily_fortunes"))
+
+    def _path(self, day: date) -> str:
+        return os.path.join(self.directory, f"{day.isoformat()}.json")
+
+    def _load(self, day: date) -> dict:
+        """載入某日資料；檔案被預生成排程更新時自動重新讀取"""
+        key = day.isoformat()
+        path = self._path(day)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return {}
+
+        entry = self._days.get(key)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"❌ 讀取每日運勢失敗：{str(e)}")
+                return {}
+            # 只保留最近幾天，避免長時間運行時無限累積
+            if len(self._days) >= 8:
+                self._days.pop(min(self._days))
+            # 檔案層級的 meta（模型、Prompt 版本）為各日主的預設值，相容只在檔案層級記錄的舊檔
+            meta = {k: v for k, v in data.items() if k not in ("date", "fortunes")}
+            self._days[key] = (mtime, {
+                day_master: {**meta, **entry} for day_master, entry in data.get("fortunes", {}).items()
+            })
+            return self._days[key][1]
+
+    def get(self, day: date, day_master: str, day_pillar: str, meta: dict = None):
+        """
+        取得預生成的流日解析
+
+        Args:
+            day: 流日日期
+            day_master: 日主天干
+            day_pillar: 該日日柱（與預生成時不符則視為未命中）
+            meta: 目前的模型、Prompt 版本等（與預生成時不符則視為未命中）
+
+        Returns:
+            str | None: 解析文字，未命中時為 None
+        """
+        entry = self._load(day).get(day_master)
+        if not is_current(entry, day_pillar, meta):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.get("text")
+
+    def get_stats(self) -> dict:
+        """
+        獲取查詢統計資訊
+
+        Returns:
+            dict: 命中數、未命中數與命中率
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def put_day(self, day: date, fortunes: dict, meta: dict = None):
+        """
+        寫入某日全部日主的解析（原子替換檔案）
+
+        Args:
+            day: 流日日期
+            fortunes: {日主: {"day_pillar": 日柱, "text": 解析, "model": ..., "prompt_version": ...}}
+            meta: 額外記錄的資訊（模型、Prompt 版本等）
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(day)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"date": day.isoformat(), **(meta or {}), "fortunes": fortunes}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def get_day(self, day: date) -> dict:
+        """
+        取得某日全部日主的解析
+
+        Returns:
+            dict: {日主: {"day_pillar": 日柱, "text": 解析, "model": ..., "prompt_version": ...}}
+        """
+        return dict(self._load(day))
@@ -0,0 +1,113 @@
+"""
+規則版運勢生成模組
+LLM 逾時或斷路時的降級方案：依日主、四柱與流日日柱的五行關係，
+以模板即時組出與 AI 相同結構（本質分析 / 行動建議 / 一句話總結）的解析
+"""
+
+from chart import ELEMENTS, STEM_ELEMENT, TIAN_GAN, Chart
+
+# 流日天干與日主的關係（依今日五行在相生順序上相對日主的位置）
+_RELATION_BY_OFFSET = {0: "同我", 1: "我生", 2: "我剋", 3: "剋我", 4: "生我"}
+
+_ELEMENT_IMAGE = {
+    "木": "一棵正在抽芽的樹",
+    "火": "一盞燒得正旺的燈",
+    "土": "一塊穩穩的大地",
+    "金": "一把剛磨好的刀",
+    "水": "一條流動的河"
+}
+
+_RELATION_TEXT = {
+    "同我": (
+        "今天的能量跟你同一國，就像在球場上突然多了幾個默契十足的隊友，"
+        "做事有人挺、說話有人附和，自信心跟著加滿。",
+        "但隊友多也代表搶球的人多，別人可能跟你看上同一個機會，"
+        "就像排隊買限量款時發現前面全是同好。",
+        "今天適合合作、找夥伴，別急著單打獨鬥，也別為小事跟朋友較勁。"
+    ),
+    "我生": (
+        "今天你的能量往外流，像一台開到最大聲的音響，"
+        "想法多、表達欲強，很適合發揮創意、寫東西、做簡報。",
+        "不過輸出太多也會耗電，就像手機開著導航又放音樂，電量掉得特別快。",
+        "記得把想法落實成一兩件具體作品，說得漂亮不如做得出來。"
+    ),
+    "我剋": (
+        "今天你握有主導權，像拿著遙控器的人，想轉哪一台就轉哪一台，"
+        "處理錢、談條件、推進進度都比平常順手。",
+        "但控制欲太強會讓人壓力山大，就像把氣球捏太緊反而會爆。",
+        "把力氣花在真正重要的目標上，收穫會比四處插手來得實在。"
+    ),
+    "剋我": (
+        "今天外在壓力比較明顯，像背著一個偏重的背包爬坡，"
+        "規則、期限或長輩主管的要求會一件件找上門。",
+        "壓力也是一種鍛鍊，就像重訓時那幾下最痠的動作，撐過去肌肉才會長出來。",
+        "別硬碰硬，按部就班把份內的事做好，就是今天最聰明的策略。"
+    ),
+    "生我": (
+        "今天有人替你加油打氣，像手機接上快充，"
+        "學習新東西、請教前輩、整理思緒都特別有效率。",
+        "只是被照顧太舒服容易變懶，就像冬天賴在被窩裡，一不小心就錯過時間。",
+        "把收到的資源轉化成行動，今天吸收的東西會在之後派上用場。"
+    )
+}
+
+_SUMMARY = {
+    "同我": "今天靠團隊不靠蠻力，找對夥伴比什麼都重要。",
+    "我生": "今天適合輸出，把腦中的好點子變成看得見的成果。",
+    "我剋": "今天你是主導者，抓大放小，把力氣用在刀口上。",
+    "剋我": "今天壓力是磨刀石，穩住節奏，別跟規則硬碰硬。",
+    "生我": "今天是充電日，多聽多學，貴人就在身邊。"
+}
+
+_ACTIONS = {
+    "木": ("綠色或青色", "東方，或有樹木植物的公園", "綠色蔬菜、芽菜等清爽的食物"),
+    "火": ("紅色或紫色", "南方，或陽光充足的地方", "溫熱的食物，如熱湯、烤物"),
+    "土": ("黃色或咖啡色", "離家不遠、熟悉的地方", "地瓜、南瓜等根莖類"),
+    "金": ("白色或金屬色", "西方，或整潔明亮的空間", "白蘿蔔、梨子等白色食物"),
+    "水": ("黑色或深藍色", "北方，或靠近水邊的地方", "湯品、海鮮等富含水分的食物")
+}
+
+
+def generate_fallback_fortune(chart: Chart, today_pillar: str) -> str:
+    """
+    以規則生成流日運勢解析（結果固定、不需網路）
+
+    Args:
+        chart: 命盤
+        today_pillar: 今日日柱
+
+    Returns:
+        str: 含本質分析、行動建議、一句話總結的解析
+    """
+    element_index = chart.day_master_element_index
+    element = ELEMENTS[element_index]
+    today_element = STEM_ELEMENT[TIAN_GAN.index(today_pillar[0])]
+    relation = _RELATION_BY_OFFSET[(today_element - element_index) % 5]
+
+    # 身強身弱：八字中同我（比劫）與生我（印）的字數是否過半
+    counts = chart.element_counts()
+    support = counts[element_index] + counts[(element_index - 1) % 5]
+    strong = support * 2 > sum(counts)
+
+    # 身強宜洩（我生），身弱宜扶（生我）
+    favorable = ELEMENTS[(element_index + (1 if strong else -1)) % 5]
+    color, direction, food = _ACTIONS[favorable]
+    opening, metaphor, advice = _RELATION_TEXT[relation]
+
+    strength_text = (
+        "底子本來就厚，今天的重點是把多出來的能量花出去"
+        if strong else
+        "底子偏細膩，今天的重點是替自己補充能量"
+    )
+
+    return (
+        f"**本質分析**\n"
+        f"你的日主是{chart.day_master}{element}，像{_ELEMENT_IMAGE[element]}，{strength_text}。"
+        f"逢{today_pillar}日，{opening}{metaphor}{advice}\n\n"
+        f"**行動建議**\n"
+        f"- 穿什麼：{color}。{favorable}的顏色能幫你調和今天的能量，整個人看起來更有精神。\n"
+        f"- 往哪走：{direction}。在{favorable}氣旺的地方活動，做事比較順，心情也跟著開闊。\n"
+        f"- 吃什麼：{food}。從飲食補{favorable}，身體舒服，判斷力自然清楚。\n\n"
+        f"**一句話總結**\n"
+        f"{_SUMMARY[relation]}"
+    )
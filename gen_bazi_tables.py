@@ -0,0 +1,82 @@
+"""
+曆法查表生成腳本
+以 lunar_python 為準，預先計算節氣日期與農曆月表，輸出為 bazi_tables.py
+
+用法：
+    python gen_bazi_tables.py
+"""
+
+from lunar_python import LunarYear, Solar
+
+
+FIRST_YEAR = 1899
+LAST_YEAR = 2101
+OUTPUT_PATH = "bazi_tables.py"
+
+HEADER = '''"""
+曆法查表（由 gen_bazi_tables.py 自動生成，請勿手動修改）
+資料來源為 lunar_python，供 bazi_engine 的查表排盤使用
+
+JIE_DAYS:
+    自 JIE_FIRST_YEAR 起每個公曆年一個字串，共 12 位數字，
+    依序為 小寒、立春、驚蟄、清明、立夏、芒種、小暑、立秋、白露、寒露、立冬、大雪
+    所在的公曆日（分別落在 1 月至 12 月）
+LUNAR_YEARS:
+    自 LUNAR_FIRST_YEAR 起每個農曆年一筆 (正月初一公曆月, 正月初一公曆日, 閏月, 大小月位元)
+    閏月為 0 表示無閏月；大小月位元依月份先後（含閏月）由最低位起算，1 為大月（30 天）
+"""
+
+'''
+
+
+def _jie_days(year: int) -> str:
+    """取得某公曆年 12 個「節」的公曆日"""
+    julian_days = LunarYear.fromYear(year).getJieQiJulianDays()
+    days = ""
+    # 索引 2, 4, ..., 24 依序為 小寒 ... 大雪
+    for month, i in enumerate(range(2, 25, 2), start=1):
+        solar = Solar.fromJulianDay(julian_days[i])
+        if solar.getYear() != year or solar.getMonth() != month or solar.getDay() > 9:
+            raise ValueError(f"節氣日期超出編碼範圍: {solar.toYmd()}")
+        days += str(solar.getDay())
+    return days
+
+
+def _lunar_year_info(year: int) -> tuple:
+    """取得某農曆年的正月初一、閏月與大小月資訊"""
+    lunar_year = LunarYear.fromYear(year)
+    months = [m for m in lunar_year.getMonths() if m.getYear() == year]
+    first = Solar.fromJulianDay(months[0].getFirstJulianDay())
+    sizes = 0
+    for i, m in enumerate(months):
+        if m.getDayCount() == 30:
+            sizes |= 1 << i
+    return (first.getMonth(), first.getDay(), lunar_year.getLeapMonth(), sizes)
+
+
+def main():
+    years = range(FIRST_YEAR, LAST_YEAR + 1)
+    lines = [HEADER]
+
+    lines.append(f"JIE_FIRST_YEAR = {FIRST_YEAR}\n")
+    lines.append("JIE_DAYS = (\n")
+    jie = [f'"{_jie_days(y)}"' for y in years]
+    for i in range(0, len(jie), 6):
+        lines.append("    " + ", ".join(jie[i:i + 6]) + ",\n")
+    lines.append(")\n\n")
+
+    lines.append(f"LUNAR_FIRST_YEAR = {FIRST_YEAR}\n")
+    lines.append("LUNAR_YEARS = (\n")
+    info = [f"({m}, {d}, {leap}, 0x{sizes:04x})" for m, d, leap, sizes in map(_lunar_year_info, years)]
+    for i in range(0, len(info), 4):
+        lines.append("    " + ", ".join(info[i:i + 4]) + ",\n")
+    lines.append(")\n")
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+    print(f"✅ 已生成 {OUTPUT_PATH}（{FIRST_YEAR}-{LAST_YEAR}）")
+
+
+if __name__ == "__main__":
+    main()
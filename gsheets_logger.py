@@ -3,11 +3,42 @@ Google Sheets Logger for eeasy.ai
 數據資產鎖定模組 - 將用戶查詢與 AI 回應寫入 Google Sheets
 """
 
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 import json
 import os
+import threading
+
+from metrics import track_stage
+
+
+# 標題列
+HEADERS = [
+    "Timestamp",
+    "Birth_DateTime",
+    "Lunar_Date",
+    "Bazi_Chart",
+    "Day_Master",
+    "Day_Master_Element",
+    "AI_Response",
+    "LLM_Model",
+    "LLM_Latency_ms",
+    "LLM_TTFT_ms",
+    "Prompt_Tokens",
+    "Completion_Tokens",
+    "Finish_Reason",
+    "Flow_Date",
+    "Record_ID"
+]
+
+# 遙測欄位對應的 get_fortune 結果鍵
+TELEMETRY_KEYS = [
+    "llm_model",
+    "llm_latency_ms",
+    "llm_ttft_ms",
+    "llm_prompt_tokens",
+    "llm_completion_tokens",
+    "llm_finish_reason"
+]
 
 
 class GoogleSheetsLogger:
@@ -25,6 +56,19 @@ class GoogleSheetsLogger:
         self.sheet_url = sheet_url or os.environ.get("GOOGLE_SHEETS_URL")
         self.client = None
         self.worksheet = None
+        self._connect_lock = threading.Lock()
+        self._unconfirmed = set()  # 寫入時發生錯誤、不確定是否已寫入的 Record_ID
+    
+    def is_configured(self):
+        """是否已設定憑證與 Sheet URL（不連線）"""
+        return bool(self.credentials_json and self.sheet_url)
+    
+    def _ensure_connected(self):
+        """尚未連接時才連接（首次記錄或查詢統計時；多個執行緒同時呼叫只連接一次）"""
+        if self.worksheet:
+            return True
+        with self._connect_lock:
+            return bool(self.worksheet) or self.connect()
         
     def connect(self):
         """連接到 Google Sheets"""
@@ -47,6 +91,10 @@ class GoogleSheetsLogger:
             else:
                 raise ValueError("credentials_json 必須是 JSON 字串或檔案路徑")
             
+            # gspread 與 google-auth 載入耗時，延遲到實際連線時才匯入
+            import gspread
+            from google.oauth2.service_account import Credentials
+            
             # 建立憑證
             credentials = Credentials.from_service_account_info(
                 creds_dict,
@@ -62,9 +110,12 @@ class GoogleSheetsLogger:
             else:
                 raise ValueError("未設定 GOOGLE_SHEETS_URL")
             
-            # 檢查是否需要初始化標題列
-            if not self.worksheet.row_values(1):
+            # 檢查是否需要初始化或補齊標題列
+            existing_headers = self.worksheet.row_values(1)
+            if not existing_headers:
                 self._initialize_headers()
+            elif existing_headers == HEADERS[:len(existing_headers)] and len(existing_headers) < len(HEADERS):
+                self.worksheet.update(range_name="A1", values=[HEADERS])
             
             return True
             
@@ -74,16 +125,45 @@ class GoogleSheetsLogger:
     
     def _initialize_headers(self):
         """初始化 Google Sheet 標題列"""
-        headers = [
-            "Timestamp",
-            "Birth_DateTime",
-            "Lunar_Date",
-            "Bazi_Chart",
-            "Day_Master",
-            "Day_Master_Element",
-            "AI_Response"
+        self.worksheet.append_row(HEADERS)
+    
+    @staticmethod
+    def _build_row(fortune_data):
+        """將 get_fortune() 結果轉為一列（記錄時間取 logged_at，未設定時為現在）"""
+        row = [
+            fortune_data.get("logged_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            fortune_data.get("birth_datetime", ""),
+            fortune_data.get("lunar_date", ""),
+            fortune_data.get("bazi_full", ""),
+            fortune_data.get("day_master", ""),
+            fortune_data.get("day_master_element", ""),
+            fortune_data.get("ai_fortune", "")
         ]
-        self.worksheet.append_row(headers)
+        # LLM 遙測（未呼叫 LLM 時留空）
+        row.extend("" if fortune_data.get(key) is None else fortune_data[key] for key in TELEMETRY_KEYS)
+        # 生成時的流日（DAILY_TIMEZONE）
+        row.append(fortune_data.get("ai_flow_date") or "")
+        # 記錄鍵（由 log_queue 排入時產生，重試時用來略過已寫入的資料列）
+        row.append(fortune_data.get("record_id") or "")
+        return row
+    
+    def _unwritten(self, rows):
+        """
+        略過先前寫入失敗、但其實已寫入的資料列（如回應逾時但請求已完成）
+
+        只有批次中含有不確定的 Record_ID 時才讀取 Record_ID 欄比對。
+
+        Args:
+            rows: _build_row() 的結果列表
+
+        Returns:
+            list: 尚未寫入的資料列
+        """
+        if not any(row[-1] in self._unconfirmed for row in rows):
+            return rows
+        written = set(self.worksheet.col_values(len(HEADERS)))
+        self._unconfirmed -= written
+        return [row for row in rows if not row[-1] or row[-1] not in written]
     
     def log_fortune(self, fortune_data):
         """
@@ -97,23 +177,15 @@ class GoogleSheetsLogger:
         """
         try:
             # 確保已連接
-            if not self.worksheet:
-                if not self.connect():
-                    return False
+            if not self._ensure_connected():
+                return False
             
             # 準備數據行
-            row = [
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                fortune_data.get("birth_datetime", ""),
-                fortune_data.get("lunar_date", ""),
-                fortune_data.get("bazi_full", ""),
-                fortune_data.get("day_master", ""),
-                fortune_data.get("day_master_element", ""),
-                fortune_data.get("ai_fortune", "")
-            ]
+            row = self._build_row(fortune_data)
             
             # 寫入 Google Sheet
-            self.worksheet.append_row(row)
+            with track_stage("sheets_write"):
+                self.worksheet.append_row(row)
             
             print(f"✅ 已記錄數據到 Google Sheets")
             return True
@@ -122,6 +194,43 @@ class GoogleSheetsLogger:
             print(f"❌ Google Sheets 記錄失敗: {e}")
             return False
     
+    def log_fortunes(self, fortune_data_list):
+        """
+        批次記錄多筆運勢數據（一次 API 呼叫；供 log_queue 使用）
+        
+        Args:
+            fortune_data_list: 包含八字與 AI 解析的字典列表
+        
+        Returns:
+            bool: 是否成功記錄
+        """
+        try:
+            if not fortune_data_list:
+                return True
+            if not self._ensure_connected():
+                return False
+            
+            rows = self._unwritten([self._build_row(d) for d in fortune_data_list])
+            if not rows:
+                print(f"✅ {len(fortune_data_list)} 筆數據先前已寫入 Google Sheets")
+                return True
+            keys = {row[-1] for row in rows if row[-1]}
+            try:
+                with track_stage("sheets_write"):
+                    self.worksheet.append_rows(rows)
+            except Exception:
+                # 請求可能已在伺服器端完成，重試時先比對 Record_ID，避免重複寫入
+                self._unconfirmed |= keys
+                raise
+            self._unconfirmed -= keys
+            
+            print(f"✅ 已記錄 {len(rows)} 筆數據到 Google Sheets")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Google Sheets 記錄失敗: {e}")
+            return False
+    
     def get_stats(self):
         """
         獲取語料庫統計資訊
@@ -130,16 +239,16 @@ class GoogleSheetsLogger:
             dict: 統計資訊
         """
         try:
-            if not self.worksheet:
-                if not self.connect():
-                    return {
-                        "total_records": 0,
-                        "latest_timestamp": None,
-                        "status": "未連接"
-                    }
+            if not self._ensure_connected():
+                return {
+                    "total_records": 0,
+                    "latest_timestamp": None,
+                    "status": "未連接"
+                }
             
             # 獲取所有數據
-            all_values = self.worksheet.get_all_values()
+            with track_stage("sheets_stats"):
+                all_values = self.worksheet.get_all_values()
             
             # 扣除標題列
             total_records = len(all_values) - 1 if len(all_values) > 1 else 0
@@ -174,9 +283,8 @@ class GoogleSheetsLogger:
             bool: 是否成功匯出
         """
         try:
-            if not self.worksheet:
-                if not self.connect():
-                    return False
+            if not self._ensure_connected():
+                return False
             
             # 獲取所有數據
             all_values = self.worksheet.get_all_values()
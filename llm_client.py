@@ -0,0 +1,279 @@
+"""
+LLM 客戶端管理模組
+提供行程共用的 OpenAI 客戶端（以 keep-alive 連線池重用 HTTP/TLS 連線），
+以及限制同時進行中 LLM 呼叫數的全域併發限制器
+"""
+
+import asyncio
+from collections import deque
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from llm_deadline import _background_loop
+
+# openai 與 httpx 載入耗時，延遲到第一次建立客戶端時才匯入（縮短冷啟動時間）
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+_client = None
+_client_config = None
+_lock = threading.Lock()
+
+# 非同步客戶端的連線池綁定於事件迴圈，只在 llm_deadline 的常駐背景迴圈上建立與使用
+_async_client = None
+_async_client_config = None
+
+
+def load_config() -> dict:
+    """
+    從環境變數讀取客戶端設定
+
+    Returns:
+        dict: API 端點、連線池上限與逾時設定
+    """
+    return {
+        "api_key": os.environ.get("OPENAI_API_KEY"),
+        "base_url": os.environ.get("OPENAI_BASE_URL"),
+        "max_connections": int(os.environ.get("OPENAI_MAX_CONNECTIONS", "20")),
+        "max_keepalive_connections": int(os.environ.get("OPENAI_MAX_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "60")),
+        "timeout": float(os.environ.get("OPENAI_TIMEOUT", "60")),
+        "connect_timeout": float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "5")),
+        "max_retries": int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+    }
+
+
+def create_client(config: dict = None) -> "OpenAI":
+    """
+    建立新的 OpenAI 客戶端（附帶獨立連線池）
+
+    Args:
+        config: load_config() 格式的設定（預設讀取環境變數）
+
+    Returns:
+        OpenAI: 客戶端
+    """
+    import httpx
+    from openai import OpenAI
+
+    config = config or load_config()
+    timeout = httpx.Timeout(config["timeout"], connect=config["connect_timeout"])
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=config["keepalive_expiry"]
+        ),
+        timeout=timeout
+    )
+    return OpenAI(
+        api_key=config["api_key"],
+        base_url=config["base_url"],
+        timeout=timeout,
+        max_retries=config["max_retries"],
+        http_client=http_client
+    )
+
+
+def create_async_client(config: dict = None) -> "AsyncOpenAI":
+    """
+    建立新的 AsyncOpenAI 客戶端（附帶獨立連線池）
+
+    Args:
+        config: load_config() 格式的設定（預設讀取環境變數）
+
+    Returns:
+        AsyncOpenAI: 非同步客戶端
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    config = config or load_config()
+    timeout = httpx.Timeout(config["timeout"], connect=config["connect_timeout"])
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=config["keepalive_expiry"]
+        ),
+        timeout=timeout
+    )
+    return AsyncOpenAI(
+        api_key=config["api_key"],
+        base_url=config["base_url"],
+        timeout=timeout,
+        max_retries=config["max_retries"],
+        http_client=http_client
+    )
+
+
+def get_client() -> "OpenAI":
+    """
+    取得行程共用的 OpenAI 客戶端
+
+    客戶端可安全地跨 Streamlit session 執行緒共用；
+    環境變數（如 API Key）變更時會自動重建。
+
+    Returns:
+        OpenAI: 共用客戶端
+    """
+    global _client, _client_config
+
+    config = load_config()
+    client = _client
+    if client is not None and _client_config == config:
+        return client
+
+    with _lock:
+        if _client is None or _client_config != config:
+            # 舊客戶端可能仍有進行中的請求，不主動關閉
+            _client = create_client(config)
+            _client_config = config
+        return _client
+
+
+def close_client():
+    """關閉共用客戶端並釋放連線池"""
+    global _client, _client_config
+
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_config = None
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    取得行程共用的 AsyncOpenAI 客戶端（需於 llm_deadline 的背景事件迴圈內呼叫）
+
+    其他事件迴圈（如 Streamlit 的 asyncio.run() 與批次腳本）上的協程經
+    llm_deadline.run_in_background 於背景迴圈呼叫，整個行程共用同一個連線池，
+    不會為每個短暫的迴圈各建立一個之後無人關閉的連線池。
+    環境變數（如 API Key）變更時會自動重建。
+
+    Returns:
+        AsyncOpenAI: 非同步客戶端
+    """
+    global _async_client, _async_client_config
+
+    if asyncio.get_running_loop() is not _background_loop():
+        raise RuntimeError("get_async_client() 只能在背景事件迴圈內呼叫（請經 run_sync 或 run_in_background）")
+    config = load_config()
+    with _lock:
+        if _async_client is None or _async_client_config != config:
+            # 舊客戶端可能仍有進行中的請求，不主動關閉（同 get_client）
+            _async_client = create_async_client(config)
+            _async_client_config = config
+        return _async_client
+
+
+class ConcurrencyLimiter:
+    """
+    全域 LLM 併發限制器
+
+    同時支援執行緒（with）與協程（async with），且跨事件迴圈共用同一個上限，
+    Streamlit 各 session 執行緒與批次腳本的呼叫合計不超過 limit。
+    """
+
+    def __init__(self, limit: int):
+        """
+        初始化限制器
+
+        Args:
+            limit: 同時進行中的 LLM 呼叫上限
+        """
+        self.limit = limit
+        self._in_flight = 0
+        self._waiters = deque()  # threading.Event 或 (loop, future)
+        self._lock = threading.Lock()
+
+    def _try_acquire_locked(self) -> bool:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        """同步取得名額（阻塞目前執行緒）"""
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        """非同步取得名額（只暫停目前協程）"""
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # 名額已轉交給此協程，歸還給下一位
+            self.release()
+            raise
+
+    def release(self):
+        """釋放名額；有等待者時直接轉交"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(_resolve_waiter, future)
+                    return
+                except RuntimeError:
+                    # 事件迴圈已關閉，略過此等待者
+                    continue
+            self._in_flight -= 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def get_stats(self) -> dict:
+        """
+        獲取限制器狀態
+
+        Returns:
+            dict: 上限、進行中與等待中的呼叫數
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters)
+            }
+
+
+def _resolve_waiter(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# 全域 LLM 併發上限
+llm_limiter = ConcurrencyLimiter(int(os.environ.get("LLM_MAX_CONCURRENCY", "8")))
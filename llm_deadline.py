@@ -0,0 +1,461 @@
+"""
+LLM 呼叫時限模組
+為每次 LLM 呼叫套用端到端時限：時限內以抖動退避重試可恢復的錯誤，
+依近期 p95 延遲發出對沖（hedged）請求，先完成者勝出並取消落後的請求；
+連續失敗時以斷路器暫停呼叫，讓呼叫端立即降級
+"""
+
+import asyncio
+from collections import deque
+from contextlib import nullcontext
+import os
+import random
+import threading
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """LLM 呼叫超過時限"""
+
+
+class CircuitOpen(RuntimeError):
+    """斷路器開啟中，暫停呼叫 LLM"""
+
+
+def load_policy() -> dict:
+    """
+    從環境變數讀取時限策略
+
+    Returns:
+        dict: 時限、重試與對沖設定
+    """
+    return {
+        "deadline": float(os.environ.get("LLM_DEADLINE", "30")),
+        "max_attempts": int(os.environ.get("LLM_MAX_ATTEMPTS", "3")),
+        "retry_base_delay": float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.25")),
+        "retry_max_delay": float(os.environ.get("LLM_RETRY_MAX_DELAY", "2")),
+        "hedge": os.environ.get("LLM_HEDGE", "0") == "1",
+        "hedge_percentile": float(os.environ.get("LLM_HEDGE_PERCENTILE", "0.95")),
+        "hedge_min_samples": int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20")),
+        "hedge_min_delay": float(os.environ.get("LLM_HEDGE_MIN_DELAY", "0.2"))
+    }
+
+
+class LatencyTracker:
+    """近期成功呼叫的延遲樣本（滑動視窗，執行緒安全）"""
+
+    def __init__(self, window: int = 200):
+        """
+        初始化追蹤器
+
+        Args:
+            window: 保留的樣本數
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """記錄一次成功呼叫的延遲（秒）"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        """
+        計算延遲百分位數
+
+        Args:
+            p: 百分位（0-1）
+
+        Returns:
+            float | None: 秒數；尚無樣本時為 None
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+# 全域延遲樣本（決定對沖延遲）
+llm_latency = LatencyTracker()
+
+
+class CircuitBreaker:
+    """
+    LLM 斷路器（執行緒安全）
+
+    連續 failure_threshold 次逾時或可恢復的錯誤後開啟，開啟期間 allow() 回傳 False；
+    經過 reset_timeout 秒後放行一個試探請求，成功即關閉，失敗則再開啟 reset_timeout 秒。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        初始化斷路器
+
+        Args:
+            failure_threshold: 開啟前允許的連續失敗次數
+            reset_timeout: 開啟後多久放行試探請求（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """依環境變數建立斷路器"""
+        return cls(
+            failure_threshold=int(os.environ.get("LLM_CIRCUIT_FAILURES", "5")),
+            reset_timeout=float(os.environ.get("LLM_CIRCUIT_RESET", "30"))
+        )
+
+    def allow(self) -> bool:
+        """是否允許呼叫 LLM"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # 放行一個試探請求，其餘呼叫在下一個 reset_timeout 前仍被擋下
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        """記錄成功並關閉斷路器"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        """記錄失敗；達到門檻（或試探失敗）時開啟斷路器"""
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        """
+        獲取斷路器狀態
+
+        Returns:
+            dict: 狀態（closed / open）與連續失敗次數
+        """
+        with self._lock:
+            return {
+                "state": "closed" if self._opened_at is None else "open",
+                "consecutive_failures": self._failures
+            }
+
+
+# 全域 LLM 斷路器
+llm_circuit = CircuitBreaker.from_env()
+
+_stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "circuit_rejected": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats() -> dict:
+    """
+    獲取時限控制統計
+
+    Returns:
+        dict: 呼叫、重試、對沖、對沖勝出、逾時與斷路拒絕次數，
+            近期 p50/p95 延遲（毫秒），以及斷路器狀態
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["circuit"] = llm_circuit.get_stats()["state"]
+    p50 = llm_latency.percentile(0.5)
+    p95 = llm_latency.percentile(0.95)
+    stats["p50_ms"] = round(p50 * 1000, 1) if p50 is not None else None
+    stats["p95_ms"] = round(p95 * 1000, 1) if p95 is not None else None
+    return stats
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """判斷錯誤是否值得重試（連線錯誤、逾時、429 與 5xx）"""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code in (408, 409, 429) or status_code >= 500
+
+    import openai
+
+    return isinstance(exc, (openai.APIConnectionError, ConnectionError, TimeoutError))
+
+
+def backoff_delay(attempt: int, policy: dict) -> float:
+    """第 attempt 次重試前的等待秒數（指數退避 + 完全抖動）"""
+    cap = min(policy["retry_max_delay"], policy["retry_base_delay"] * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def hedge_delay(policy: dict, tracker: LatencyTracker = None):
+    """
+    對沖請求的延遲秒數
+
+    Returns:
+        float | None: 主請求超過此秒數仍未完成時發出對沖；未啟用或樣本不足時為 None
+    """
+    tracker = tracker or llm_latency
+    if not policy["hedge"] or len(tracker) < policy["hedge_min_samples"]:
+        return None
+    return max(policy["hedge_min_delay"], tracker.percentile(policy["hedge_percentile"]))
+
+
+def _check_circuit(breaker: CircuitBreaker):
+    if breaker is not None and not breaker.allow():
+        _count("circuit_rejected")
+        raise CircuitOpen("LLM 服務暫時不穩定，已暫停呼叫")
+
+
+def _record_outcome(breaker: CircuitBreaker, error: BaseException = None):
+    """依呼叫結果更新斷路器（只有逾時與可恢復的錯誤算作上游故障）"""
+    if breaker is None:
+        return
+    if error is None:
+        breaker.record_success()
+    elif isinstance(error, DeadlineExceeded) or is_retryable(error):
+        breaker.record_failure()
+
+
+async def call_with_deadline(
+    request_fn,
+    policy: dict = None,
+    limiter=None,
+    tracker: LatencyTracker = None,
+    breaker: CircuitBreaker = None
+):
+    """
+    在時限內呼叫 LLM（重試、對沖並取消落後的請求）
+
+    Args:
+        request_fn: 接收 timeout（剩餘秒數）並回傳 awaitable 的函數
+        policy: load_policy() 格式的策略（預設讀取環境變數）
+        limiter: 每次請求需取得的併發限制器（支援 async with）
+        tracker: 延遲樣本（預設為全域 llm_latency）
+        breaker: 斷路器（None 表示不使用）
+
+    Returns:
+        tuple: (回應, 勝出請求送出時的 time.perf_counter())
+
+    Raises:
+        CircuitOpen: 斷路器開啟中
+        DeadlineExceeded: 超過時限
+        Exception: 不可重試的錯誤，或重試用盡時的最後一個錯誤
+    """
+    _check_circuit(breaker)
+    try:
+        result = await _call_with_retries(request_fn, policy or load_policy(), limiter, tracker or llm_latency)
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker)
+    return result
+
+
+async def _call_with_retries(request_fn, policy: dict, limiter, tracker: LatencyTracker):
+    """時限內的重試迴圈"""
+    deadline = time.monotonic() + policy["deadline"]
+    _count("calls")
+
+    last_error = None
+    for attempt in range(policy["max_attempts"]):
+        if attempt:
+            delay = backoff_delay(attempt - 1, policy)
+            if time.monotonic() + delay >= deadline:
+                break
+            _count("retries")
+            await asyncio.sleep(delay)
+        try:
+            return await _race(request_fn, deadline, policy, limiter, tracker)
+        except DeadlineExceeded:
+            _count("deadline_exceeded")
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            last_error = e
+    raise last_error
+
+
+async def _race(request_fn, deadline: float, policy: dict, limiter, tracker: LatencyTracker):
+    """發出主請求，必要時加發一個對沖請求；回傳先成功者，並取消其餘請求"""
+
+    async def attempt():
+        async with (limiter or _NO_LIMIT):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"LLM 呼叫超過時限 {policy['deadline']:g} 秒")
+            started = time.perf_counter()
+            response = await request_fn(remaining)
+            tracker.record(time.perf_counter() - started)
+            return response, started
+
+    hedge_after = hedge_delay(policy, tracker)
+    hedge_at = time.monotonic() + hedge_after if hedge_after is not None else None
+    primary = asyncio.ensure_future(attempt())
+    tasks = [primary]
+    error = None
+    try:
+        while tasks:
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded(f"LLM 呼叫超過時限 {policy['deadline']:g} 秒")
+            wait_until = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, _ = await asyncio.wait(tasks, timeout=wait_until - now, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    if task is not primary:
+                        _count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+                if not is_retryable(error):
+                    raise error
+
+            if hedge_at is not None and time.monotonic() >= hedge_at and tasks:
+                # 主請求落在長尾，加發一個對沖請求
+                _count("hedges")
+                tasks.append(asyncio.ensure_future(attempt()))
+                hedge_at = None
+        raise error
+    finally:
+        # 取消落後的請求（關閉其 HTTP 連線）
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_LIMIT = _NoLimit()
+
+
+def stream_with_deadline(request_fn, policy: dict = None, limiter=None, breaker: CircuitBreaker = None):
+    """
+    同步串流版本：收到第一個 chunk 前的可恢復錯誤會在時限內重試；
+    串流開始後超過時限即中斷（串流請求不對沖）
+
+    Args:
+        request_fn: 接收 timeout（剩餘秒數）並回傳串流（可迭代、具 close()）的函數
+        policy: load_policy() 格式的策略（預設讀取環境變數）
+        limiter: 串流期間需持有的併發限制器（支援 with）
+        breaker: 斷路器（None 表示不使用）
+
+    Yields:
+        串流 chunk
+
+    Raises:
+        CircuitOpen: 斷路器開啟中
+        DeadlineExceeded: 超過時限
+    """
+    _check_circuit(breaker)
+    try:
+        yield from _stream_with_retries(request_fn, policy or load_policy(), limiter)
+    except Exception as e:
+        _record_outcome(breaker, e)
+        raise
+    _record_outcome(breaker)
+
+
+def _stream_with_retries(request_fn, policy: dict, limiter):
+    """串流的時限內重試迴圈"""
+    deadline = time.monotonic() + policy["deadline"]
+    _count("calls")
+
+    attempt = 0
+    while True:
+        received = False
+        try:
+            with (limiter or nullcontext()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"LLM 呼叫超過時限 {policy['deadline']:g} 秒")
+                stream = request_fn(remaining)
+                try:
+                    for chunk in stream:
+                        received = True
+                        yield chunk
+                        if time.monotonic() > deadline:
+                            raise DeadlineExceeded(f"LLM 呼叫超過時限 {policy['deadline']:g} 秒")
+                finally:
+                    stream.close()
+            return
+        except DeadlineExceeded:
+            _count("deadline_exceeded")
+            raise
+        except Exception as e:
+            attempt += 1
+            if received or not is_retryable(e) or attempt >= policy["max_attempts"]:
+                raise
+            delay = backoff_delay(attempt - 1, policy)
+            if time.monotonic() + delay >= deadline:
+                raise
+            _count("retries")
+            time.sleep(delay)
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """同步呼叫端共用的背景事件迴圈（常駐，讓 AsyncOpenAI 連線池得以重用）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-deadline-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_sync(coro):
+    """
+    在背景事件迴圈執行協程並阻塞等待結果（供同步呼叫端取得對沖與取消能力）
+
+    Args:
+        coro: 協程（應自行以 call_with_deadline 限定時間）
+
+    Returns:
+        協程的回傳值
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+async def run_in_background(coro):
+    """
+    在背景事件迴圈執行協程並等待結果（供其他事件迴圈上的協程使用，如 asyncio.run()）
+
+    LLM 呼叫一律在常駐的背景迴圈執行，AsyncOpenAI 客戶端與連線池只需一份，
+    短暫的事件迴圈結束時不會遺留未關閉的連線池；等待的協程被取消時背景的呼叫也會一併取消。
+
+    Args:
+        coro: 協程
+
+    Returns:
+        協程的回傳值
+    """
+    loop = _background_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
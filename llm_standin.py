@@ -0,0 +1,422 @@
+"""
+本地 LLM 替身伺服器
+相容 OpenAI 的 /v1/chat/completions 端點，讓引擎、前端與壓力測試可完全離線執行。
+可設定延遲分布（含長尾）、逐 token 串流、429 限流、500 錯誤與逾時（不回應）。
+
+用法：
+    python llm_standin.py [--port 8001] [--latency lognormal:0.8,0.4] [--tokens-per-sec 40] ...
+
+    之後設定 OPENAI_BASE_URL=http://127.0.0.1:8001/v1（OPENAI_API_KEY 任意非空值即可）
+
+延遲分布格式（秒）：
+    fixed:0.5            固定延遲
+    uniform:0.2,1.0      均勻分布
+    normal:0.8,0.2       常態分布（平均, 標準差）
+    lognormal:0.8,0.4    對數常態分布（中位數, sigma）
+    exp:0.8              指數分布（平均）
+
+其他端點：
+    GET  /v1/models      模型清單
+    GET  /stats          請求計數（JSON）
+    POST /stats/reset    重設計數
+"""
+
+import argparse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+
+
+# 預設回應（與 AI 解析相同的三段結構）
+DEFAULT_RESPONSE = (
+    "**本質分析**\n"
+    "你的日主是丙火，像一盞燒得正旺的燈，熱情直接、行動力強。"
+    "今天逢流日生扶，就像手機接上快充，學習新東西、請教前輩、整理思緒都特別有效率。"
+    "只是被照顧太舒服容易變懶，把收到的資源轉化成行動，今天吸收的東西會在之後派上用場。\n\n"
+    "**行動建議**\n"
+    "- 穿什麼：黃色或咖啡色。土的顏色能幫你調和今天的能量，整個人看起來更有精神。\n"
+    "- 往哪走：離家不遠、熟悉的地方。在土氣旺的地方活動，做事比較順，心情也跟著開闊。\n"
+    "- 吃什麼：地瓜、南瓜等根莖類。從飲食補土，身體舒服，判斷力自然清楚。\n\n"
+    "**一句話總結**\n"
+    "今天是充電日，多聽多學，貴人就在身邊。"
+)
+
+STAT_NAMES = (
+    "requests",
+    "streamed",
+    "completed",
+    "rate_limited",
+    "errors",
+    "timeouts",
+    "stalls",
+    "abandoned"
+)
+
+
+def parse_latency(spec: str):
+    """
+    解析延遲分布設定
+
+    Args:
+        spec: 如 "lognormal:0.8,0.4"（格式見模組說明）
+
+    Returns:
+        callable: 每次呼叫回傳一個延遲樣本（秒，不小於 0）
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    samplers = {
+        "fixed": (1, lambda a: a),
+        "uniform": (2, lambda a, b: random.uniform(a, b)),
+        "normal": (2, lambda mu, sigma: random.gauss(mu, sigma)),
+        "lognormal": (2, lambda median, sigma: random.lognormvariate(math.log(median), sigma)),
+        "exp": (1, lambda mean: random.expovariate(1 / mean) if mean > 0 else 0.0)
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"無效的延遲分布設定：{spec}")
+    sampler = samplers[kind][1]
+    return lambda: max(0.0, sampler(*values))
+
+
+def load_config() -> dict:
+    """
+    從環境變數讀取替身伺服器設定
+
+    Returns:
+        dict: 延遲分布、串流速度與故障注入設定
+    """
+    return {
+        "latency": os.environ.get("STANDIN_LATENCY", "lognormal:0.8,0.4"),
+        "tail_rate": float(os.environ.get("STANDIN_TAIL_RATE", "0")),
+        "tail_latency": float(os.environ.get("STANDIN_TAIL_LATENCY", "10")),
+        "tokens_per_sec": float(os.environ.get("STANDIN_TOKENS_PER_SEC", "40")),
+        "chunk_chars": int(os.environ.get("STANDIN_CHUNK_CHARS", "2")),
+        "rate_limit_rate": float(os.environ.get("STANDIN_RATE_LIMIT_RATE", "0")),
+        "rpm": int(os.environ.get("STANDIN_RPM", "0")),
+        "retry_after": float(os.environ.get("STANDIN_RETRY_AFTER", "1")),
+        "error_rate": float(os.environ.get("STANDIN_ERROR_RATE", "0")),
+        "timeout_rate": float(os.environ.get("STANDIN_TIMEOUT_RATE", "0")),
+        "stall_rate": float(os.environ.get("STANDIN_STALL_RATE", "0")),
+        "hang_seconds": float(os.environ.get("STANDIN_HANG_SECONDS", "600")),
+        "response": os.environ.get("STANDIN_RESPONSE") or DEFAULT_RESPONSE
+    }
+
+
+class StandInServer(ThreadingHTTPServer):
+    """替身伺服器（每個請求一條執行緒，計數器執行緒安全）"""
+
+    daemon_threads = True
+
+    def __init__(self, config: dict = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        建立伺服器（尚未開始服務）
+
+        Args:
+            config: 設定（預設由 load_config() 從環境變數讀取；可只給部分欄位）
+            host: 綁定位址
+            port: 埠號（0 表示自動選擇）
+        """
+        self.config = {**load_config(), **(config or {})}
+        self.sample_latency = parse_latency(self.config["latency"])
+        super().__init__((host, port), _Handler)
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._recent = deque()
+
+    @property
+    def base_url(self) -> str:
+        """供 OPENAI_BASE_URL 使用的網址"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StandInServer":
+        """於背景執行緒開始服務（供測試與基準測試於同一行程內使用）"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def enter(self) -> bool:
+        """
+        登記一個進行中的請求並檢查每分鐘請求上限
+
+        Returns:
+            bool: 是否超過每分鐘請求上限（應回傳 429）
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._stats["requests"] += 1
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            rpm = self.config["rpm"]
+            if not rpm:
+                return False
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if len(self._recent) >= rpm:
+                return True
+            self._recent.append(now)
+            return False
+
+    def leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def get_stats(self) -> dict:
+        """
+        獲取請求計數
+
+        Returns:
+            dict: 各類請求數、進行中請求數與最大併發數
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight, "max_in_flight": self._max_in_flight}
+
+    def reset_stats(self):
+        """重設計數（進行中請求數保留）"""
+        with self._lock:
+            self._stats = dict.fromkeys(STAT_NAMES, 0)
+            self._max_in_flight = self._in_flight
+            self._recent.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """OpenAI 相容端點"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.get_stats())
+        elif self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4.1-mini", "object": "model", "owned_by": "standin"}]})
+        else:
+            self._send_error(404, "not_found", f"Unknown path {self.path}")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/stats/reset":
+            self.server.reset_stats()
+            self._send_json(200, self.server.get_stats())
+            return
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_error(404, "not_found", f"Unknown path {self.path}")
+            return
+
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_error(400, "invalid_request_error", "Invalid JSON body")
+            return
+
+        over_rpm = self.server.enter()
+        try:
+            self._complete(request, over_rpm)
+        finally:
+            self.server.leave()
+
+    def _complete(self, request: dict, over_rpm: bool):
+        server = self.server
+        config = server.config
+
+        # 故障注入
+        if over_rpm or random.random() < config["rate_limit_rate"]:
+            server.count("rate_limited")
+            self._send_error(
+                429, "rate_limit_exceeded", "Rate limit reached for requests",
+                headers={"Retry-After": f"{config['retry_after']:g}"}
+            )
+            return
+        if random.random() < config["error_rate"]:
+            server.count("errors")
+            self._send_error(500, "server_error", "The server had an error while processing your request")
+            return
+        if random.random() < config["timeout_rate"]:
+            # 不回應，直到客戶端放棄或超過 hang_seconds
+            server.count("timeouts")
+            if self._client_gone_within(config["hang_seconds"]):
+                server.count("abandoned")
+            self.close_connection = True
+            return
+
+        latency = config["tail_latency"] if random.random() < config["tail_rate"] else server.sample_latency()
+        if self._client_gone_within(latency):
+            server.count("abandoned")
+            self.close_connection = True
+            return
+
+        model = request.get("model") or "gpt-4.1-mini"
+        content = config["response"]
+        size = max(1, config["chunk_chars"])
+        chunks = [content[i:i + size] for i in range(0, len(content), size)]
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(chunks),
+            "total_tokens": prompt_tokens + len(chunks)
+        }
+
+        if request.get("stream"):
+            server.count("streamed")
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._stream(model, chunks, usage if include_usage else None)
+            return
+
+        server.count("completed")
+        self._send_json(200, {
+            "id": f"chatcmpl-standin-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    def _stream(self, model: str, chunks: list, usage: dict):
+        """以 SSE 逐 token 串流（依 tokens_per_sec 控制速度）"""
+        config = self.server.config
+        completion_id = f"chatcmpl-standin-{random.getrandbits(32):08x}"
+        created = int(time.time())
+        interval = 1 / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0
+        stall_at = len(chunks) // 2 if random.random() < config["stall_rate"] else None
+
+        def event(choices: list, **extra) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                **extra
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            self._write_chunk(event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+            for i, text in enumerate(chunks):
+                if i == stall_at:
+                    # 串流中途停止輸出，直到客戶端放棄
+                    self.server.count("stalls")
+                    if self._client_gone_within(config["hang_seconds"]):
+                        self.server.count("abandoned")
+                    self.close_connection = True
+                    return
+                if i and interval and self._client_gone_within(interval):
+                    self.server.count("abandoned")
+                    self.close_connection = True
+                    return
+                self._write_chunk(event([{"index": 0, "delta": {"content": text}, "finish_reason": None}]))
+            self._write_chunk(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+            if usage:
+                self._write_chunk(event([], usage=usage))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("abandoned")
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, code: str, message: str, headers: dict = None):
+        error_type = "requests" if status == 429 else code
+        self._send_json(status, {"error": {"message": message, "type": error_type, "code": code}}, headers)
+
+    def _client_gone_within(self, seconds: float) -> bool:
+        """等待 seconds 秒；期間客戶端關閉連線則回傳 True"""
+        end = time.monotonic() + seconds
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.connection], [], [], min(remaining, 0.01))
+            if readable:
+                try:
+                    if not self.connection.recv(1, socket.MSG_PEEK):
+                        return True
+                except OSError:
+                    return True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description="本地 OpenAI 相容 LLM 替身伺服器")
+    parser.add_argument("--host", default="127.0.0.1", help="綁定位址")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STANDIN_PORT", "8001")), help="埠號")
+    parser.add_argument("--latency", default=config["latency"], help="首個 token 前的延遲分布（格式見說明）")
+    parser.add_argument("--tail-rate", type=float, default=config["tail_rate"], help="長尾延遲比例")
+    parser.add_argument("--tail-latency", type=float, default=config["tail_latency"], help="長尾延遲（秒）")
+    parser.add_argument("--tokens-per-sec", type=float, default=config["tokens_per_sec"], help="串流速度（0 表示不限速）")
+    parser.add_argument("--chunk-chars", type=int, default=config["chunk_chars"], help="每個串流 token 的字數")
+    parser.add_argument("--rate-limit-rate", type=float, default=config["rate_limit_rate"], help="隨機回傳 429 的比例")
+    parser.add_argument("--rpm", type=int, default=config["rpm"], help="每分鐘請求上限，超過回傳 429（0 表示不限）")
+    parser.add_argument("--retry-after", type=float, default=config["retry_after"], help="429 的 Retry-After 秒數")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="回傳 500 的比例")
+    parser.add_argument("--timeout-rate", type=float, default=config["timeout_rate"], help="不回應（逾時）的比例")
+    parser.add_argument("--stall-rate", type=float, default=config["stall_rate"], help="串流中途停止的比例")
+    parser.add_argument("--hang-seconds", type=float, default=config["hang_seconds"], help="逾時與中途停止的最長等待秒數")
+    parser.add_argument("--response-file", help="回應內容檔案（預設為內建的運勢解析範例）")
+    args = parser.parse_args()
+
+    overrides = {
+        key: getattr(args, key) for key in (
+            "latency", "tail_rate", "tail_latency", "tokens_per_sec", "chunk_chars", "rate_limit_rate",
+            "rpm", "retry_after", "error_rate", "timeout_rate", "stall_rate", "hang_seconds"
+        )
+    }
+    if args.response_file:
+        with open(args.response_file, encoding="utf-8") as f:
+            overrides["response"] = f.read()
+
+    try:
+        server = StandInServer(overrides, args.host, args.port)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"✅ LLM 替身伺服器已啟動：OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n請求統計: {server.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+語料庫寫入佇列模組
+將 CSV / Google Sheets 的寫入移出請求路徑：記錄先排入有上限的記憶體佇列，
+由背景執行緒依筆數或時間批次寫入；佇列滿時依策略等待或捨棄，行程結束前會清空佇列。
+佇列深度、寫入延遲與捨棄筆數可由 get_stats() 與 metrics.py 觀察。
+"""
+
+import atexit
+from collections import deque
+from datetime import datetime
+import os
+import threading
+import time
+import uuid
+import weakref
+
+from metrics import registry
+
+# 佇列滿時的策略：block（最多等待 block_timeout 秒，逾時捨棄新記錄）、drop_new（直接捨棄新記錄）、drop_oldest（捨棄最舊的記錄）
+POLICIES = ("block", "drop_new", "drop_oldest")
+
+FLUSH_SECONDS = registry.histogram(
+    "easyai_log_flush_duration_seconds",
+    "Duration of one batched corpus write in seconds.",
+    ("sink", "outcome")
+)
+
+
+def load_config() -> dict:
+    """
+    從環境變數讀取佇列設定
+
+    Returns:
+        dict: 佇列上限、批次大小、批次間隔、滿載策略與重試設定
+    """
+    return {
+        "maxsize": int(os.environ.get("LOG_QUEUE_MAXSIZE", "1000")),
+        "batch_size": int(os.environ.get("LOG_QUEUE_BATCH_SIZE", "50")),
+        "flush_interval": float(os.environ.get("LOG_QUEUE_FLUSH_INTERVAL", "1")),
+        "policy": os.environ.get("LOG_QUEUE_POLICY", "block"),
+        "block_timeout": float(os.environ.get("LOG_QUEUE_BLOCK_TIMEOUT", "0.05")),
+        "workers": int(os.environ.get("LOG_QUEUE_WORKERS", "1")),
+        "max_retries": int(os.environ.get("LOG_QUEUE_MAX_RETRIES", "3")),
+        "retry_delay": float(os.environ.get("LOG_QUEUE_RETRY_DELAY", "1"))
+    }
+
+
+# 所有佇列（供指標收集與行程結束時清空）
+_queues = weakref.WeakSet()
+
+
+class WriteBehindLogger:
+    """
+    背景批次寫入器
+
+    sink 為接收記錄列表、回傳是否成功的函數（如 FortuneLogger.log_fortunes）。
+    多個 worker 時批次之間不保證順序。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sink,
+        maxsize: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        policy: str = "block",
+        block_timeout: float = 0.05,
+        workers: int = 1,
+        max_retries: int = 3,
+        retry_delay: float = 1.0
+    ):
+        """
+        建立寫入器並啟動 worker
+
+        Args:
+            name: 名稱（用於指標標籤與訊息，如 csv、sheets）
+            sink: 批次寫入函數 (list) -> bool
+            maxsize: 佇列上限（筆）
+            batch_size: 累積到此筆數即寫入
+            flush_interval: 最舊記錄等待超過此秒數即寫入
+            policy: 佇列滿時的策略（見 POLICIES）
+            block_timeout: block 策略的最長等待秒數
+            workers: worker 執行緒數
+            max_retries: 寫入失敗的重試次數（之後捨棄該批）
+            retry_delay: 重試間隔秒數（每次加倍）
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy 必須是 {' / '.join(POLICIES)}：{policy}")
+        self.name = name
+        self.sink = sink
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._items = deque()  # (排入時間 monotonic, 記錄)
+        self._cond = threading.Condition()
+        self._writing = 0
+        self._flushing = 0
+        self._closing = False
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "retries": 0}
+        self._last_flush_ms = None
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"log-queue-{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+        _queues.add(self)
+
+    @classmethod
+    def from_env(cls, name: str, sink) -> "WriteBehindLogger":
+        """依環境變數建立寫入器"""
+        return cls(name, sink, **load_config())
+
+    def submit(self, fortune_data: dict) -> bool:
+        """
+        排入一筆記錄（記錄時間以排入時為準；另附 record_id，sink 重試時可用來避免重複寫入）
+
+        Args:
+            fortune_data: get_fortune() 的結果字典
+
+        Returns:
+            bool: 是否已排入（佇列滿而捨棄時為 False）
+        """
+        record = {**fortune_data, "logged_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "record_id": uuid.uuid4().hex}
+        with self._cond:
+            if self._closing:
+                self._stats["dropped"] += 1
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    self._items.popleft()
+                    self._stats["dropped"] += 1
+                elif self.policy == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._items) >= self.maxsize and not self._closing:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                if len(self._items) >= self.maxsize or self._closing:
+                    self._stats["dropped"] += 1
+                    return False
+            self._items.append((time.monotonic(), record))
+            self._stats["enqueued"] += 1
+            self._cond.notify_all()
+            return True
+
+    def _take_batch(self):
+        """等待直到可寫入一批（筆數足夠、最舊記錄逾時或正在關閉）；佇列已空且關閉時回傳 None"""
+        with self._cond:
+            while True:
+                if self._items:
+                    age = time.monotonic() - self._items[0][0]
+                    if (len(self._items) >= self.batch_size or age >= self.flush_interval
+                            or self._closing or self._flushing):
+                        count = min(self.batch_size, len(self._items))
+                        batch = [self._items.popleft()[1] for _ in range(count)]
+                        self._writing += 1
+                        self._cond.notify_all()  # 喚醒等待空間的 submit
+                        return batch
+                    self._cond.wait(self.flush_interval - age)
+                elif self._closing:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._writing -= 1
+                    self._cond.notify_all()
+
+    def _write(self, batch: list):
+        """寫入一批，失敗時以加倍間隔重試"""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                ok = self.sink(batch)
+            except Exception as e:
+                print(f"❌ 寫入佇列 {self.name} 寫入失敗：{str(e)}")
+                ok = False
+            elapsed = time.perf_counter() - started
+            FLUSH_SECONDS.observe(elapsed, sink=self.name, outcome="ok" if ok else "error")
+            with self._cond:
+                self._last_flush_ms = round(elapsed * 1000, 1)
+                if ok:
+                    self._stats["written"] += len(batch)
+                    self._stats["batches"] += 1
+                    return
+                if attempt == self.max_retries:
+                    self._stats["failed"] += len(batch)
+                    print(f"❌ 寫入佇列 {self.name} 捨棄 {len(batch)} 筆（重試 {self.max_retries} 次仍失敗）")
+                    return
+                self._stats["retries"] += 1
+                closing = self._closing
+            # 關閉時不再等待重試間隔，盡快結束
+            time.sleep(0 if closing else self.retry_delay * (2 ** attempt))
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待目前排入的記錄全部寫入（或捨棄）
+
+        Args:
+            timeout: 最長等待秒數（None 表示不限）
+
+        Returns:
+            bool: 是否已清空
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # flush 期間 worker 不等批次間隔，立即寫出
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._items or self._writing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        停止接收新記錄，寫完佇列中的記錄後結束 worker
+
+        Args:
+            timeout: 最長等待秒數
+
+        Returns:
+            bool: 是否在時限內寫完
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def get_stats(self) -> dict:
+        """
+        獲取佇列統計
+
+        Returns:
+            dict: 佇列深度、上限、寫入中批次數、累計排入 / 寫入 / 捨棄 / 失敗筆數、批次數、重試次數與最近一次寫入耗時
+        """
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "writing": self._writing,
+                **self._stats,
+                "last_flush_ms": self._last_flush_ms
+            }
+
+
+def close_all(timeout: float = 10.0):
+    """清空並關閉所有寫入佇列（行程結束時自動呼叫）"""
+    for queue in list(_queues):
+        if not queue.close(timeout):
+            print(f"❌ 寫入佇列 {queue.name} 未在 {timeout:g} 秒內寫完，剩餘 {queue.get_stats()['depth']} 筆")
+
+
+atexit.register(close_all)
+
+
+def _collect_metrics() -> list:
+    """輸出指標時讀取各佇列統計（見 metrics.py）"""
+    stats = {queue.name: queue.get_stats() for queue in list(_queues)}
+    families = [
+        ("easyai_log_queue_depth", "gauge", "Records waiting in the write-behind queue.",
+         [({"sink": name}, s["depth"]) for name, s in stats.items()]),
+        ("easyai_log_queue_capacity", "gauge", "Write-behind queue capacity.",
+         [({"sink": name}, s["maxsize"]) for name, s in stats.items()])
+    ]
+    for key, documentation in (
+        ("enqueued", "Records accepted by the write-behind queue."),
+        ("written", "Records written by the write-behind queue."),
+        ("dropped", "Records dropped because the queue was full or closing."),
+        ("failed", "Records discarded after the sink kept failing.")
+    ):
+        families.append((
+            f"easyai_log_queue_{key}_total", "counter", documentation,
+            [({"sink": name}, s[key]) for name, s in stats.items()]
+        ))
+    return families
+
+
+registry.register_collector("log_queue", _collect_metrics)
@@ -3,40 +3,392 @@
 負責將用戶輸入與 AI 輸出存入 CSV，累積訓練語料庫
 """
 
-import pandas as pd
+from contextlib import contextmanager
+import csv
+import io
 import os
 from datetime import datetime
-from pathlib import Path
+import json
+import time
+
+from metrics import track_stage
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# 語料庫欄位
+CSV_COLUMNS = [
+    "Timestamp",
+    "Birth_DateTime",
+    "Lunar_Date",
+    "Bazi_Chart",
+    "Day_Master",
+    "Day_Master_Element",
+    "AI_Output",
+    "LLM_Model",
+    "LLM_Latency_ms",
+    "LLM_TTFT_ms",
+    "Prompt_Tokens",
+    "Completion_Tokens",
+    "Finish_Reason",
+    "Flow_Date"
+]
+
+# fsync 策略：always（每筆寫入後）、interval（距上次 fsync 超過 CORPUS_FSYNC_INTERVAL 秒時）、never（交由作業系統）
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+@contextmanager
+def _locked(f):
+    """對已開啟的檔案加上跨行程的獨佔鎖（POSIX 用 flock，Windows 用 msvcrt）"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _BoundedReader(io.RawIOBase):
+    """只讀到指定位元組數的檔案包裝（匯出時忽略開始之後才附加的資料）"""
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _csv_rows(f, limit: int, columns: list, buffer_size: int = 1 << 20):
+    """
+    從二進位檔案 f 目前的位置逐列讀取 limit 位元組的 CSV
+
+    Yields:
+        dict: 一列記錄（欄位依 columns）
+    """
+    raw = io.BufferedReader(_BoundedReader(f, limit), buffer_size)
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    for row in csv.reader(text):
+        if row:
+            yield dict(zip(columns, row))
+
+
+def _format_text_entry(bazi_chart, day_master, element, birth, lunar, output) -> str:
+    """純文字語料的一筆記錄"""
+    return (
+        f"=== 八字: {bazi_chart} ===\n"
+        f"日主: {day_master} ({element}行)\n"
+        f"出生: {birth}\n"
+        f"農曆: {lunar}\n"
+        f"\n【運勢解析】\n{output}\n"
+        "\n" + "=" * 50 + "\n\n"
+    )
+
+
+def _chat_prefix(system_prompt: str) -> str:
+    """JSONL 每行共用的開頭（system 訊息只編碼一次）"""
+    return '{"messages": [' + json.dumps({"role": "system", "content": system_prompt}, ensure_ascii=False) + ", "
+
+
+def _format_chat_entry(record: dict, prefix: str, rebuild_user_prompt) -> str:
+    """
+    JSONL 對話格式的一筆記錄（system / user / assistant）
+
+    Args:
+        record: 語料庫的一列（欄位同 CSV_COLUMNS）
+        prefix: _chat_prefix() 的結果
+        rebuild_user_prompt: bazi_engine.rebuild_user_prompt
+
+    Returns:
+        str: 一行 JSON（含換行；與 json.dumps 整筆輸出相同）
+
+    Raises:
+        ValueError: 欄位格式不符，無法重建 user prompt
+    """
+    user_prompt = rebuild_user_prompt(
+        record.get("Bazi_Chart") or "",
+        record.get("Day_Master") or "",
+        record.get("Day_Master_Element") or "",
+        record.get("Birth_DateTime") or "",
+        record.get("Lunar_Date") or "",
+        record.get("Timestamp") or "",
+        record.get("Flow_Date") or ""
+    )
+    return (
+        prefix
+        + json.dumps({"role": "user", "content": user_prompt}, ensure_ascii=False) + ", "
+        + json.dumps({"role": "assistant", "content": record["AI_Output"]}, ensure_ascii=False) + "]}\n"
+    )
 
 
 class FortuneLogger:
-    """運勢數據記錄器"""
+    """
+    運勢數據記錄器
+
+    每筆記錄以附加模式只寫入新的一列（與語料庫大小無關），
+    寫入時持有檔案鎖，多個 Streamlit session 或行程同時寫入也不會遺失資料。
+    筆數與最新時間另存於 <csv_path>.meta.json，get_stats 不需讀取整個語料庫。
+    匯出時逐列串流讀寫，記憶體用量與語料庫大小無關。
+    """
     
-    def __init__(self, csv_path: str = "corpus_data.csv"):
+    def __init__(self, csv_path: str = "corpus_data.csv", fsync_policy: str = None):
         """
         初始化記錄器
         
         Args:
             csv_path: CSV 檔案路徑（預設為 corpus_data.csv）
+            fsync_policy: always / interval / never（預設讀取 CORPUS_FSYNC，未設定為 interval）
         """
         self.csv_path = csv_path
+        self.fsync_policy = fsync_policy or os.environ.get("CORPUS_FSYNC", "interval")
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy 必須是 {' / '.join(FSYNC_POLICIES)}：{self.fsync_policy}")
+        self.fsync_interval = float(os.environ.get("CORPUS_FSYNC_INTERVAL", "1"))
+        self._last_fsync = 0.0
+        self.columns = list(CSV_COLUMNS)
+        self.meta_path = f"{csv_path}.meta.json"
+        self._meta = None  # 最近一次讀寫的統計紀錄
         self._ensure_csv_exists()
     
     def _ensure_csv_exists(self):
-        """確保 CSV 檔案存在，若不存在則建立"""
-        if not os.path.exists(self.csv_path):
-            # 建立空白 DataFrame 並寫入檔案
-            df = pd.DataFrame(columns=[
-                "Timestamp",
-                "Birth_DateTime",
-                "Lunar_Date",
-                "Bazi_Chart",
-                "Day_Master",
-                "Day_Master_Element",
-                "AI_Output"
-            ])
-            df.to_csv(self.csv_path, index=False, encoding='utf-8-sig')
+        """確保 CSV 檔案存在，若不存在則建立；舊版標題列缺少新欄位時補上"""
+        try:
+            # 以 x 模式建立，多個行程同時啟動時只有一個會寫入標題列
+            with open(self.csv_path, 'x', newline='', encoding='utf-8-sig') as f:
+                csv.writer(f, lineterminator='\n').writerow(CSV_COLUMNS)
             print(f"✅ 已建立新的語料庫檔案: {self.csv_path}")
+            return
+        except FileExistsError:
+            pass
+
+        header = self._read_header()
+        if header and header != CSV_COLUMNS and CSV_COLUMNS[:len(header)] == header:
+            self._migrate_header()
+        elif header:
+            # 依既有標題列的欄位順序寫入（未知欄位留空）
+            self.columns = header
+
+    def _read_header(self) -> list:
+        with open(self.csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            return next(csv.reader(f), [])
+
+    def _migrate_header(self):
+        """一次性將舊版語料庫改寫為新標題列（舊資料的新欄位留空）"""
+        with open(self.csv_path, 'rb') as lock_file, _locked(lock_file):
+            header = self._read_header()
+            if header == CSV_COLUMNS:
+                return  # 其他行程已完成遷移
+            tmp_path = f"{self.csv_path}.tmp"
+            with open(self.csv_path, 'r', newline='', encoding='utf-8-sig') as src, \
+                    open(tmp_path, 'w', newline='', encoding='utf-8-sig') as dst:
+                reader = csv.reader(src)
+                writer = csv.writer(dst, lineterminator='\n')
+                next(reader, None)
+                writer.writerow(CSV_COLUMNS)
+                padding = [""] * (len(CSV_COLUMNS) - len(header))
+                for row in reader:
+                    writer.writerow(row + padding)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, self.csv_path)
+        print(f"✅ 已更新語料庫標題列: {self.csv_path}")
+
+    def _encode_row(self, record: dict) -> bytes:
+        """將一筆記錄編碼為 CSV 列（None 寫為空字串）"""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(
+            "" if record.get(column) is None else record[column] for column in self.columns
+        )
+        return buffer.getvalue().encode('utf-8')
+
+    def _append(self, data: bytes, timestamp: str, count: int = 1, earliest: str = None):
+        """
+        持有檔案鎖並以單次 write 附加 count 筆資料，同時更新統計紀錄
+
+        取得鎖後確認檔案未被替換（如標題列遷移）；被替換時改開新檔重試。
+
+        Args:
+            data: 已編碼的 CSV 列
+            timestamp: 這批記錄中最新的時間
+            count: 筆數
+            earliest: 這批記錄中最早的時間（分段記錄器記錄時間範圍用；此處不需要）
+        """
+        while True:
+            with open(self.csv_path, 'ab') as f, _locked(f):
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != os.stat(self.csv_path).st_ino:
+                    continue
+                start = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                if self.fsync_policy == "always" or (
+                    self.fsync_policy == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval
+                ):
+                    os.fsync(f.fileno())
+                    self._last_fsync = time.monotonic()
+
+                # 統計紀錄恰好涵蓋到寫入前的位置時才遞增；否則留待 get_stats 補算
+                meta = self._current_meta(inode, start)
+                if meta is not None:
+                    self._save_meta({
+                        "inode": inode,
+                        "size": start + len(data),
+                        "total_records": meta["total_records"] + count,
+                        "latest_timestamp": timestamp
+                    })
+                return
+
+    # --- 統計紀錄（sidecar） ---
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if not all(key in meta for key in ("inode", "size", "total_records", "latest_timestamp")):
+                return None
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta: dict):
+        """原子替換統計紀錄（可由語料庫重算，不需 fsync）"""
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+        self._meta = meta
+
+    def _current_meta(self, inode: int, size: int):
+        """
+        取得恰好涵蓋語料庫前 size 位元組的統計紀錄
+
+        Returns:
+            dict | None: 統計紀錄；不存在或與檔案不符時為 None
+        """
+        def matches(meta) -> bool:
+            return meta is not None and meta["inode"] == inode and meta["size"] == size
+
+        meta = self._meta
+        if not matches(meta):
+            meta = self._load_meta()
+            if not matches(meta):
+                return None
+        self._meta = meta
+        return meta
+
+    def _rebuild_meta(self) -> dict:
+        """
+        持有檔案鎖，從統計紀錄涵蓋的位置往後補算（紀錄不符時從頭計算）
+
+        寫入後、更新紀錄前當機時，只需讀取尚未計入的尾端資料。
+        """
+        with open(self.csv_path, 'rb') as f, _locked(f):
+            inode = os.fstat(f.fileno()).st_ino
+            size = f.seek(0, os.SEEK_END)
+            meta = self._current_meta(inode, size)
+            if meta is not None:
+                return meta  # 等待鎖期間已由其他寫入者更新
+
+            meta = self._load_meta()
+            if meta is not None and meta["inode"] == inode and meta["size"] < size:
+                offset = meta["size"]
+                total_records = meta["total_records"]
+                latest_timestamp = meta["latest_timestamp"]
+            else:
+                f.seek(0)
+                offset = len(f.readline())  # 標題列之後
+                total_records = 0
+                latest_timestamp = None
+
+            f.seek(offset)
+            text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+            ts_index = self.columns.index("Timestamp") if "Timestamp" in self.columns else 0
+            for row in csv.reader(text):
+                if not row:
+                    continue
+                total_records += 1
+                latest_timestamp = row[ts_index] if ts_index < len(row) else None
+            text.detach()
+
+            meta = {
+                "inode": inode,
+                "size": size,
+                "total_records": total_records,
+                "latest_timestamp": latest_timestamp
+            }
+            self._save_meta(meta)
+            return meta
+    
+    # --- 串流讀取 ---
+    def _snapshot(self) -> tuple:
+        """
+        持有檔案鎖取得目前的檔案範圍（確保結尾落在完整的一列之後）
+
+        Returns:
+            tuple: (inode, 標題列之後的位置, 檔案大小)
+        """
+        with open(self.csv_path, 'rb') as f:
+            with _locked(f):
+                st = os.fstat(f.fileno())
+            f.seek(0)
+            return st.st_ino, len(f.readline()), st.st_size
+
+    def _iter_rows(self, buffer_size: int = 1 << 20):
+        """
+        逐列讀取語料庫（只讀到開始時的檔案結尾；記憶體用量固定）
+
+        Yields:
+            dict: 一列記錄（欄位依標題列）
+        """
+        _, start, end = self._snapshot()
+        with open(self.csv_path, 'rb') as f:
+            f.seek(start)
+            yield from _csv_rows(f, end - start, self.columns, buffer_size)
+
+    @staticmethod
+    def _build_record(fortune_data: dict) -> dict:
+        """
+        將 get_fortune() 結果轉為語料庫欄位
+
+        記錄時間取 fortune_data["logged_at"]（寫入佇列排入時設定），未設定時為現在
+        """
+        return {
+            "Timestamp": fortune_data.get("logged_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "Birth_DateTime": fortune_data.get("birth_datetime", ""),
+            "Lunar_Date": fortune_data.get("lunar_date", ""),
+            "Bazi_Chart": fortune_data.get("bazi_full", ""),
+            "Day_Master": fortune_data.get("day_master", ""),
+            "Day_Master_Element": fortune_data.get("day_master_element", ""),
+            "AI_Output": fortune_data.get("ai_fortune", ""),
+            "LLM_Model": fortune_data.get("llm_model"),
+            "LLM_Latency_ms": fortune_data.get("llm_latency_ms"),
+            "LLM_TTFT_ms": fortune_data.get("llm_ttft_ms"),
+            "Prompt_Tokens": fortune_data.get("llm_prompt_tokens"),
+            "Completion_Tokens": fortune_data.get("llm_completion_tokens"),
+            "Finish_Reason": fortune_data.get("llm_finish_reason"),
+            "Flow_Date": fortune_data.get("ai_flow_date")
+        }
     
     def log_fortune(self, fortune_data: dict) -> bool:
         """
@@ -55,26 +407,40 @@ class FortuneLogger:
                 return False
             
             # 準備記錄資料
-            record = {
-                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "Birth_DateTime": fortune_data.get("birth_datetime", ""),
-                "Lunar_Date": fortune_data.get("lunar_date", ""),
-                "Bazi_Chart": fortune_data.get("bazi_full", ""),
-                "Day_Master": fortune_data.get("day_master", ""),
-                "Day_Master_Element": fortune_data.get("day_master_element", ""),
-                "AI_Output": fortune_data.get("ai_fortune", "")
-            }
+            record = self._build_record(fortune_data)
+            
+            # 只附加新的一列
+            with track_stage("csv_write"):
+                self._append(self._encode_row(record), record["Timestamp"])
             
-            # 讀取現有數據
-            df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
+            print(f"✅ 已記錄數據到 {self.csv_path}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ 記錄失敗：{str(e)}")
+            return False
+    
+    def log_fortunes(self, fortune_data_list: list) -> bool:
+        """
+        批次記錄多筆運勢數據（一次加鎖、一次寫入；供 log_queue 使用）
+        
+        Args:
+            fortune_data_list: get_fortune() 結果字典的列表（生成失敗的會略過）
             
-            # 新增記錄
-            df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+        Returns:
+            bool: 是否成功記錄
+        """
+        try:
+            records = [self._build_record(d) for d in fortune_data_list if d.get("success", False)]
+            if not records:
+                return True
             
-            # 寫回檔案
-            df.to_csv(self.csv_path, index=False, encoding='utf-8-sig')
+            with track_stage("csv_write"):
+                data = b"".join(self._encode_row(record) for record in records)
+                timestamps = [record["Timestamp"] for record in records]
+                self._append(data, max(timestamps), len(records), min(timestamps))
             
-            print(f"✅ 已記錄數據到 {self.csv_path} (共 {len(df)} 筆)")
+            print(f"✅ 已記錄 {len(records)} 筆數據到 {self.csv_path}")
             return True
             
         except Exception as e:
@@ -96,13 +462,17 @@ class FortuneLogger:
                     "file_size_kb": 0
                 }
             
-            df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
-            file_size = os.path.getsize(self.csv_path) / 1024  # KB
+            # 統計紀錄與檔案大小相符時直接使用；否則補算尾端（或從頭重算）
+            with track_stage("csv_stats"):
+                st = os.stat(self.csv_path)
+                meta = self._current_meta(st.st_ino, st.st_size)
+                if meta is None:
+                    meta = self._rebuild_meta()
             
             return {
-                "total_records": len(df),
-                "latest_timestamp": df["Timestamp"].iloc[-1] if len(df) > 0 else None,
-                "file_size_kb": round(file_size, 2)
+                "total_records": meta["total_records"],
+                "latest_timestamp": meta["latest_timestamp"],
+                "file_size_kb": round(meta["size"] / 1024, 2)
             }
             
         except Exception as e:
@@ -115,7 +485,7 @@ class FortuneLogger:
     
     def export_to_text(self, output_path: str = "corpus_text.txt") -> bool:
         """
-        將語料庫匯出為純文字格式（方便訓練）
+        將語料庫匯出為純文字格式（方便訓練；逐列串流讀寫）
         
         Args:
             output_path: 輸出文字檔路徑
@@ -124,18 +494,77 @@ class FortuneLogger:
             bool: 是否成功匯出
         """
         try:
-            df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                for _, row in df.iterrows():
-                    f.write(f"=== 八字: {row['Bazi_Chart']} ===\n")
-                    f.write(f"日主: {row['Day_Master']} ({row['Day_Master_Element']}行)\n")
-                    f.write(f"出生: {row['Birth_DateTime']}\n")
-                    f.write(f"農曆: {row['Lunar_Date']}\n")
-                    f.write(f"\n【運勢解析】\n{row['AI_Output']}\n")
-                    f.write("\n" + "="*50 + "\n\n")
-            
-            print(f"✅ 已匯出純文字語料到 {output_path}")
+            count = 0
+            with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                for row in self._iter_rows():
+                    f.write(_format_text_entry(
+                        row.get('Bazi_Chart', ''), row.get('Day_Master', ''), row.get('Day_Master_Element', ''),
+                        row.get('Birth_DateTime', ''), row.get('Lunar_Date', ''), row.get('AI_Output', '')
+                    ))
+                    count += 1
+            
+            print(f"✅ 已匯出 {count} 筆純文字語料到 {output_path}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+    
+    def export_to_jsonl(self, output_path: str = "corpus_chat.jsonl", live_only: bool = True) -> bool:
+        """
+        將語料庫匯出為 JSONL 對話格式（每行一組 system / user / assistant 訊息，可直接用於微調）
+        
+        user 訊息依 Bazi_Chart 等欄位與記錄日期的流日重建（與當時送出的 prompt 相同格式）。
+        
+        Args:
+            output_path: 輸出 JSONL 檔路徑
+            live_only: 只匯出實際呼叫 LLM 的記錄（預設；快取、每日預生成與規則版解析的輸出
+                並非回應重建的 prompt，設為 False 才會一併匯出）
+            
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            from bazi_engine import SYSTEM_PROMPT, rebuild_user_prompt
+            
+            prefix = _chat_prefix(SYSTEM_PROMPT)
+            count = skipped = 0
+            with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+                for row in self._iter_rows():
+                    if not row.get('AI_Output') or (live_only and not row.get('LLM_Model')):
+                        skipped += 1
+                        continue
+                    try:
+                        f.write(_format_chat_entry(row, prefix, rebuild_user_prompt))
+                        count += 1
+                    except ValueError:
+                        skipped += 1
+            
+            print(f"✅ 已匯出 {count} 筆對話語料到 {output_path}" + (f"（略過 {skipped} 筆）" if skipped else ""))
+            return True
+            
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+    
+    def export_to_parquet(self, output_dir: str = "corpus_parquet", full: bool = False) -> bool:
+        """
+        將語料庫匯出為依日期與日主五行分區的 Parquet 資料集（方便分析；見 parquet_export.py）
+        
+        再次呼叫時只附加上次匯出之後的新記錄。
+        
+        Args:
+            output_dir: 輸出目錄
+            full: 是否刪除先前的匯出結果後完整重新匯出
+            
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            from parquet_export import export_to_parquet
+            
+            result = export_to_parquet(self, output_dir, full=full)
+            print(f"✅ 已匯出 {result['rows']} 筆數據到 {output_dir}（{result['files']} 個檔案）")
             return True
             
         except Exception as e:
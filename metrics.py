@@ -0,0 +1,360 @@
+"""
+效能指標模組
+各階段（排盤、prompt 組裝、LLM 呼叫、CSV / Google Sheets 寫入與統計讀取）的計數與延遲直方圖，
+以 Prometheus 文字格式輸出：可由小型 HTTP 端點（/metrics）提供，或定期寫入檔案
+（供 node_exporter textfile collector 收集）。僅使用標準函式庫。
+
+環境變數：
+    METRICS_PORT            HTTP 端點埠號（未設定則不啟動）
+    METRICS_HOST            HTTP 端點綁定位址（預設 0.0.0.0）
+    METRICS_FILE            指標檔路徑（未設定則不寫檔）
+    METRICS_FILE_INTERVAL   寫檔間隔秒數（預設 15）
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import math
+import os
+import threading
+import time
+
+
+# 預設延遲分桶（秒）：涵蓋微秒級的查表到數十秒的 LLM 呼叫
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Counter:
+    """只增不減的計數器（可帶標籤）"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        建立計數器
+
+        Args:
+            name: 指標名稱（慣例以 _total 結尾）
+            documentation: 說明文字
+            labelnames: 標籤名稱
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1.0, **labels):
+        """增加計數"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """目前計數"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list:
+        """
+        Returns:
+            list: (指標名稱, 標籤字典, 值)
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Histogram:
+    """延遲直方圖（累積分桶，可帶標籤）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        """
+        建立直方圖
+
+        Args:
+            name: 指標名稱
+            documentation: 說明文字
+            labelnames: 標籤名稱
+            buckets: 分桶上界（遞增）
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 標籤 -> [各分桶計數..., 總數, 總和]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """記錄一個觀測值"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """以 with 區塊計時並記錄"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list:
+        """
+        Returns:
+            list: (指標名稱, 標籤字典, 值)，含 _bucket、_count、_sum
+        """
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        result = []
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                result.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            result.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, series[-2]))
+            result.append((f"{self.name}_count", labels, series[-2]))
+            result.append((f"{self.name}_sum", labels, series[-1]))
+        return result
+
+
+class MetricsRegistry:
+    """指標登錄表：保存指標與收集函數，並輸出 Prometheus 文字格式"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 模組重新載入（如 Streamlit 開發模式）時沿用既有指標
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """建立（或取得既有的）計數器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """建立（或取得既有的）直方圖"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, collect):
+        """
+        註冊輸出時才讀取的指標（如既有快取的命中統計）
+
+        Args:
+            name: 收集函數名稱（同名重複註冊時取代舊的）
+            collect: 無參數函數，回傳 (指標名稱, 類型, 說明, [(標籤字典, 值), ...]) 的列表
+        """
+        with self._lock:
+            self._collectors = [(n, c) for n, c in self._collectors if n != name]
+            self._collectors.append((name, collect))
+
+    def render(self) -> str:
+        """
+        輸出 Prometheus 文字格式
+
+        Returns:
+            str: 全部指標
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector_name, collect in collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"❌ 指標收集失敗（{collector_name}）：{str(e)}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 行程內共用
+registry = MetricsRegistry()
+
+# 各階段耗時：chart（陽曆轉農曆排盤）、prompt_build、llm_call、csv_write、csv_stats、db_write、db_stats、db_query、segment_compress、sheets_write、sheets_stats
+STAGE_SECONDS = registry.histogram(
+    "easyai_stage_duration_seconds",
+    "Duration of each request stage in seconds.",
+    ("stage", "outcome")
+)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok"):
+    """
+    記錄一次階段耗時
+
+    Args:
+        stage: 階段名稱
+        seconds: 耗時（秒）
+        outcome: ok 或 error
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """以 with 區塊計時某階段；區塊拋出例外時記為 error"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe_stage(stage, time.perf_counter() - started, "error")
+        raise
+    observe_stage(stage, time.perf_counter() - started)
+
+
+# ============================================================
+# 輸出
+# ============================================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    於背景執行緒提供 /metrics 端點
+
+    Args:
+        port: 埠號（0 表示自動選擇）
+        host: 綁定位址
+
+    Returns:
+        ThreadingHTTPServer: 已啟動的伺服器
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_metrics_file(path: str):
+    """將目前指標原子寫入檔案（先寫暫存檔再替換，避免收集端讀到半份）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+def start_file_exporter(path: str, interval: float = 15.0) -> threading.Thread:
+    """
+    於背景執行緒定期寫入指標檔
+
+    Args:
+        path: 指標檔路徑（如 node_exporter textfile 目錄下的 easyai.prom）
+        interval: 寫檔間隔秒數
+
+    Returns:
+        threading.Thread: 背景執行緒
+    """
+    def loop():
+        while True:
+            try:
+                write_metrics_file(path)
+            except OSError as e:
+                print(f"❌ 指標寫檔失敗：{str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_from_env() -> bool:
+    """
+    依環境變數啟動 HTTP 端點與檔案輸出（重複呼叫只會啟動一次，可在 Streamlit 每次 rerun 時呼叫）
+
+    Returns:
+        bool: 是否有啟動任何輸出
+    """
+    global _started
+    port = os.environ.get("METRICS_PORT")
+    path = os.environ.get("METRICS_FILE")
+    if not port and not path:
+        return False
+
+    with _start_lock:
+        if _started:
+            return True
+        _started = True
+        if port:
+            try:
+                start_http_server(int(port), os.environ.get("METRICS_HOST", "0.0.0.0"))
+                print(f"✅ 指標端點已啟動: http://{os.environ.get('METRICS_HOST', '0.0.0.0')}:{port}/metrics")
+            except OSError as e:
+                print(f"❌ 指標端點啟動失敗：{str(e)}")
+        if path:
+            start_file_exporter(path, float(os.environ.get("METRICS_FILE_INTERVAL", "15")))
+            print(f"✅ 指標檔輸出: {path}")
+    return True
@@ -0,0 +1,281 @@
+"""
+Parquet 匯出模組
+將語料庫（CSV、分段 CSV 或 SQLite）匯出為依日期與日主五行分區的 Parquet 資料集（hive 目錄格式），
+類別欄位使用字典編碼；再次匯出時只讀取上次之後新增的記錄並寫入新的檔案。
+分析端可用 read_corpus() 或任何支援 hive 分區的工具只讀取需要的欄位與分區。
+
+需要 pyarrow（Streamlit 已相依）。
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+
+from logger import CSV_COLUMNS, _BoundedReader
+
+# 分區欄位（目錄：date=YYYY-MM-DD/Day_Master_Element=%E7%81%AB/，值依 hive 慣例做 URL 編碼）
+PARTITION_COLUMNS = ("date", "Day_Master_Element")
+PARTITIONING = ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor="hive")
+
+# 重複值多的類別欄位，以字典編碼儲存（讀回時為 dictionary 型別，pandas 中為 category）
+DICTIONARY_COLUMNS = ("Day_Master", "Bazi_Chart", "LLM_Model", "Finish_Reason")
+
+SCHEMA = pa.schema(
+    [("Timestamp", pa.timestamp("ms"))]
+    + [
+        (column, pa.dictionary(pa.int32(), pa.string()) if column in DICTIONARY_COLUMNS else pa.string())
+        for column in ("Birth_DateTime", "Lunar_Date", "Bazi_Chart", "Day_Master", "Day_Master_Element", "AI_Output", "LLM_Model")
+    ]
+    + [
+        ("LLM_Latency_ms", pa.float64()),
+        ("LLM_TTFT_ms", pa.float64()),
+        ("Prompt_Tokens", pa.int64()),
+        ("Completion_Tokens", pa.int64()),
+        ("Finish_Reason", pa.dictionary(pa.int32(), pa.string())),
+        ("Flow_Date", pa.string()),
+        ("date", pa.string())
+    ]
+)
+
+# 記錄上次匯出到哪裡（CSV 為位元組位置，分段為分段 id 與位元組位置，SQLite 為最後一筆 id）
+STATE_FILE = "_export_state.json"
+
+
+def _to_batch(table) -> pa.RecordBatch:
+    """
+    將全字串欄位的表格轉為匯出格式
+
+    Args:
+        table: 欄位同 CSV_COLUMNS、型別皆為字串（或數值）的 pyarrow Table / RecordBatch
+
+    Returns:
+        pa.RecordBatch: 符合 SCHEMA 的資料
+    """
+    arrays = []
+    for field in SCHEMA:
+        name = "Timestamp" if field.name == "date" else field.name
+        if name not in table.column_names:
+            # 舊版語料庫缺少的欄位
+            arrays.append(pa.nulls(table.num_rows, field.type))
+            continue
+        column = table.column(name)
+        if pa.types.is_string(column.type):
+            # 空字串視為缺值（CSV 無法區分兩者）
+            column = pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+        if field.name == "date":
+            arrays.append(pc.utf8_slice_codeunits(column, 0, 10))
+        elif field.name == "Timestamp":
+            arrays.append(pc.strptime(column, "%Y-%m-%d %H:%M:%S", "ms", error_is_null=True))
+        elif pa.types.is_integer(field.type):
+            arrays.append(column.cast(pa.float64()).cast(field.type))
+        else:
+            arrays.append(column.cast(field.type))
+    arrays = [a.combine_chunks() if isinstance(a, pa.ChunkedArray) else a for a in arrays]
+    return pa.RecordBatch.from_arrays(arrays, schema=SCHEMA)
+
+
+def _csv_batches(open_file, columns: list, start: int, end: int, block_size: int = 1 << 20):
+    """
+    逐區塊讀取 CSV 的 [start, end) 位元組範圍
+
+    Args:
+        open_file: 開啟二進位檔案的函式（壓縮的分段為解壓後的內容）
+    """
+    if end <= start:
+        return
+    with open_file() as f:
+        f.seek(start)
+        reader = pcsv.open_csv(
+            _BoundedReader(f, end - start),
+            # 小區塊：預讀的資料量固定，記憶體用量與語料庫大小無關
+            read_options=pcsv.ReadOptions(column_names=columns, block_size=block_size),
+            parse_options=pcsv.ParseOptions(newlines_in_values=True),
+            convert_options=pcsv.ConvertOptions(column_types={column: pa.string() for column in columns})
+        )
+        for batch in reader:
+            yield _to_batch(batch)
+
+
+def _sqlite_batches(db_path: str, after_id: int, last_id: int, batch_rows: int):
+    """逐批讀取 SQLite 中 id 在 (after_id, last_id] 的記錄"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(
+            f"SELECT {', '.join(CSV_COLUMNS)} FROM corpus WHERE id > ? AND id <= ? ORDER BY id",
+            (after_id, last_id)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                return
+            columns = list(zip(*rows))
+            yield _to_batch(pa.table({
+                column: pa.array(
+                    values,
+                    pa.float64() if column in ("LLM_Latency_ms", "LLM_TTFT_ms", "Prompt_Tokens", "Completion_Tokens") else pa.string()
+                )
+                for column, values in zip(CSV_COLUMNS, columns)
+            }))
+    finally:
+        conn.close()
+
+
+def _load_state(output_dir: str):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(output_dir: str, state: dict):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _segment_batches(logger, segments: list, state):
+    """依 manifest 逐一讀取分段；上次匯出到的分段從記錄的位置繼續"""
+    for entry in segments:
+        if state and entry["id"] < state["segment"]:
+            continue
+        start = state["offset"] if state and entry["id"] == state["segment"] else entry["header_size"]
+        yield from _csv_batches(lambda entry=entry: logger.open_segment(entry), entry.get("columns", logger.columns), start, entry["size"])
+
+
+def _segment_state(segments: list, state, source: str):
+    """上次匯出的位置仍在 manifest 中時回傳該狀態，否則為 None（從頭匯出）"""
+    if not state or state.get("source") != source:
+        return None
+    for entry in segments:
+        if entry["id"] == state.get("segment") and entry["header_size"] <= state.get("offset", -1) <= entry["size"]:
+            return state
+    return None
+
+
+def _clear_export(output_dir: str):
+    """
+    清除先前的匯出結果（只刪除 date=* 分區目錄與狀態檔，目錄中的其他檔案保留）
+
+    Raises:
+        ValueError: 目錄非空但不是先前的匯出結果（沒有狀態檔），不會刪除任何東西
+    """
+    if not os.path.isdir(output_dir):
+        return
+    entries = os.listdir(output_dir)
+    if STATE_FILE not in entries:
+        if entries:
+            raise ValueError(f"輸出目錄不是空的，也不是先前的匯出結果，請改用其他目錄：{output_dir}")
+        return
+    for name in entries:
+        path = os.path.join(output_dir, name)
+        if name.startswith(f"{PARTITION_COLUMNS[0]}=") and os.path.isdir(path):
+            shutil.rmtree(path)
+    os.remove(os.path.join(output_dir, STATE_FILE))
+
+
+def _csv_range(logger, state):
+    """決定 CSV 這次要匯出的位元組範圍；檔案被替換（如標題列遷移）時從頭匯出"""
+    inode, header_end, size = logger._snapshot()
+    if state and state.get("source") == os.path.abspath(logger.csv_path) and state.get("inode") == inode \
+            and header_end <= state.get("offset", -1) <= size:
+        return state["offset"], size, inode, False
+    return header_end, size, inode, True
+
+
+def export_to_parquet(logger, output_dir: str = "corpus_parquet", full: bool = False, batch_rows: int = 50000) -> dict:
+    """
+    將語料庫匯出（或增量附加）為分區 Parquet 資料集
+
+    Args:
+        logger: FortuneLogger、SegmentedFortuneLogger 或 SQLiteFortuneLogger
+        output_dir: 輸出目錄
+        full: 是否刪除先前的匯出結果後完整重新匯出（目錄非空且不是先前的匯出結果時引發 ValueError）
+        batch_rows: SQLite 每批讀取的筆數（CSV 每次讀取 1 MB）
+
+    Returns:
+        dict: 本次匯出的筆數、寫入檔案數與是否為完整匯出
+    """
+    state = None if full else _load_state(output_dir)
+
+    if hasattr(logger, "db_path"):
+        source = os.path.abspath(logger.db_path)
+        conn = sqlite3.connect(logger.db_path)
+        try:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM corpus").fetchone()[0]
+        finally:
+            conn.close()
+        after_id = state.get("last_id", 0) if state and state.get("source") == source else 0
+        rebuild = after_id == 0 or after_id > last_id
+        if rebuild:
+            after_id = 0
+        batches = _sqlite_batches(logger.db_path, after_id, last_id, batch_rows)
+        new_state = {"source": source, "last_id": last_id}
+    elif hasattr(logger, "segment_dir"):
+        source = os.path.abspath(logger.segment_dir)
+        segments = logger.list_segments()
+        state = _segment_state(segments, state, source)
+        rebuild = state is None
+        batches = _segment_batches(logger, segments, state)
+        new_state = {"source": source, "segment": segments[-1]["id"], "offset": segments[-1]["size"]}
+    else:
+        start, end, inode, rebuild = _csv_range(logger, state)
+        batches = _csv_batches(lambda: open(logger.csv_path, "rb"), logger.columns, start, end)
+        new_state = {"source": os.path.abspath(logger.csv_path), "inode": inode, "offset": end}
+
+    if full or rebuild:
+        _clear_export(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    written = []
+    rows = [0]
+
+    def counted(batches):
+        for batch in batches:
+            rows[0] += batch.num_rows
+            yield batch
+
+    parquet_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(SCHEMA, counted(batches)),
+        output_dir,
+        format=parquet_format,
+        file_options=parquet_format.make_write_options(compression="zstd", use_dictionary=list(DICTIONARY_COLUMNS)),
+        partitioning=PARTITIONING,
+        # 每次匯出使用不同的檔名，增量匯出只新增檔案、不改寫既有檔案
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda written_file: written.append(written_file.path)
+    )
+    _save_state(output_dir, new_state)
+    return {"rows": rows[0], "files": len(written), "full": full or rebuild}
+
+
+def read_corpus(output_dir: str = "corpus_parquet", columns: list = None, filter=None) -> pa.Table:
+    """
+    讀取匯出的資料集（只讀取指定欄位，並依分區條件略過不需要的目錄）
+
+    Args:
+        output_dir: export_to_parquet 的輸出目錄
+        columns: 要讀取的欄位（None 表示全部）
+        filter: pyarrow 篩選條件，如 (ds.field("Day_Master_Element") == "火") & (ds.field("date") >= "2026-01-01")
+
+    Returns:
+        pa.Table: 查詢結果（可再以 .to_pandas() 轉為 DataFrame）
+    """
+    dataset = ds.dataset(
+        output_dir,
+        format="parquet",
+        partitioning=PARTITIONING,
+        # 固定使用目前的欄位（舊版匯出的檔案缺少的欄位為 null）
+        schema=SCHEMA
+    )
+    return dataset.to_table(columns=columns, filter=filter)
@@ -0,0 +1,523 @@
+"""
+分段語料庫模組
+將語料庫拆成多個 CSV 分段（依大小或日期輪替），關閉的分段在背景以 gzip 壓縮，
+並以 manifest.json 記錄每個分段的筆數、時間範圍與大小；
+統計、匯出與下載都只讀取 manifest 與需要的分段，不必掃描整個語料庫
+"""
+
+from contextlib import contextmanager
+import csv
+from datetime import datetime
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+from logger import CSV_COLUMNS, FSYNC_POLICIES, FortuneLogger, _csv_rows, _locked
+from metrics import track_stage
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+# 只有筆數與大小改變時，manifest 最多每隔幾秒寫入一次（其間的新記錄由 _reconcile 從分段尾端補算）
+MANIFEST_SAVE_INTERVAL = 1.0
+
+# 分段狀態：active（寫入中）、closed（已輪替、等待壓縮）、compressed（已壓縮為 .csv.gz）
+SEGMENT_STATUSES = ("active", "closed", "compressed")
+
+
+@contextmanager
+def _dir_lock(lock_path: str):
+    """跨行程的目錄鎖（寫入、輪替與壓縮完成時持有）"""
+    with open(lock_path, "a+b") as f, _locked(f):
+        yield
+
+
+def _header_bytes() -> bytes:
+    """分段檔案的標題列（含 BOM，與 corpus_data.csv 相同，Excel 可直接開啟）"""
+    return ("\ufeff" + ",".join(CSV_COLUMNS) + "\n").encode("utf-8")
+
+
+class SegmentedFortuneLogger(FortuneLogger):
+    """
+    分段運勢數據記錄器
+
+    寫入時持有目錄鎖（manifest.lock），附加到目前的分段並更新 manifest；
+    目前的分段超過 max_bytes 或記錄日期跨日時關閉並開始新的分段，
+    關閉的分段由背景執行緒壓縮。manifest 中的筆數與檔案大小不符時（尚未寫入 manifest 或寫入後當機）只補算尾端。
+    """
+
+    def __init__(
+        self,
+        segment_dir: str = "corpus_segments",
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_daily: bool = True,
+        fsync_policy: str = None,
+        compress_level: int = 6
+    ):
+        """
+        初始化記錄器
+
+        Args:
+            segment_dir: 分段與 manifest 的目錄（預設為 corpus_segments）
+            max_bytes: 分段大小上限（0 表示不依大小輪替）
+            rotate_daily: 記錄日期跨日時是否輪替
+            fsync_policy: always / interval / never（預設讀取 CORPUS_FSYNC，未設定為 interval）
+            compress_level: gzip 壓縮等級（1-9）
+        """
+        self.segment_dir = segment_dir
+        self.csv_path = segment_dir  # 記錄訊息用
+        self.fsync_policy = fsync_policy or os.environ.get("CORPUS_FSYNC", "interval")
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy 必須是 {' / '.join(FSYNC_POLICIES)}：{self.fsync_policy}")
+        self.fsync_interval = float(os.environ.get("CORPUS_FSYNC_INTERVAL", "1"))
+        self._last_fsync = 0.0
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress_level = compress_level
+        self.columns = list(CSV_COLUMNS)
+        self.manifest_path = os.path.join(segment_dir, MANIFEST_FILE)
+        self.lock_path = os.path.join(segment_dir, LOCK_FILE)
+        self._manifest = None  # 最近一次讀寫的 manifest
+        self._manifest_stat = None
+        self._last_manifest_save = 0.0
+        self._compress_guard = threading.Lock()
+        self._compress_wanted = False
+        self._compressor = None
+        self._ensure_manifest_exists()
+        # 上次結束前尚未壓縮的分段
+        if any(entry["status"] == "closed" for entry in self._manifest["segments"]):
+            self._schedule_compression()
+
+    @classmethod
+    def from_env(cls) -> "SegmentedFortuneLogger":
+        """依環境變數建立記錄器"""
+        return cls(
+            os.environ.get("CORPUS_SEGMENT_DIR", "corpus_segments"),
+            max_bytes=int(float(os.environ.get("CORPUS_SEGMENT_MAX_MB", "64")) * 1024 * 1024),
+            rotate_daily=os.environ.get("CORPUS_SEGMENT_ROTATE_DAILY", "1").lower() not in ("0", "false", "no")
+        )
+
+    def _ensure_manifest_exists(self):
+        """確保目錄、manifest 與第一個分段存在；欄位增加時改用新的分段"""
+        os.makedirs(self.segment_dir, exist_ok=True)
+        with _dir_lock(self.lock_path):
+            manifest = self._load_manifest()
+            if manifest is not None:
+                if manifest["columns"] != CSV_COLUMNS:
+                    self._migrate_columns(manifest)
+                return
+            manifest = {"version": 1, "columns": CSV_COLUMNS, "next_id": 1, "segments": []}
+            self._open_segment_entry(manifest)
+            self._save_manifest(manifest, durable=True)
+        print(f"✅ 已建立新的分段語料庫: {self.segment_dir}")
+
+    def _migrate_columns(self, manifest: dict):
+        """
+        欄位增加後的一次性遷移（需持有目錄鎖）
+
+        既有分段記下自己的欄位（不改寫內容），目前的分段有資料時關閉並開始新的分段，
+        沒有資料時直接換成新的標題列。
+        """
+        entry = self._reconcile(manifest)
+        for current in manifest["segments"]:
+            current.setdefault("columns", manifest["columns"])
+        if entry["rows"]:
+            entry["status"] = "closed"
+            self._open_segment_entry(manifest)
+        else:
+            header = _header_bytes()
+            with open(self._segment_path(entry), "wb") as f:
+                f.write(header)
+            entry.update(columns=CSV_COLUMNS, header_size=len(header), size=len(header), stored_size=len(header))
+        manifest["columns"] = CSV_COLUMNS
+        self._save_manifest(manifest, durable=True)
+        print(f"✅ 已更新分段語料庫欄位: {self.segment_dir}")
+
+    # --- manifest ---
+    def _load_manifest(self):
+        """讀取 manifest（檔案未變時沿用上次讀取的結果）"""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if self._manifest is None or self._manifest_stat != key:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+            self._manifest_stat = key
+        return self._manifest
+
+    def _save_manifest(self, manifest: dict, durable: bool = False):
+        """
+        原子替換 manifest
+
+        Args:
+            manifest: 新的內容
+            durable: 是否 fsync（分段清單改變時；筆數與大小可由分段檔案補算，不需 fsync）
+        """
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(manifest, ensure_ascii=False))
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        st = os.stat(self.manifest_path)
+        self._manifest = manifest
+        self._manifest_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        self._last_manifest_save = time.monotonic()
+
+    def _segment_path(self, entry: dict) -> str:
+        return os.path.join(self.segment_dir, entry["file"])
+
+    def _open_segment_entry(self, manifest: dict) -> dict:
+        """建立新的分段檔案並加入 manifest（需持有目錄鎖）"""
+        segment_id = manifest["next_id"]
+        header = _header_bytes()
+        entry = {
+            "id": segment_id,
+            "file": f"segment-{segment_id:06d}.csv",
+            "status": "active",
+            "rows": 0,
+            "first_timestamp": None,
+            "last_timestamp": None,
+            "columns": CSV_COLUMNS,
+            "header_size": len(header),
+            "size": len(header),
+            "stored_size": len(header),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with open(self._segment_path(entry), "wb") as f:
+            f.write(header)
+        manifest["next_id"] = segment_id + 1
+        manifest["segments"].append(entry)
+        return entry
+
+    def _reconcile(self, manifest: dict) -> dict:
+        """
+        確認目前分段的大小與 manifest 相符；不符時補算尾端（需持有目錄鎖）
+
+        Returns:
+            dict: 目前的分段
+        """
+        entry = manifest["segments"][-1]
+        size = os.path.getsize(self._segment_path(entry))
+        if size == entry["size"]:
+            return entry
+
+        if size > entry["size"]:
+            offset = entry["size"]
+        else:
+            offset = entry["header_size"]
+            entry.update(rows=0, first_timestamp=None, last_timestamp=None)
+        with open(self._segment_path(entry), "rb") as f:
+            f.seek(offset)
+            for row in _csv_rows(f, size - offset, entry.get("columns", self.columns)):
+                timestamp = row.get("Timestamp") or None
+                entry["rows"] += 1
+                if timestamp:
+                    entry["first_timestamp"] = min(entry["first_timestamp"] or timestamp, timestamp)
+                    entry["last_timestamp"] = max(entry["last_timestamp"] or timestamp, timestamp)
+        entry["size"] = entry["stored_size"] = size
+        self._save_manifest(manifest)
+        return entry
+
+    def _needs_rotation(self, entry: dict, earliest: str) -> bool:
+        """
+        目前的分段是否應關閉
+
+        空分段不輪替；日期只在新記錄晚於分段中最新的日期時輪替，
+        稍晚送達（或其他行程寫入）的前一天記錄直接寫入目前的分段，不會來回輪替。
+        """
+        if entry["rows"] == 0:
+            return False
+        if self.max_bytes and entry["size"] >= self.max_bytes:
+            return True
+        return bool(self.rotate_daily and earliest and entry["last_timestamp"]
+                    and earliest[:10] > entry["last_timestamp"][:10])
+
+    def _append(self, data: bytes, timestamp: str, count: int = 1, earliest: str = None):
+        """
+        持有目錄鎖附加 count 筆資料到目前的分段（必要時先輪替），並更新 manifest
+
+        Args:
+            data: 已編碼的 CSV 列
+            timestamp: 這批記錄中最新的時間
+            count: 筆數
+            earliest: 這批記錄中最早的時間（未提供時同 timestamp）
+        """
+        earliest = earliest or timestamp
+        rotated = False
+        with _dir_lock(self.lock_path):
+            try:
+                manifest = self._load_manifest()
+                entry = self._reconcile(manifest)
+                if self._needs_rotation(entry, earliest):
+                    entry["status"] = "closed"
+                    entry = self._open_segment_entry(manifest)
+                    self._save_manifest(manifest, durable=True)
+                    rotated = True
+
+                with open(self._segment_path(entry), "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    if self.fsync_policy == "always" or (
+                        self.fsync_policy == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval
+                    ):
+                        os.fsync(f.fileno())
+                        self._last_fsync = time.monotonic()
+
+                entry["rows"] += count
+                entry["size"] += len(data)
+                entry["stored_size"] = entry["size"]
+                entry["first_timestamp"] = min(entry["first_timestamp"] or earliest, earliest)
+                entry["last_timestamp"] = max(entry["last_timestamp"] or timestamp, timestamp)
+                if time.monotonic() - self._last_manifest_save >= MANIFEST_SAVE_INTERVAL:
+                    self._save_manifest(manifest)
+            except Exception:
+                # 記憶體中的 manifest 可能已改了一半，下次重新讀取
+                self._manifest = None
+                raise
+
+        if rotated:
+            self._schedule_compression()
+
+    # --- 背景壓縮 ---
+    def _schedule_compression(self):
+        """喚醒（或啟動）壓縮執行緒"""
+        with self._compress_guard:
+            self._compress_wanted = True
+            if self._compressor is not None and self._compressor.is_alive():
+                return
+            # 非 daemon：行程結束前完成正在壓縮的分段，不留下半個檔案
+            self._compressor = threading.Thread(target=self._compress_worker, name="corpus-segment-compress")
+            self._compressor.start()
+
+    def _compress_worker(self):
+        while True:
+            with self._compress_guard:
+                if not self._compress_wanted:
+                    self._compressor = None
+                    return
+                self._compress_wanted = False
+            for entry in self.list_segments(status="closed"):
+                try:
+                    self._compress(entry)
+                except Exception as e:
+                    print(f"⚠️ 分段壓縮失敗（下次輪替時重試）：{entry['file']}：{str(e)}")
+
+    def _compress(self, entry: dict):
+        """
+        將關閉的分段壓縮為 .csv.gz，更新 manifest 後刪除原檔
+
+        多個行程同時壓縮同一分段時結果相同，只有第一個更新 manifest。
+        """
+        with track_stage("segment_compress"):
+            src = self._segment_path(entry)
+            dst = f"{src}.gz"
+            tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                fin = open(src, "rb")
+            except FileNotFoundError:
+                return  # 其他行程已完成壓縮
+            with fin, open(tmp_path, "wb") as raw:
+                with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=self.compress_level, mtime=0) as fout:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, dst)
+
+            with _dir_lock(self.lock_path):
+                manifest = self._load_manifest()
+                for current in manifest["segments"]:
+                    if current["id"] == entry["id"] and current["status"] == "closed":
+                        current.update(file=os.path.basename(dst), status="compressed", stored_size=os.path.getsize(dst))
+                        try:
+                            self._save_manifest(manifest, durable=True)
+                        except Exception:
+                            self._manifest = None
+                            raise
+            try:
+                os.remove(src)
+            except OSError:
+                pass  # 已由其他行程刪除，或仍有讀取者開啟（Windows）
+
+    def wait_for_compression(self, timeout: float = None):
+        """等待背景壓縮完成（測試與關閉前使用）"""
+        compressor = self._compressor
+        if compressor is not None:
+            compressor.join(timeout)
+
+    # --- 讀取 ---
+    def list_segments(self, status: str = None, start: str = None, end: str = None) -> list:
+        """
+        依 manifest 列出分段（不讀取分段內容）
+
+        Args:
+            status: 只列出指定狀態（active / closed / compressed）
+            start: 只列出最新記錄不早於此時間的分段（YYYY-MM-DD 或完整時間）
+            end: 只列出最早記錄不晚於此時間的分段（YYYY-MM-DD 表示包含當天）
+
+        Returns:
+            list: 分段資訊（id、file、status、rows、first_timestamp、last_timestamp、size、stored_size），依 id 排序
+        """
+        if status is not None and status not in SEGMENT_STATUSES:
+            raise ValueError(f"status 必須是 {' / '.join(SEGMENT_STATUSES)}：{status}")
+        with _dir_lock(self.lock_path):
+            manifest = self._load_manifest()
+            self._reconcile(manifest)
+            segments = [dict(entry) for entry in manifest["segments"]]
+        if start is not None or end is not None:
+            segments = [
+                entry for entry in segments
+                if entry["rows"]
+                and (start is None or entry["last_timestamp"] >= start)
+                and (end is None or entry["first_timestamp"][:len(end)] <= end)
+            ]
+        return [entry for entry in segments if status is None or entry["status"] == status]
+
+    def open_segment(self, entry: dict):
+        """
+        開啟分段的原始 CSV 內容（壓縮的分段以 gzip 解壓）
+
+        Args:
+            entry: list_segments() 的一項
+
+        Returns:
+            二進位檔案物件（從檔案開頭，含標題列；應只讀取前 entry["size"] 位元組）
+        """
+        path = self._segment_path(entry)
+        if entry["status"] != "compressed":
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                # 讀取 manifest 之後才完成壓縮
+                path = f"{path}.gz"
+        return gzip.open(path, "rb")
+
+    def read_segment(self, segment_id: int) -> tuple:
+        """
+        讀取單一分段的檔案內容（下載用；壓縮的分段直接回傳 .csv.gz）
+
+        Returns:
+            tuple: (檔名, 內容 bytes, MIME 類型)
+        """
+        for entry in self.list_segments():
+            if entry["id"] != segment_id:
+                continue
+            path = self._segment_path(entry)
+            if entry["status"] != "compressed":
+                try:
+                    with open(path, "rb") as f:
+                        return entry["file"], f.read(entry["size"]), "text/csv"
+                except FileNotFoundError:
+                    path = f"{path}.gz"
+            with open(path, "rb") as f:
+                return os.path.basename(path), f.read(), "application/gzip"
+        raise ValueError(f"找不到分段：{segment_id}")
+
+    def _iter_rows(self, buffer_size: int = 1 << 20):
+        """
+        依 manifest 逐一讀取各分段（只讀到開始時 manifest 記錄的大小；記憶體用量固定）
+
+        Yields:
+            dict: 一列記錄
+        """
+        for entry in self.list_segments():
+            if entry["rows"] == 0:
+                continue
+            with self.open_segment(entry) as f:
+                f.seek(entry["header_size"])
+                yield from _csv_rows(f, entry["size"] - entry["header_size"], entry.get("columns", self.columns), buffer_size)
+
+    def get_stats(self) -> dict:
+        """
+        獲取語料庫統計資訊（只讀取 manifest）
+
+        Returns:
+            dict: 包含總筆數、最新記錄時間、磁碟用量與分段數
+        """
+        try:
+            with track_stage("csv_stats"):
+                manifest = self._load_manifest()
+                active = manifest["segments"][-1]
+                if os.path.getsize(self._segment_path(active)) != active["size"]:
+                    with _dir_lock(self.lock_path):
+                        manifest = self._load_manifest()
+                        self._reconcile(manifest)
+                segments = manifest["segments"]
+                latest = [entry["last_timestamp"] for entry in segments if entry["last_timestamp"]]
+
+            return {
+                "total_records": sum(entry["rows"] for entry in segments),
+                "latest_timestamp": max(latest) if latest else None,
+                "file_size_kb": round(sum(entry["stored_size"] for entry in segments) / 1024, 2),
+                "segments": len(segments)
+            }
+
+        except Exception as e:
+            print(f"❌ 獲取統計失敗：{str(e)}")
+            return {
+                "total_records": 0,
+                "latest_timestamp": None,
+                "file_size_kb": 0,
+                "segments": 0
+            }
+
+    def import_csv(self, csv_path: str, batch_size: int = 10000) -> int:
+        """
+        匯入既有的 CSV 語料庫（逐批寫入，依原本的記錄日期與大小輪替分段）
+
+        Args:
+            csv_path: FortuneLogger 的 CSV 檔案路徑
+            batch_size: 每次寫入的筆數
+
+        Returns:
+            int: 匯入筆數
+        """
+        total = 0
+        with open(csv_path, "r", newline="", encoding="utf-8-sig") as f:
+            batch = []
+
+            def flush():
+                timestamps = [row.get("Timestamp") or "" for row in batch]
+                self._append(b"".join(self._encode_row(row) for row in batch), max(timestamps), len(batch), min(timestamps))
+
+            for row in csv.DictReader(f):
+                # 換日時先寫入，讓分段依日期輪替
+                if batch and (len(batch) >= batch_size or (row.get("Timestamp") or "")[:10] != (batch[-1].get("Timestamp") or "")[:10]):
+                    flush()
+                    total += len(batch)
+                    batch = []
+                batch.append(row)
+            if batch:
+                flush()
+                total += len(batch)
+        print(f"✅ 已從 {csv_path} 匯入 {total} 筆數據")
+        return total
+
+
+# === 測試代碼 ===
+if __name__ == "__main__":
+    logger = SegmentedFortuneLogger("test_corpus_segments", max_bytes=4096)
+
+    test_data = {
+        "success": True,
+        "birth_datetime": "1990年01月01日 12時00分",
+        "lunar_date": "一九八九年臘月初五",
+        "bazi_full": "己巳 丙子 丙寅 甲午",
+        "day_master": "丙",
+        "day_master_element": "火",
+        "ai_fortune": "此命日主丙火，生於子月，水旺之時。"
+    }
+
+    for _ in range(50):
+        logger.log_fortune(test_data)
+    logger.wait_for_compression()
+    print(f"\n語料庫統計: {logger.get_stats()}")
+    for entry in logger.list_segments():
+        print(f"分段 #{entry['id']} {entry['status']}：{entry['rows']} 筆，{entry['stored_size']} bytes")
+    logger.export_to_text("test_corpus.txt")
@@ -0,0 +1,459 @@
+"""
+SQLite 語料庫模組
+以 SQLite（WAL 模式）儲存語料庫，提供與 FortuneLogger 相同的 log_fortune / get_stats / export_to_text 介面，
+並可依日主、五行或日期區間查詢（皆有索引，百萬筆仍在毫秒內回應）
+"""
+
+import csv
+from datetime import date, datetime, timedelta
+import os
+import sqlite3
+import threading
+
+from logger import CSV_COLUMNS, FSYNC_POLICIES, FortuneLogger, _chat_prefix, _format_chat_entry, _format_text_entry
+from metrics import track_stage
+
+# 欄位型別（其餘為 TEXT）
+_COLUMN_TYPES = {
+    "LLM_Latency_ms": "REAL",
+    "LLM_TTFT_ms": "REAL",
+    "Prompt_Tokens": "INTEGER",
+    "Completion_Tokens": "INTEGER"
+}
+
+# fsync 策略對應的 synchronous 設定（WAL 下 NORMAL 只在檢查點時 fsync，行程當掉不會遺失已提交的資料）
+_SYNCHRONOUS = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS corpus (id INTEGER PRIMARY KEY, "
+    + ", ".join(f"{column} {_COLUMN_TYPES.get(column, 'TEXT')}" for column in CSV_COLUMNS) + ")",
+    "CREATE INDEX IF NOT EXISTS idx_corpus_timestamp ON corpus (Timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_corpus_bazi_chart ON corpus (Bazi_Chart)",
+    # 依日主 / 五行查詢時同時依時間排序
+    "CREATE INDEX IF NOT EXISTS idx_corpus_day_master ON corpus (Day_Master, Timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_corpus_element ON corpus (Day_Master_Element, Timestamp)",
+    # 總筆數由觸發器維護，get_stats 不需 COUNT(*)
+    "CREATE TABLE IF NOT EXISTS corpus_stats (id INTEGER PRIMARY KEY CHECK (id = 1), total_records INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO corpus_stats (id, total_records) SELECT 1, COUNT(*) FROM corpus",
+    "CREATE TRIGGER IF NOT EXISTS corpus_count_insert AFTER INSERT ON corpus "
+    "BEGIN UPDATE corpus_stats SET total_records = total_records + 1 WHERE id = 1; END",
+    "CREATE TRIGGER IF NOT EXISTS corpus_count_delete AFTER DELETE ON corpus "
+    "BEGIN UPDATE corpus_stats SET total_records = total_records - 1 WHERE id = 1; END"
+]
+
+_INSERT = (
+    f"INSERT INTO corpus ({', '.join(CSV_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in CSV_COLUMNS)})"
+)
+
+
+def _bound(value, is_end: bool = False) -> str:
+    """
+    將日期區間的邊界轉為與 Timestamp 欄位可比較的字串
+
+    Args:
+        value: datetime、date 或字串（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS）
+        is_end: 是否為結束邊界（只有日期時包含當天整天）
+
+    Returns:
+        str: 開始邊界（含）或結束邊界（不含）
+    """
+    if isinstance(value, datetime):
+        text = value.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(value, date):
+        text = value.isoformat()
+    else:
+        text = str(value)
+
+    if len(text) == 10:
+        if is_end:
+            return (date.fromisoformat(text) + timedelta(days=1)).isoformat()
+        return text
+    if is_end:
+        # 結束時間本身也要包含在內
+        return text + "\x7f"
+    return text
+
+
+class SQLiteFortuneLogger:
+    """
+    SQLite 運勢數據記錄器
+
+    每個執行緒使用各自的連線；WAL 模式下讀取不會被寫入阻擋，
+    多個 Streamlit session 或行程同時寫入時由 busy_timeout 排隊等待。
+    """
+
+    def __init__(self, db_path: str = "corpus_data.db", fsync_policy: str = None, busy_timeout: float = 5.0):
+        """
+        初始化記錄器
+
+        Args:
+            db_path: SQLite 檔案路徑（預設為 corpus_data.db）
+            fsync_policy: always / interval / never（預設讀取 CORPUS_FSYNC，未設定為 interval）
+            busy_timeout: 資料庫被其他連線鎖定時的最長等待秒數
+        """
+        self.db_path = db_path
+        self.fsync_policy = fsync_policy or os.environ.get("CORPUS_FSYNC", "interval")
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"fsync_policy 必須是 {' / '.join(FSYNC_POLICIES)}：{self.fsync_policy}")
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._ensure_db_exists()
+
+    @classmethod
+    def from_env(cls) -> "SQLiteFortuneLogger":
+        """依環境變數建立記錄器"""
+        return cls(os.environ.get("CORPUS_DB_PATH", "corpus_data.db"))
+
+    def _connect(self) -> sqlite3.Connection:
+        """取得目前執行緒的連線（第一次使用時開啟）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={_SYNCHRONOUS[self.fsync_policy]}")
+            self._local.conn = conn
+        return conn
+
+    def _ensure_db_exists(self):
+        """確保資料表、索引與觸發器存在；舊版資料表缺少新欄位時補上"""
+        created = not os.path.exists(self.db_path)
+        conn = self._connect()
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            # 舊版資料庫缺少的欄位（舊資料留空）
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(corpus)")}
+            for column in CSV_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE corpus ADD COLUMN {column} {_COLUMN_TYPES.get(column, 'TEXT')}")
+        if created:
+            print(f"✅ 已建立新的語料庫資料庫: {self.db_path}")
+
+    def _insert(self, records: list):
+        """於單一交易寫入多筆記錄"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(_INSERT, [[record[column] for column in CSV_COLUMNS] for record in records])
+
+    def log_fortune(self, fortune_data: dict) -> bool:
+        """
+        記錄一筆運勢數據
+
+        Args:
+            fortune_data: 包含八字與 AI 解析的字典
+
+        Returns:
+            bool: 是否成功記錄
+        """
+        try:
+            if not fortune_data.get("success", False):
+                print("⚠️ 跳過記錄：運勢生成失敗")
+                return False
+
+            with track_stage("db_write"):
+                self._insert([FortuneLogger._build_record(fortune_data)])
+
+            print(f"✅ 已記錄數據到 {self.db_path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ 記錄失敗：{str(e)}")
+            return False
+
+    def log_fortunes(self, fortune_data_list: list) -> bool:
+        """
+        批次記錄多筆運勢數據（單一交易；供 log_queue 使用）
+
+        Args:
+            fortune_data_list: get_fortune() 結果字典的列表（生成失敗的會略過）
+
+        Returns:
+            bool: 是否成功記錄
+        """
+        try:
+            records = [FortuneLogger._build_record(d) for d in fortune_data_list if d.get("success", False)]
+            if not records:
+                return True
+
+            with track_stage("db_write"):
+                self._insert(records)
+
+            print(f"✅ 已記錄 {len(records)} 筆數據到 {self.db_path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ 記錄失敗：{str(e)}")
+            return False
+
+    def import_csv(self, csv_path: str, batch_size: int = 10000) -> int:
+        """
+        匯入既有的 CSV 語料庫（逐批讀取與寫入，不會整檔載入記憶體）
+
+        Args:
+            csv_path: FortuneLogger 的 CSV 檔案路徑
+            batch_size: 每個交易寫入的筆數
+
+        Returns:
+            int: 匯入筆數
+        """
+        conn = self._connect()
+        total = 0
+        with open(csv_path, "r", newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            batch = []
+            for row in reader:
+                # 數值欄位的空字串存為 NULL
+                batch.append([
+                    None if column in _COLUMN_TYPES and not row.get(column) else row.get(column)
+                    for column in CSV_COLUMNS
+                ])
+                if len(batch) >= batch_size:
+                    with conn:
+                        conn.executemany(_INSERT, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                with conn:
+                    conn.executemany(_INSERT, batch)
+                total += len(batch)
+        print(f"✅ 已從 {csv_path} 匯入 {total} 筆數據")
+        return total
+
+    def get_stats(self) -> dict:
+        """
+        獲取語料庫統計資訊
+
+        Returns:
+            dict: 包含總筆數、最新記錄時間等資訊
+        """
+        try:
+            with track_stage("db_stats"):
+                conn = self._connect()
+                total = conn.execute("SELECT total_records FROM corpus_stats WHERE id = 1").fetchone()[0]
+                latest = conn.execute("SELECT MAX(Timestamp) FROM corpus").fetchone()[0]
+                size = sum(
+                    os.path.getsize(path)
+                    for path in (self.db_path, f"{self.db_path}-wal")
+                    if os.path.exists(path)
+                )
+
+            return {
+                "total_records": total,
+                "latest_timestamp": latest,
+                "file_size_kb": round(size / 1024, 2)
+            }
+
+        except Exception as e:
+            print(f"❌ 獲取統計失敗：{str(e)}")
+            return {
+                "total_records": 0,
+                "latest_timestamp": None,
+                "file_size_kb": 0
+            }
+
+    @staticmethod
+    def _where(day_master: str = None, element: str = None, start=None, end=None):
+        clauses, params = [], []
+        if day_master:
+            clauses.append("Day_Master = ?")
+            params.append(day_master)
+        if element:
+            clauses.append("Day_Master_Element = ?")
+            params.append(element)
+        if start is not None:
+            clauses.append("Timestamp >= ?")
+            params.append(_bound(start))
+        if end is not None:
+            clauses.append("Timestamp < ?")
+            params.append(_bound(end, is_end=True))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(
+        self,
+        day_master: str = None,
+        element: str = None,
+        start=None,
+        end=None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> list:
+        """
+        依條件查詢記錄（最新的在前）
+
+        Args:
+            day_master: 日主天干（如 丙）
+            element: 日主五行（如 火）
+            start: 開始時間（含；datetime、date 或字串）
+            end: 結束時間（含；只有日期時包含當天整天）
+            limit: 最多回傳筆數
+            offset: 略過筆數（分頁用）
+
+        Returns:
+            list: 記錄字典列表（欄位同 CSV_COLUMNS）
+        """
+        where, params = self._where(day_master, element, start, end)
+        with track_stage("db_query"):
+            cursor = self._connect().execute(
+                f"SELECT {', '.join(CSV_COLUMNS)} FROM corpus{where} "
+                "ORDER BY Timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            )
+            return [dict(zip(CSV_COLUMNS, row)) for row in cursor]
+
+    def count(self, day_master: str = None, element: str = None, start=None, end=None) -> int:
+        """
+        計算符合條件的筆數（條件同 query）
+
+        Returns:
+            int: 筆數
+        """
+        where, params = self._where(day_master, element, start, end)
+        with track_stage("db_query"):
+            return self._connect().execute(f"SELECT COUNT(*) FROM corpus{where}", params).fetchone()[0]
+
+    def query_by_day_master(self, day_master: str, limit: int = 100) -> list:
+        """依日主天干查詢最新記錄"""
+        return self.query(day_master=day_master, limit=limit)
+
+    def query_by_element(self, element: str, limit: int = 100) -> list:
+        """依日主五行查詢最新記錄"""
+        return self.query(element=element, limit=limit)
+
+    def query_by_date_range(self, start, end, limit: int = 100) -> list:
+        """依記錄時間區間查詢（start、end 皆包含）"""
+        return self.query(start=start, end=end, limit=limit)
+
+    def export_to_text(self, output_path: str = "corpus_text.txt") -> bool:
+        """
+        將語料庫匯出為純文字格式（方便訓練；逐列串流讀寫）
+
+        Args:
+            output_path: 輸出文字檔路徑
+
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            cursor = self._connect().execute(
+                "SELECT Bazi_Chart, Day_Master, Day_Master_Element, Birth_DateTime, Lunar_Date, AI_Output "
+                "FROM corpus ORDER BY id"
+            )
+            count = 0
+            with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                for row in cursor:
+                    f.write(_format_text_entry(*("" if value is None else value for value in row)))
+                    count += 1
+
+            print(f"✅ 已匯出 {count} 筆純文字語料到 {output_path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+
+    def export_to_csv(self, output_path: str = "corpus_export.csv") -> bool:
+        """
+        將語料庫匯出為與 FortuneLogger 相同格式的 CSV（本地備份；可再以 import_csv 匯入，逐列串流讀寫）
+
+        Args:
+            output_path: 輸出 CSV 檔路徑
+
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            cursor = self._connect().execute(f"SELECT {', '.join(CSV_COLUMNS)} FROM corpus ORDER BY id")
+            count = 0
+            with open(output_path, "w", newline="", encoding="utf-8-sig", buffering=1 << 20) as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(CSV_COLUMNS)
+                for row in cursor:
+                    writer.writerow("" if value is None else value for value in row)
+                    count += 1
+
+            print(f"✅ 已匯出 {count} 筆數據到 {output_path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+
+    def export_to_jsonl(self, output_path: str = "corpus_chat.jsonl", live_only: bool = True) -> bool:
+        """
+        將語料庫匯出為 JSONL 對話格式（同 FortuneLogger.export_to_jsonl）
+
+        Args:
+            output_path: 輸出 JSONL 檔路徑
+            live_only: 只匯出實際呼叫 LLM 的記錄（預設）
+
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            from bazi_engine import SYSTEM_PROMPT, rebuild_user_prompt
+
+            where = " AND LLM_Model IS NOT NULL AND LLM_Model != ''" if live_only else ""
+            cursor = self._connect().execute(
+                f"SELECT {', '.join(CSV_COLUMNS)} FROM corpus WHERE AI_Output != ''{where} ORDER BY id"
+            )
+            prefix = _chat_prefix(SYSTEM_PROMPT)
+            count = skipped = 0
+            with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                for row in cursor:
+                    try:
+                        f.write(_format_chat_entry(dict(zip(CSV_COLUMNS, row)), prefix, rebuild_user_prompt))
+                        count += 1
+                    except ValueError:
+                        skipped += 1
+
+            print(f"✅ 已匯出 {count} 筆對話語料到 {output_path}" + (f"（略過 {skipped} 筆）" if skipped else ""))
+            return True
+
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+
+    def export_to_parquet(self, output_dir: str = "corpus_parquet", full: bool = False) -> bool:
+        """
+        將語料庫匯出為依日期與日主五行分區的 Parquet 資料集（方便分析；見 parquet_export.py）
+
+        再次呼叫時只附加上次匯出之後的新記錄。
+
+        Args:
+            output_dir: 輸出目錄
+            full: 是否刪除先前的匯出結果後完整重新匯出
+
+        Returns:
+            bool: 是否成功匯出
+        """
+        try:
+            from parquet_export import export_to_parquet
+
+            result = export_to_parquet(self, output_dir, full=full)
+            print(f"✅ 已匯出 {result['rows']} 筆數據到 {output_dir}（{result['files']} 個檔案）")
+            return True
+
+        except Exception as e:
+            print(f"❌ 匯出失敗：{str(e)}")
+            return False
+
+
+# === 測試代碼 ===
+if __name__ == "__main__":
+    logger = SQLiteFortuneLogger("test_corpus.db")
+
+    test_data = {
+        "success": True,
+        "birth_datetime": "1990年01月01日 12時00分",
+        "lunar_date": "一九八九年臘月初五",
+        "bazi_full": "己巳 丙子 丙寅 甲午",
+        "day_master": "丙",
+        "day_master_element": "火",
+        "ai_fortune": "此命日主丙火，生於子月，水旺之時。"
+    }
+
+    logger.log_fortune(test_data)
+    print(f"\n語料庫統計: {logger.get_stats()}")
+    print(f"日主丙的記錄: {logger.count(day_master='丙')} 筆")
+    logger.export_to_text("test_corpus.txt")